@@ -1,5 +1,6 @@
-"""Prints tracking events from multiple devices. We create a listener to get 
-device events to get an updated device list from the connection. The tracking 
+"""Prints tracking events from multiple devices. We use a DeviceRegistry to 
+keep an up to date device list from the connection's device events, which 
+also subscribes to each new device as it is plugged in. The tracking 
 listener is much the same as the `tracking_event_example.py` but the serial 
 number of each tracking event is logged too. The tracking events are only 
 logged every 100 frames.
@@ -9,20 +10,7 @@ import leap
 import time
 from timeit import default_timer as timer
 from typing import Callable
-from leap.events import TrackingEvent
-from leap.event_listener import LatestEventListener
-from leap.datatypes import FrameData
-
-
-class MultiDeviceListener(leap.Listener):
-    def __init__(self, event_type):
-        super().__init__()
-        self._event_type = event_type
-        self.n_events = 0
-
-    def on_event(self, event):
-        if isinstance(event, self._event_type):
-            self.n_events += 1
+from leap.device_registry import DeviceRegistry
 
 
 def wait_until(condition: Callable[[], bool], timeout: float = 5, poll_delay: float = 0.01):
@@ -36,49 +24,44 @@ def wait_until(condition: Callable[[], bool], timeout: float = 5, poll_delay: fl
 
 
 class TrackingEventListener(leap.Listener):
-    def __init__(self):
+    def __init__(self, registry):
         self.device_latest_tracking_event = {}
+        self._registry = registry
 
     def number_of_devices_tracking(self):
         return len(self.device_latest_tracking_event)
 
     def on_tracking_event(self, event):
+        source_device = event.metadata.device_id
         if event.tracking_frame_id % 100 == 0:
+            record = self._registry.get(source_device)
+            serial = record.serial if record is not None else "unknown"
             print(
-                f"Frame {event.tracking_frame_id} with {len(event.hands)} hands on device {event.metadata.device_id}"
+                f"Frame {event.tracking_frame_id} with {len(event.hands)} hands on device {source_device} ({serial})"
             )
-        source_device = event.metadata.device_id
         self.device_latest_tracking_event[source_device] = event
 
 
-def get_updated_devices(connection):
-    devices = connection.get_devices()
+class PrintingDeviceRegistry(DeviceRegistry):
+    def on_device_added(self, record):
+        print(f"Added device {record.id} with serial {record.serial}")
 
-    for device in devices:
-        with device.open():
-            connection.subscribe_events(device)
+    def on_device_removed(self, record):
+        print(f"Removed device {record.id} with serial {record.serial}")
 
 
 def main():
-    tracking_listener = TrackingEventListener()
-    device_listener = MultiDeviceListener(leap.events.DeviceEvent)
-
     connection = leap.Connection(multi_device_aware=True)
+
+    registry = PrintingDeviceRegistry(connection, subscribe=True)
+    tracking_listener = TrackingEventListener(registry)
+    connection.add_listener(registry)
     connection.add_listener(tracking_listener)
-    connection.add_listener(device_listener)
 
     with connection.open():
-        wait_until(lambda: device_listener.n_events > 1)
-
-        current_device_events = device_listener.n_events
-        get_updated_devices(connection)
+        wait_until(lambda: len(registry) > 0)
 
         while True:
-            if device_listener.n_events != current_device_events:
-                print("device_listener got a new device event")
-                current_device_events = device_listener.n_events
-                get_updated_devices(connection)
-
             time.sleep(0.5)
 
 
@@ -0,0 +1,115 @@
+"""Measures the size and speed of serialising TrackingEvents in each format.
+
+Frames are synthesised, with two hands moving smoothly, so this does not require a tracking
+camera or the Ultraleap Tracking service to be running.
+
+Each format is also compressed with zlib, to show how delta encoding helps general purpose
+compression.
+"""
+
+import json
+import time
+import zlib
+
+import numpy as np
+
+import leap
+from leap.arrays import RECORD_DTYPE
+from leap.events import TrackingEvent
+from leap.serialization import FrameDecoder, FrameEncoder
+
+N_FRAMES = 2000
+
+
+def make_events():
+    rng = np.random.default_rng(0)
+    records = np.zeros(N_FRAMES, dtype=RECORD_DTYPE)
+    records["timestamp"] = np.arange(N_FRAMES) * 8333
+    records["frame_id"] = np.arange(N_FRAMES)
+    records["tracking_frame_id"] = np.arange(N_FRAMES)
+    records["framerate"] = 120.0
+    records["n_hands"] = 2
+
+    hands = records["hands"]
+    hands["id"] = [1, 2]
+    hands["type"] = [0, 1]
+    hands["confidence"] = 1.0
+
+    # Each hand takes a small random step every frame, with its joints at fixed offsets
+    steps = rng.normal(0, 0.5, size=(N_FRAMES, 2, 3)).cumsum(axis=0)
+    hands["palm"]["position"] = rng.uniform(-200, 200, size=(2, 3)) + steps
+    for digit in range(5):
+        for bone in range(4):
+            offset = rng.uniform(-100, 100, size=(2, 3))
+            joints = hands["digits"]["bones"][:, :, digit, bone]
+            joints["prev_joint"] = hands["palm"]["position"] + offset
+            joints["next_joint"] = hands["palm"]["position"] + offset * 1.2
+            joints["rotation"] = [0, 0, 0, 1]
+
+    return [TrackingEvent.from_record(record) for record in records]
+
+
+def to_json(event):
+    return json.dumps(
+        {
+            "timestamp": event.timestamp,
+            "hands": [
+                {
+                    "id": hand.id,
+                    "palm": [hand.palm.position.x, hand.palm.position.y, hand.palm.position.z],
+                    "digits": [
+                        [
+                            [bone.prev_joint.x, bone.prev_joint.y, bone.prev_joint.z]
+                            for bone in digit.bones
+                        ]
+                        for digit in hand.digits
+                    ],
+                }
+                for hand in event.hands
+            ],
+        }
+    ).encode()
+
+
+def benchmark(name, encode, decode, events):
+    start = time.perf_counter()
+    encoded = [encode(event) for event in events]
+    encode_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    if decode is not None:
+        for data in encoded:
+            decode(data)
+    decode_time = time.perf_counter() - start
+
+    size = sum(len(data) for data in encoded) / len(events)
+    compressed = len(zlib.compress(b"".join(encoded))) / len(events)
+    decode_rate = f"{len(events) / decode_time:10.0f}" if decode is not None else "         -"
+    print(
+        f"{name:<22} {size:8.0f} B {compressed:8.0f} B "
+        f"{len(events) / encode_time:10.0f} {decode_rate}"
+    )
+
+
+def main():
+    print(f"LeapC time {leap.get_now()}, synthesising {N_FRAMES} frames")
+    events = make_events()
+
+    print(f"{'Format':<22} {'Size':>10} {'zlib':>10} {'Encode/s':>10} {'Decode/s':>10}")
+    benchmark("json (hand subset)", to_json, json.loads, events)
+    benchmark("to_bytes", TrackingEvent.to_bytes, TrackingEvent.from_bytes, events)
+    benchmark(
+        "to_bytes float16",
+        lambda event: event.to_bytes(half_precision=True),
+        TrackingEvent.from_bytes,
+        events,
+    )
+    for half_precision in (False, True):
+        encoder = FrameEncoder(half_precision=half_precision)
+        decoder = FrameDecoder()
+        name = "delta float16" if half_precision else "delta"
+        benchmark(name, encoder.encode, decoder.decode_record, events)
+
+
+if __name__ == "__main__":
+    main()
@@ -79,8 +79,54 @@ with open(leapc_header_fpath) as fp:
 
 cffi_cdef = sanitise_leapc_header(leapc_header)
 
+# Declarations of the native poller defined in cffi_src.h
+native_poller_cdef = """
+typedef struct _LEAP_PY_FRAME_RECORD {
+  int64_t timestamp;
+  int64_t frame_id;
+  int64_t tracking_frame_id;
+  float framerate;
+  uint32_t n_hands;
+  uint32_t device_id;
+  LEAP_HAND hands[2];
+} LEAP_PY_FRAME_RECORD;
+
+typedef struct _LEAP_PY_EVENT_RECORD {
+  int32_t type;
+  uint32_t device_id;
+} LEAP_PY_EVENT_RECORD;
+
+typedef struct _LEAP_PY_POLLER_STATS {
+  uint64_t messages;
+  uint64_t frames;
+  uint64_t frames_overwritten;
+  uint64_t events;
+  uint64_t events_overwritten;
+  uint64_t timeouts;
+  uint64_t errors;
+  int32_t last_error;
+  uint32_t buffered_frames;
+  uint32_t buffered_events;
+} LEAP_PY_POLLER_STATS;
+
+typedef struct _LEAP_PY_POLLER LEAP_PY_POLLER;
+
+LEAP_PY_POLLER* LeapPyPollerCreate(
+    LEAP_CONNECTION connection, uint32_t frame_capacity, uint32_t event_capacity, uint32_t timeout
+);
+int LeapPyPollerStart(LEAP_PY_POLLER* poller);
+void LeapPyPollerStop(LEAP_PY_POLLER* poller);
+void LeapPyPollerDestroy(LEAP_PY_POLLER* poller);
+uint32_t LeapPyPollerDrain(LEAP_PY_POLLER* poller, LEAP_PY_FRAME_RECORD* out, uint32_t max_frames);
+uint32_t LeapPyPollerDrainEvents(
+    LEAP_PY_POLLER* poller, LEAP_PY_EVENT_RECORD* out, uint32_t max_events
+);
+void LeapPyPollerGetStats(LEAP_PY_POLLER* poller, LEAP_PY_POLLER_STATS* stats);
+"""
+
 ffibuilder = FFI()
 ffibuilder.cdef(cffi_cdef, packed=True)
+ffibuilder.cdef(native_poller_cdef, packed=True)
 
 cffi_src_fpath = os.path.join(os.path.dirname(__file__), "cffi_src.h")
 with open(cffi_src_fpath) as fp:
@@ -92,7 +138,8 @@ extra_link_args = {
     "Darwin": ["-Wl,-rpath,@loader_path"],
 }
 
-os_libraries = {"Windows": ["LeapC"], "Linux": ["LeapC"], "Darwin": ["LeapC.5"]}
+# pthread is used by the native poller
+os_libraries = {"Windows": ["LeapC"], "Linux": ["LeapC", "pthread"], "Darwin": ["LeapC.5"]}
 
 ffibuilder.set_source(
     "_leapc_cffi",
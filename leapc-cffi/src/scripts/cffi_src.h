@@ -1 +1,320 @@
 #include "LeapC.h"
+
+/*
+ * Native poller
+ *
+ * Runs LeapPollConnection on a native thread and copies tracking frames into a preallocated
+ * ring buffer, so the poll rate does not depend on how quickly Python handles messages.
+ * Python drains the buffer in batches with LeapPyPollerDrain. Other messages are recorded
+ * as (type, device id) pairs in a second ring buffer.
+ *
+ * When a ring buffer is full the oldest entry is overwritten and counted in the stats.
+ *
+ * After a poll fails the thread sleeps before polling again, doubling the sleep after each
+ * consecutive failure up to LEAP_PY_MAX_ERROR_BACKOFF_MS, so a persistent error such as a
+ * lost service does not spin a core.
+ */
+
+#include <stdlib.h>
+#include <string.h>
+
+#ifdef _WIN32
+#include <windows.h>
+typedef CRITICAL_SECTION leap_py_mutex;
+#define LEAP_PY_MUTEX_INIT(m) InitializeCriticalSection(m)
+#define LEAP_PY_MUTEX_DESTROY(m) DeleteCriticalSection(m)
+#define LEAP_PY_MUTEX_LOCK(m) EnterCriticalSection(m)
+#define LEAP_PY_MUTEX_UNLOCK(m) LeaveCriticalSection(m)
+#define LEAP_PY_SLEEP_MS(ms) Sleep(ms)
+#else
+#include <pthread.h>
+#include <time.h>
+typedef pthread_mutex_t leap_py_mutex;
+#define LEAP_PY_MUTEX_INIT(m) pthread_mutex_init(m, NULL)
+#define LEAP_PY_MUTEX_DESTROY(m) pthread_mutex_destroy(m)
+#define LEAP_PY_MUTEX_LOCK(m) pthread_mutex_lock(m)
+#define LEAP_PY_MUTEX_UNLOCK(m) pthread_mutex_unlock(m)
+static void leap_py_sleep_ms(uint32_t ms) {
+  struct timespec duration;
+  duration.tv_sec = ms / 1000;
+  duration.tv_nsec = (long)(ms % 1000) * 1000000L;
+  nanosleep(&duration, NULL);
+}
+#define LEAP_PY_SLEEP_MS(ms) leap_py_sleep_ms(ms)
+#endif
+
+#define LEAP_PY_MAX_HANDS 2
+#define LEAP_PY_MIN_ERROR_BACKOFF_MS 1
+#define LEAP_PY_MAX_ERROR_BACKOFF_MS 100
+
+#pragma pack(push, 1)
+/* Matches leap.arrays.RECORD_DTYPE */
+typedef struct _LEAP_PY_FRAME_RECORD {
+  int64_t timestamp;
+  int64_t frame_id;
+  int64_t tracking_frame_id;
+  float framerate;
+  uint32_t n_hands;
+  uint32_t device_id;
+  LEAP_HAND hands[LEAP_PY_MAX_HANDS];
+} LEAP_PY_FRAME_RECORD;
+
+typedef struct _LEAP_PY_EVENT_RECORD {
+  int32_t type;
+  uint32_t device_id;
+} LEAP_PY_EVENT_RECORD;
+
+typedef struct _LEAP_PY_POLLER_STATS {
+  uint64_t messages;
+  uint64_t frames;
+  uint64_t frames_overwritten;
+  uint64_t events;
+  uint64_t events_overwritten;
+  uint64_t timeouts;
+  uint64_t errors;
+  int32_t last_error;
+  uint32_t buffered_frames;
+  uint32_t buffered_events;
+} LEAP_PY_POLLER_STATS;
+#pragma pack(pop)
+
+typedef struct _LEAP_PY_POLLER {
+  LEAP_CONNECTION connection;
+  uint32_t timeout;
+  volatile int running;
+#ifdef _WIN32
+  HANDLE thread;
+#else
+  pthread_t thread;
+#endif
+  int has_thread;
+  leap_py_mutex mutex;
+
+  LEAP_PY_FRAME_RECORD* frames;
+  uint32_t frame_capacity;
+  uint64_t frame_head;
+  uint64_t frame_tail;
+
+  LEAP_PY_EVENT_RECORD* events;
+  uint32_t event_capacity;
+  uint64_t event_head;
+  uint64_t event_tail;
+
+  LEAP_PY_POLLER_STATS stats;
+} LEAP_PY_POLLER;
+
+static void leap_py_poller_push_frame(LEAP_PY_POLLER* poller,
+                                      const LEAP_TRACKING_EVENT* frame,
+                                      uint32_t device_id) {
+  uint32_t n_hands = frame->nHands < LEAP_PY_MAX_HANDS ? frame->nHands : LEAP_PY_MAX_HANDS;
+  LEAP_PY_FRAME_RECORD* record;
+
+  LEAP_PY_MUTEX_LOCK(&poller->mutex);
+  if (poller->frame_head - poller->frame_tail == poller->frame_capacity) {
+    poller->frame_tail++;
+    poller->stats.frames_overwritten++;
+  }
+  record = &poller->frames[poller->frame_head % poller->frame_capacity];
+  record->timestamp = frame->info.timestamp;
+  record->frame_id = frame->info.frame_id;
+  record->tracking_frame_id = frame->tracking_frame_id;
+  record->framerate = frame->framerate;
+  record->n_hands = n_hands;
+  record->device_id = device_id;
+  memcpy(record->hands, frame->pHands, n_hands * sizeof(LEAP_HAND));
+  memset(record->hands + n_hands, 0, (LEAP_PY_MAX_HANDS - n_hands) * sizeof(LEAP_HAND));
+  poller->frame_head++;
+  poller->stats.frames++;
+  LEAP_PY_MUTEX_UNLOCK(&poller->mutex);
+}
+
+static void leap_py_poller_push_event(LEAP_PY_POLLER* poller, int32_t type, uint32_t device_id) {
+  LEAP_PY_EVENT_RECORD* record;
+
+  LEAP_PY_MUTEX_LOCK(&poller->mutex);
+  if (poller->event_head - poller->event_tail == poller->event_capacity) {
+    poller->event_tail++;
+    poller->stats.events_overwritten++;
+  }
+  record = &poller->events[poller->event_head % poller->event_capacity];
+  record->type = type;
+  record->device_id = device_id;
+  poller->event_head++;
+  poller->stats.events++;
+  LEAP_PY_MUTEX_UNLOCK(&poller->mutex);
+}
+
+static void leap_py_poller_run(LEAP_PY_POLLER* poller) {
+  LEAP_CONNECTION_MESSAGE message;
+  eLeapRS result;
+  uint32_t backoff_ms = 0;
+
+  while (poller->running) {
+    result = LeapPollConnection(poller->connection, poller->timeout, &message);
+    if (result == eLeapRS_Timeout) {
+      backoff_ms = 0;
+      LEAP_PY_MUTEX_LOCK(&poller->mutex);
+      poller->stats.timeouts++;
+      LEAP_PY_MUTEX_UNLOCK(&poller->mutex);
+      continue;
+    }
+    if (result != eLeapRS_Success) {
+      LEAP_PY_MUTEX_LOCK(&poller->mutex);
+      poller->stats.errors++;
+      poller->stats.last_error = (int32_t)result;
+      LEAP_PY_MUTEX_UNLOCK(&poller->mutex);
+
+      backoff_ms = backoff_ms == 0 ? LEAP_PY_MIN_ERROR_BACKOFF_MS : backoff_ms * 2;
+      if (backoff_ms > LEAP_PY_MAX_ERROR_BACKOFF_MS) {
+        backoff_ms = LEAP_PY_MAX_ERROR_BACKOFF_MS;
+      }
+      LEAP_PY_SLEEP_MS(backoff_ms);
+      continue;
+    }
+    backoff_ms = 0;
+
+    LEAP_PY_MUTEX_LOCK(&poller->mutex);
+    poller->stats.messages++;
+    LEAP_PY_MUTEX_UNLOCK(&poller->mutex);
+
+    if (message.type == eLeapEventType_Tracking) {
+      leap_py_poller_push_frame(poller, message.tracking_event, message.device_id);
+    } else {
+      leap_py_poller_push_event(poller, (int32_t)message.type, message.device_id);
+    }
+  }
+}
+
+#ifdef _WIN32
+static DWORD WINAPI leap_py_poller_thread(LPVOID arg) {
+  leap_py_poller_run((LEAP_PY_POLLER*)arg);
+  return 0;
+}
+#else
+static void* leap_py_poller_thread(void* arg) {
+  leap_py_poller_run((LEAP_PY_POLLER*)arg);
+  return NULL;
+}
+#endif
+
+static LEAP_PY_POLLER* LeapPyPollerCreate(LEAP_CONNECTION connection,
+                                          uint32_t frame_capacity,
+                                          uint32_t event_capacity,
+                                          uint32_t timeout) {
+  LEAP_PY_POLLER* poller;
+
+  if (frame_capacity == 0 || event_capacity == 0) {
+    return NULL;
+  }
+  poller = (LEAP_PY_POLLER*)calloc(1, sizeof(LEAP_PY_POLLER));
+  if (poller == NULL) {
+    return NULL;
+  }
+  poller->frames = (LEAP_PY_FRAME_RECORD*)calloc(frame_capacity, sizeof(LEAP_PY_FRAME_RECORD));
+  poller->events = (LEAP_PY_EVENT_RECORD*)calloc(event_capacity, sizeof(LEAP_PY_EVENT_RECORD));
+  if (poller->frames == NULL || poller->events == NULL) {
+    free(poller->frames);
+    free(poller->events);
+    free(poller);
+    return NULL;
+  }
+  poller->connection = connection;
+  poller->timeout = timeout;
+  poller->frame_capacity = frame_capacity;
+  poller->event_capacity = event_capacity;
+  LEAP_PY_MUTEX_INIT(&poller->mutex);
+  return poller;
+}
+
+/* Start the poll thread. Returns 0 on success. */
+static int LeapPyPollerStart(LEAP_PY_POLLER* poller) {
+  if (poller->has_thread) {
+    return -1;
+  }
+  poller->running = 1;
+#ifdef _WIN32
+  poller->thread = CreateThread(NULL, 0, leap_py_poller_thread, poller, 0, NULL);
+  if (poller->thread == NULL) {
+    poller->running = 0;
+    return -1;
+  }
+#else
+  if (pthread_create(&poller->thread, NULL, leap_py_poller_thread, poller) != 0) {
+    poller->running = 0;
+    return -1;
+  }
+#endif
+  poller->has_thread = 1;
+  return 0;
+}
+
+/* Stop the poll thread, waiting for its current poll to finish */
+static void LeapPyPollerStop(LEAP_PY_POLLER* poller) {
+  if (!poller->has_thread) {
+    return;
+  }
+  poller->running = 0;
+#ifdef _WIN32
+  WaitForSingleObject(poller->thread, INFINITE);
+  CloseHandle(poller->thread);
+#else
+  pthread_join(poller->thread, NULL);
+#endif
+  poller->has_thread = 0;
+}
+
+static void LeapPyPollerDestroy(LEAP_PY_POLLER* poller) {
+  if (poller == NULL) {
+    return;
+  }
+  LeapPyPollerStop(poller);
+  LEAP_PY_MUTEX_DESTROY(&poller->mutex);
+  free(poller->frames);
+  free(poller->events);
+  free(poller);
+}
+
+/* Move up to max_frames buffered frames, oldest first, into out. Returns the number moved. */
+static uint32_t LeapPyPollerDrain(LEAP_PY_POLLER* poller,
+                                  LEAP_PY_FRAME_RECORD* out,
+                                  uint32_t max_frames) {
+  uint64_t available;
+  uint32_t count, start, first;
+
+  LEAP_PY_MUTEX_LOCK(&poller->mutex);
+  available = poller->frame_head - poller->frame_tail;
+  count = available < max_frames ? (uint32_t)available : max_frames;
+  start = (uint32_t)(poller->frame_tail % poller->frame_capacity);
+  first = poller->frame_capacity - start < count ? poller->frame_capacity - start : count;
+  memcpy(out, poller->frames + start, first * sizeof(LEAP_PY_FRAME_RECORD));
+  memcpy(out + first, poller->frames, (count - first) * sizeof(LEAP_PY_FRAME_RECORD));
+  poller->frame_tail += count;
+  LEAP_PY_MUTEX_UNLOCK(&poller->mutex);
+  return count;
+}
+
+/* Move up to max_events buffered non-tracking events into out. Returns the number moved. */
+static uint32_t LeapPyPollerDrainEvents(LEAP_PY_POLLER* poller,
+                                        LEAP_PY_EVENT_RECORD* out,
+                                        uint32_t max_events) {
+  uint64_t available;
+  uint32_t i, count;
+
+  LEAP_PY_MUTEX_LOCK(&poller->mutex);
+  available = poller->event_head - poller->event_tail;
+  count = available < max_events ? (uint32_t)available : max_events;
+  for (i = 0; i < count; i++) {
+    out[i] = poller->events[(poller->event_tail + i) % poller->event_capacity];
+  }
+  poller->event_tail += count;
+  LEAP_PY_MUTEX_UNLOCK(&poller->mutex);
+  return count;
+}
+
+static void LeapPyPollerGetStats(LEAP_PY_POLLER* poller, LEAP_PY_POLLER_STATS* stats) {
+  LEAP_PY_MUTEX_LOCK(&poller->mutex);
+  *stats = poller->stats;
+  stats->buffered_frames = (uint32_t)(poller->frame_head - poller->frame_tail);
+  stats->buffered_events = (uint32_t)(poller->event_head - poller->event_tail);
+  LEAP_PY_MUTEX_UNLOCK(&poller->mutex);
+}
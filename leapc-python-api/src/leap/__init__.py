@@ -89,10 +89,20 @@ from .functions import (
     get_server_status,
     get_frame_size,
     interpolate_frame,
+    interpolate_head_pose,
     get_extrinsic_matrix,
+    get_camera_matrix,
+    pixel_to_rectilinear,
+    rectilinear_to_pixel,
 )
-from .connection import Connection
+from .connection import Connection, TIMEOUT
+from .connection_group import ConnectionGroup
+from .device_registry import DeviceRegistry
 from .enums import EventType, TrackingMode, HandType
 from .event_listener import Listener
 from .exceptions import LeapError
+from .clock import ClockRebaser
+from .images import ImagePool
 from .recording import Recording, Recorder
+from .player import RecordingPlayer
+from .serve import FrameServer, StreamClient
@@ -0,0 +1,201 @@
+"""A memory-mapped archive format for tracking frames
+
+Unlike LeapC recordings, an archive can be opened with `mmap` and viewed as a NumPy array
+of fixed size records, so any frame can be read in constant time without decoding.
+
+File layout (all integers little-endian):
+
+| Offset | Size | Content                                             |
+|--------|------|-----------------------------------------------------|
+| 0      | 8    | Magic bytes b"LEAPARC\\0"                            |
+| 8      | 4    | Format version (uint32), currently 1                |
+| 12     | 4    | Header size in bytes (uint32), currently 64         |
+| 16     | 4    | Record size in bytes (uint32)                       |
+| 20     | 4    | LEAP_HAND size in bytes (uint32)                    |
+| 24     | 4    | Hands per record (uint32)                           |
+| 28     | 36   | Reserved, zero                                      |
+| 64     | ...  | Records of `leap.arrays.RECORD_DTYPE`, back to back |
+
+Each record holds the frame header fields, the device id and MAX_HANDS raw LEAP_HAND
+structs, of which only the first 'n_hands' are valid. The number of records is derived from
+the file size, so an archive which was not closed cleanly is still readable up to its last
+complete record.
+"""
+
+import mmap
+import struct
+
+import numpy as np
+
+from .arrays import HAND_DTYPE, MAX_HANDS, RECORD_DTYPE, copy_frame
+from .event_listener import Listener
+from .events import TrackingEvent
+
+_MAGIC = b"LEAPARC\0"
+_VERSION = 1
+_HEADER_SIZE = 64
+_HEADER = struct.Struct("<8sIIIII")
+
+
+class ArchiveWriter(Listener):
+    """Listener which appends every tracking frame to an archive file
+
+    :param path: The file to create. An existing file is overwritten.
+    :param buffer_size: The number of records to buffer before writing. Defaults to 256.
+    """
+
+    def __init__(self, path: str, *, buffer_size: int = 256):
+        self._file = open(path, "wb")
+        header = _HEADER.pack(
+            _MAGIC, _VERSION, _HEADER_SIZE, RECORD_DTYPE.itemsize, HAND_DTYPE.itemsize, MAX_HANDS
+        )
+        self._file.write(header.ljust(_HEADER_SIZE, b"\0"))
+        self._buffer = np.zeros(buffer_size, dtype=RECORD_DTYPE)
+        self._n_buffered = 0
+        self._n_written = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @property
+    def n_frames(self):
+        """The number of frames written, including those still buffered"""
+        return self._n_written + self._n_buffered
+
+    def on_tracking_event(self, event):
+        event.to_record(self._buffer[self._n_buffered])
+        self._advance()
+
+    def write_frame_ptr(self, frame_ptr, device_id: int = 0):
+        """Append a `LEAP_TRACKING_EVENT*`, such as one from `Recording.read_frame_ptr`"""
+        record = self._buffer[self._n_buffered : self._n_buffered + 1]
+        copy_frame(frame_ptr, record[0], record["hands"][0], device_id)
+        self._advance()
+
+    def flush(self):
+        if self._n_buffered > 0:
+            self._file.write(self._buffer[: self._n_buffered].tobytes())
+            self._n_written += self._n_buffered
+            self._n_buffered = 0
+        self._file.flush()
+
+    def close(self):
+        if self._file.closed:
+            return
+        self.flush()
+        self._file.close()
+
+    def _advance(self):
+        self._n_buffered += 1
+        if self._n_buffered == len(self._buffer):
+            self.flush()
+
+
+class Archive:
+    """Read-only, memory-mapped view of an archive file
+
+    `records` is an array of RECORD_DTYPE over the mapped file, so slicing and field access
+    never copy. Arrays taken from the archive must be released before it is closed.
+
+    :param path: The archive to open.
+    """
+
+    def __init__(self, path: str):
+        self._file = open(path, "rb")
+        try:
+            header = self._file.read(_HEADER_SIZE)
+            if len(header) < _HEADER_SIZE:
+                raise ValueError(f"{path} is not a tracking archive")
+            fields = _HEADER.unpack_from(header)
+            magic, version, header_size, record_size, hand_size, max_hands = fields
+            if magic != _MAGIC:
+                raise ValueError(f"{path} is not a tracking archive")
+            if version != _VERSION:
+                raise ValueError(f"Unsupported archive version {version}")
+            if (record_size, hand_size, max_hands) != (
+                RECORD_DTYPE.itemsize,
+                HAND_DTYPE.itemsize,
+                MAX_HANDS,
+            ):
+                raise ValueError("Archive was written with an incompatible LEAP_HAND layout")
+
+            self._file.seek(0, 2)
+            n_records = (self._file.tell() - header_size) // record_size
+            if n_records > 0:
+                self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+                self._records = np.frombuffer(
+                    self._mmap, dtype=RECORD_DTYPE, count=n_records, offset=header_size
+                )
+            else:
+                self._mmap = None
+                self._records = np.zeros(0, dtype=RECORD_DTYPE)
+        except BaseException:
+            self._file.close()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __len__(self):
+        return len(self._records)
+
+    def __getitem__(self, key):
+        return self._records[key]
+
+    @property
+    def records(self) -> np.ndarray:
+        return self._records
+
+    @property
+    def timestamps(self) -> np.ndarray:
+        return self._records["timestamp"]
+
+    @property
+    def hands(self) -> np.ndarray:
+        """All hands, with shape (n_frames, MAX_HANDS)"""
+        return self._records["hands"]
+
+    def find(self, timestamp: int) -> int:
+        """Get the position of the first frame at or after the timestamp
+
+        Frames are assumed to be in timestamp order.
+        """
+        return int(np.searchsorted(self.timestamps, timestamp, side="left"))
+
+    def between(self, start_timestamp: int, end_timestamp: int) -> np.ndarray:
+        """Get a view of the records with timestamps in [start_timestamp, end_timestamp]"""
+        timestamps = self.timestamps
+        start = int(np.searchsorted(timestamps, start_timestamp, side="left"))
+        end = int(np.searchsorted(timestamps, end_timestamp, side="right"))
+        return self._records[start:end]
+
+    def event(self, position: int) -> TrackingEvent:
+        """Create a TrackingEvent from a single record"""
+        return TrackingEvent.from_record(self._records[position])
+
+    def close(self):
+        self._records = None
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        self._file.close()
+
+
+def archive_recording(recording, path: str) -> int:
+    """Convert an open LeapC Recording into an archive
+
+    Returns the number of frames written.
+    """
+    with ArchiveWriter(path) as writer:
+        while True:
+            frame_ptr = recording.read_frame_ptr()
+            if frame_ptr is None:
+                break
+            writer.write_frame_ptr(frame_ptr)
+        return writer.n_frames
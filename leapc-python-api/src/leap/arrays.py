@@ -0,0 +1,136 @@
+"""NumPy views of LeapC tracking data
+
+HAND_DTYPE has exactly the memory layout of a LEAP_HAND, so arrays of hands can be created
+over LeapC memory without copying, and copied with a single memmove. The layout is read from
+the cffi type information rather than written out by hand.
+
+FRAME_DTYPE holds the per-frame fields of a LEAP_TRACKING_EVENT, plus the id of the device
+the frame came from (0 if unknown). RECORD_DTYPE is a whole frame in a fixed size record.
+"""
+
+import numpy as np
+from leapc_cffi import ffi
+
+# The most hands LeapC reports in a single frame
+MAX_HANDS = 2
+
+_VECTOR = ("<f4", (3,))
+_QUATERNION = ("<f4", (4,))
+
+
+def _struct_dtype(ctype: str, fields) -> np.dtype:
+    """Create a dtype with the same field offsets and size as a LeapC struct"""
+    names = [name for name, _ in fields]
+    return np.dtype(
+        {
+            "names": names,
+            "formats": [fmt for _, fmt in fields],
+            "offsets": [ffi.offsetof(ctype, name) for name in names],
+            "itemsize": ffi.sizeof(ctype),
+        }
+    )
+
+
+BONE_DTYPE = _struct_dtype(
+    "LEAP_BONE",
+    [
+        ("prev_joint", _VECTOR),
+        ("next_joint", _VECTOR),
+        ("width", "<f4"),
+        ("rotation", _QUATERNION),
+    ],
+)
+
+DIGIT_DTYPE = _struct_dtype(
+    "LEAP_DIGIT",
+    [
+        ("finger_id", "<i4"),
+        ("bones", (BONE_DTYPE, (4,))),
+        ("is_extended", "<u4"),
+    ],
+)
+
+PALM_DTYPE = _struct_dtype(
+    "LEAP_PALM",
+    [
+        ("position", _VECTOR),
+        ("stabilized_position", _VECTOR),
+        ("velocity", _VECTOR),
+        ("normal", _VECTOR),
+        ("width", "<f4"),
+        ("direction", _VECTOR),
+        ("orientation", _QUATERNION),
+    ],
+)
+
+HAND_DTYPE = _struct_dtype(
+    "LEAP_HAND",
+    [
+        ("id", "<u4"),
+        ("flags", "<u4"),
+        ("type", "<i4"),
+        ("confidence", "<f4"),
+        ("visible_time", "<u8"),
+        ("pinch_distance", "<f4"),
+        ("grab_angle", "<f4"),
+        ("pinch_strength", "<f4"),
+        ("grab_strength", "<f4"),
+        ("palm", PALM_DTYPE),
+        ("digits", (DIGIT_DTYPE, (5,))),
+        ("arm", BONE_DTYPE),
+    ],
+)
+
+FRAME_DTYPE = np.dtype(
+    [
+        ("timestamp", "<i8"),
+        ("frame_id", "<i8"),
+        ("tracking_frame_id", "<i8"),
+        ("framerate", "<f4"),
+        ("n_hands", "<u4"),
+        ("device_id", "<u4"),
+    ]
+)
+
+# A fixed size record holding a whole frame: the FRAME_DTYPE fields, followed by MAX_HANDS
+# hands of which only the first 'n_hands' are valid.
+RECORD_DTYPE = np.dtype(
+    [(name, FRAME_DTYPE.fields[name][0]) for name in FRAME_DTYPE.names]
+    + [("hands", HAND_DTYPE, (MAX_HANDS,))]
+)
+
+
+def hands_from_ptr(hands_ptr: ffi.CData, n_hands: int) -> np.ndarray:
+    """Create an array of HAND_DTYPE over `n_hands` LEAP_HANDs without copying"""
+    return np.frombuffer(ffi.buffer(hands_ptr, n_hands * HAND_DTYPE.itemsize), dtype=HAND_DTYPE)
+
+
+def copy_frame(frame_ptr: ffi.CData, frames: np.ndarray, hands: np.ndarray, device_id: int = 0):
+    """Copy a `LEAP_TRACKING_EVENT*` into one row of frame and hand arrays
+
+    :param frame_ptr: The frame to copy.
+    :param frames: A single element of FRAME_DTYPE to write to.
+    :param hands: A contiguous row of MAX_HANDS elements of HAND_DTYPE to write to. Unused
+        entries are zeroed.
+    :param device_id: The id of the device the frame came from.
+    """
+    n_hands = min(frame_ptr.nHands, MAX_HANDS)
+    frames["timestamp"] = frame_ptr.info.timestamp
+    frames["frame_id"] = frame_ptr.info.frame_id
+    frames["tracking_frame_id"] = frame_ptr.tracking_frame_id
+    frames["framerate"] = frame_ptr.framerate
+    frames["n_hands"] = n_hands
+    frames["device_id"] = device_id
+    raw = hands.view(np.uint8)
+    ffi.memmove(raw, frame_ptr.pHands, n_hands * HAND_DTYPE.itemsize)
+    raw[n_hands * HAND_DTYPE.itemsize :] = 0
+
+
+def joint_positions(hands: np.ndarray) -> np.ndarray:
+    """Get the joint positions of an array of hands
+
+    Returns an array of shape (..., 5, 5, 3): for each digit, the start of the metacarpal
+    followed by the end of each of the four bones.
+    """
+    bones = hands["digits"]["bones"]
+    return np.concatenate([bones["prev_joint"][..., :1, :], bones["next_joint"]], axis=-2)
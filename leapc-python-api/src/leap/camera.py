@@ -0,0 +1,225 @@
+"""Batched camera models for mapping between tracking space and image pixels
+
+LeapC maps a single pixel to a rectilinear ray (and back) per function call. A CameraModel
+samples those functions once on a regular grid, and then answers queries for any number
+of points with NumPy interpolation, so a batch of points never crosses the FFI boundary
+per point.
+
+Rectilinear coordinates are ray slopes (x/z, y/z) in the camera frame. The extrinsic
+matrix maps tracking space (millimetres) into the camera frame.
+"""
+
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from .connection import Connection
+from .device import Device
+from .enums import PerspectiveType, CameraCalibrationType
+from .functions import (
+    get_camera_matrix,
+    get_extrinsic_matrix,
+    pixel_to_rectilinear,
+    rectilinear_to_pixel,
+)
+
+
+def _interpolate(grid: np.ndarray, origin, step, points: np.ndarray) -> np.ndarray:
+    """Bilinearly interpolate a (G, G, 2) grid sampled at origin + index * step
+
+    Points outside the sampled region are returned as NaN.
+    """
+    size = grid.shape[0]
+    fx = (points[..., 0] - origin[0]) / step[0]
+    fy = (points[..., 1] - origin[1]) / step[1]
+    valid = (fx >= 0) & (fx <= size - 1) & (fy >= 0) & (fy <= size - 1)
+    fx = np.where(valid, fx, 0)
+    fy = np.where(valid, fy, 0)
+
+    ix = np.minimum(fx.astype(np.intp), size - 2)
+    iy = np.minimum(fy.astype(np.intp), size - 2)
+    tx = (fx - ix)[..., None]
+    ty = (fy - iy)[..., None]
+
+    top = grid[iy, ix] * (1 - tx) + grid[iy, ix + 1] * tx
+    bottom = grid[iy + 1, ix] * (1 - tx) + grid[iy + 1, ix + 1] * tx
+    result = top * (1 - ty) + bottom * ty
+    result[~valid] = np.nan
+    return result
+
+
+class CameraModel:
+    """Vectorised pixel <-> ray mapping for one camera of one device
+
+    :param connection: An open Connection.
+    :param perspective: The camera to model.
+    :param image_size: The (width, height) of the camera images, in pixels.
+    :param device: An open Device. Defaults to the primary device.
+    :param grid_size: The number of samples along each axis of the lookup grids.
+        Defaults to 64, the resolution of the LeapC distortion matrix.
+    :param calibration: The calibration to use when a device is given.
+    """
+
+    def __init__(
+        self,
+        connection: Connection,
+        perspective: PerspectiveType,
+        image_size: Tuple[int, int],
+        *,
+        device: Optional[Device] = None,
+        grid_size: int = 64,
+        calibration: CameraCalibrationType = CameraCalibrationType.infraredCalibration,
+    ):
+        self._perspective = perspective
+        self._image_size = image_size
+
+        intrinsic = get_camera_matrix(connection, perspective, device)
+        self._intrinsic = np.array(intrinsic, dtype=np.float64).reshape(3, 3, order="F")
+        extrinsic = get_extrinsic_matrix(connection, perspective, device)
+        self._extrinsic = np.array(extrinsic, dtype=np.float64).reshape(4, 4, order="F")
+        self._rotation = self._extrinsic[:3, :3]
+        self._translation = self._extrinsic[:3, 3]
+        self._origin = -self._rotation.T @ self._translation
+
+        def to_ray(pixel):
+            return pixel_to_rectilinear(connection, perspective, pixel, device, calibration)
+
+        def to_pixel(ray):
+            return rectilinear_to_pixel(connection, perspective, ray, device, calibration)
+
+        width, height = image_size
+        xs = np.linspace(0, width - 1, grid_size)
+        ys = np.linspace(0, height - 1, grid_size)
+        self._pixel_origin = (xs[0], ys[0])
+        self._pixel_step = (xs[1] - xs[0], ys[1] - ys[0])
+        self._ray_grid = np.array([[to_ray((x, y)) for x in xs] for y in ys])
+
+        ray_min = np.nanmin(self._ray_grid, axis=(0, 1))
+        ray_max = np.nanmax(self._ray_grid, axis=(0, 1))
+        rxs = np.linspace(ray_min[0], ray_max[0], grid_size)
+        rys = np.linspace(ray_min[1], ray_max[1], grid_size)
+        self._ray_origin = (rxs[0], rys[0])
+        self._ray_step = (rxs[1] - rxs[0], rys[1] - rys[0])
+        self._pixel_grid = np.array([[to_pixel((x, y)) for x in rxs] for y in rys])
+
+    @property
+    def perspective(self):
+        return self._perspective
+
+    @property
+    def image_size(self):
+        return self._image_size
+
+    @property
+    def intrinsic(self) -> np.ndarray:
+        """The 3x3 camera matrix"""
+        return self._intrinsic
+
+    @property
+    def extrinsic(self) -> np.ndarray:
+        """The 4x4 matrix from tracking space into the camera frame"""
+        return self._extrinsic
+
+    @property
+    def origin(self) -> np.ndarray:
+        """The camera centre in tracking space"""
+        return self._origin
+
+    def rectify(self, pixels) -> np.ndarray:
+        """Convert (..., 2) pixels into (..., 2) rectilinear ray slopes"""
+        pixels = np.asarray(pixels, dtype=np.float64)
+        return _interpolate(self._ray_grid, self._pixel_origin, self._pixel_step, pixels)
+
+    def distort(self, rays) -> np.ndarray:
+        """Convert (..., 2) rectilinear ray slopes into (..., 2) pixels
+
+        Rays which do not land on the image are returned as NaN.
+        """
+        rays = np.asarray(rays, dtype=np.float64)
+        pixels = _interpolate(self._pixel_grid, self._ray_origin, self._ray_step, rays)
+        width, height = self._image_size
+        outside = (
+            (pixels[..., 0] < 0)
+            | (pixels[..., 0] > width - 1)
+            | (pixels[..., 1] < 0)
+            | (pixels[..., 1] > height - 1)
+        )
+        pixels[outside] = np.nan
+        return pixels
+
+    def project(self, points) -> np.ndarray:
+        """Project (..., 3) points in tracking space into (..., 2) pixels
+
+        Points behind the camera or outside of the image are returned as NaN.
+        """
+        points = np.asarray(points, dtype=np.float64)
+        camera_points = points @ self._rotation.T + self._translation
+        depth = camera_points[..., 2:3]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rays = np.where(depth > 0, camera_points[..., :2] / depth, np.nan)
+        return self.distort(rays)
+
+    def unproject(self, pixels) -> np.ndarray:
+        """Convert (..., 2) pixels into (..., 3) unit ray directions in tracking space
+
+        Every ray starts at `origin`.
+        """
+        rays = self.rectify(pixels)
+        directions = np.concatenate([rays, np.ones(rays.shape[:-1] + (1,))], axis=-1)
+        directions /= np.linalg.norm(directions, axis=-1, keepdims=True)
+        return directions @ self._rotation
+
+
+class CameraModels:
+    """Cache of CameraModels keyed by device id and perspective
+
+    Building a CameraModel samples LeapC a few thousand times, so models are built on first
+    use and then reused until they are invalidated.
+
+    :param connection: An open Connection.
+    :param image_size: The (width, height) of the camera images, in pixels.
+    """
+
+    def __init__(self, connection: Connection, image_size: Tuple[int, int], **model_kwargs):
+        self._connection = connection
+        self._image_size = image_size
+        self._model_kwargs = model_kwargs
+        self._models: Dict[Tuple[Optional[int], PerspectiveType], CameraModel] = {}
+
+    def get(self, perspective: PerspectiveType, device: Optional[Device] = None) -> CameraModel:
+        """Get the model for a camera, building it if it is not cached
+
+        :param device: An open Device. Defaults to the primary device.
+        """
+        key = (None if device is None else device.id, perspective)
+        model = self._models.get(key)
+        if model is None:
+            model = CameraModel(
+                self._connection,
+                perspective,
+                self._image_size,
+                device=device,
+                **self._model_kwargs,
+            )
+            self._models[key] = model
+        return model
+
+    def invalidate(self, device: Optional[Device] = None):
+        """Drop cached models for a device, or for all devices if none is given"""
+        if device is None:
+            self._models.clear()
+            return
+        for key in [key for key in self._models if key[0] == device.id]:
+            del self._models[key]
+
+    def project(self, points, device: Optional[Device] = None) -> np.ndarray:
+        """Project (..., 3) points into both cameras
+
+        Returns an array of shape (2, ..., 2) holding the left then right pixels.
+        """
+        return np.stack(
+            [
+                self.get(PerspectiveType.stereo_left, device).project(points),
+                self.get(PerspectiveType.stereo_right, device).project(points),
+            ]
+        )
@@ -0,0 +1,143 @@
+"""Converting between LeapC timestamps and an application clock"""
+
+import threading
+import time
+from typing import Callable, Optional
+
+import numpy as np
+from leapc_cffi import ffi, libleapc
+
+from .exceptions import LeapError, success_or_raise
+
+
+def _default_clock() -> int:
+    return time.perf_counter_ns() // 1000
+
+
+class ClockRebaser:
+    """Wrapper around the LeapC clock rebaser
+
+    The rebaser relates an application clock to the LeapC clock used for tracking
+    timestamps. It is kept up to date by a background thread, which periodically samples
+    both clocks and passes them to LeapUpdateRebase.
+
+    Single timestamps are converted by LeapRebaseClock. For arrays, the rebaser is sampled at
+    two points after each update to get a linear mapping, which converts any number of
+    timestamps in either direction with a single NumPy expression.
+
+    :param clock: A function returning the application time in microseconds. Defaults to
+        `time.perf_counter_ns() // 1000`.
+    :param update_interval: Seconds between updates on the background thread. Defaults to
+        0.1 seconds.
+    :param fit_span: The span of application time, in microseconds, between the two points
+        sampled for the linear mapping. Defaults to 1 second.
+    """
+
+    def __init__(
+        self,
+        clock: Optional[Callable[[], int]] = None,
+        *,
+        update_interval: float = 0.1,
+        fit_span: int = 1_000_000,
+    ):
+        self._clock = clock if clock is not None else _default_clock
+        self._update_interval = update_interval
+        self._fit_span = fit_span
+
+        self._rebaser_ptr = ffi.new("LEAP_CLOCK_REBASER*")
+        success_or_raise(libleapc.LeapCreateClockRebaser, self._rebaser_ptr)
+        self._leap_clock_ptr = ffi.new("int64_t*")
+        self._lock = threading.Lock()
+
+        # (user_ref, leap_ref, scale), where leap_time = leap_ref + (user_time - user_ref) * scale.
+        # Working relative to a reference keeps float64 arithmetic exact to the microsecond.
+        self._fit = None
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def __del__(self):
+        if hasattr(self, "_rebaser_ptr"):
+            self.stop()
+            libleapc.LeapDestroyClockRebaser(self._rebaser_ptr[0])
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def start(self):
+        """Update once, then keep updating on a background thread"""
+        if self._thread is not None:
+            return
+        self.update()
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._update_loop, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop_event.set()
+        self._thread.join()
+        self._thread = None
+
+    def update(self):
+        """Sample both clocks and update the rebaser"""
+        # Sample the application clock either side of the LeapC clock, to halve the error
+        before = self._clock()
+        leap_now = libleapc.LeapGetNow()
+        after = self._clock()
+        user_now = (before + after) // 2
+        with self._lock:
+            success_or_raise(libleapc.LeapUpdateRebase, self._rebaser_ptr[0], user_now, leap_now)
+            start = self._rebase(user_now - self._fit_span)
+            end = self._rebase(user_now)
+            self._fit = (user_now, end, (end - start) / self._fit_span)
+
+    def to_leap(self, user_time: int) -> int:
+        """Convert an application timestamp to a LeapC timestamp"""
+        with self._lock:
+            return self._rebase(user_time)
+
+    def now(self) -> int:
+        """Get the LeapC time corresponding to the current application time"""
+        return self.to_leap(self._clock())
+
+    def to_leap_array(self, user_times: np.ndarray) -> np.ndarray:
+        """Convert an array of application timestamps to LeapC timestamps"""
+        user_ref, leap_ref, scale = self._get_fit()
+        offsets = (np.asarray(user_times, dtype=np.int64) - user_ref) * scale
+        return leap_ref + np.rint(offsets).astype(np.int64)
+
+    def to_user_array(self, leap_times: np.ndarray) -> np.ndarray:
+        """Convert an array of LeapC timestamps, such as frame timestamps, to application time"""
+        user_ref, leap_ref, scale = self._get_fit()
+        offsets = (np.asarray(leap_times, dtype=np.int64) - leap_ref) / scale
+        return user_ref + np.rint(offsets).astype(np.int64)
+
+    def to_user(self, leap_time: int) -> int:
+        """Convert a LeapC timestamp to an application timestamp"""
+        return int(self.to_user_array(leap_time))
+
+    def _get_fit(self):
+        fit = self._fit
+        if fit is None:
+            raise RuntimeError("The rebaser has not been updated yet")
+        return fit
+
+    def _rebase(self, user_time: int) -> int:
+        """Call LeapRebaseClock. Must be called with the lock held."""
+        success_or_raise(
+            libleapc.LeapRebaseClock, self._rebaser_ptr[0], user_time, self._leap_clock_ptr
+        )
+        return self._leap_clock_ptr[0]
+
+    def _update_loop(self):
+        while not self._stop_event.wait(self._update_interval):
+            try:
+                self.update()
+            except LeapError:
+                # Keep the previous mapping, and try again at the next update
+                pass
@@ -1,11 +1,11 @@
 from contextlib import contextmanager
-import sys
 import threading
-from typing import Dict, Optional, List, Callable
+from typing import Dict, Iterable, Iterator, NamedTuple, Optional, List, Callable, Union
 from timeit import default_timer as timer
 import time
 import json
 
+import numpy as np
 from leapc_cffi import ffi, libleapc
 
 from .device import Device
@@ -17,7 +17,7 @@ from .enums import (
     TrackingMode,
     PolicyFlag,
 )
-from .event_listener import LatestEventListener, Listener
+from .event_listener import dispatch_event, LatestEventListener, Listener
 from .events import create_event, Event
 from .exceptions import (
     create_exception,
@@ -30,6 +30,38 @@ from .exceptions import (
 )
 
 
+class _PollTimeout:
+    """The type of the TIMEOUT sentinel"""
+
+    def __repr__(self):
+        return "TIMEOUT"
+
+    def __bool__(self):
+        return False
+
+
+# Yielded by `Connection.events` when no message arrives within the poll timeout
+TIMEOUT = _PollTimeout()
+
+_RS_SUCCESS = LeapRS.Success.value
+_RS_TIMEOUT = LeapRS.Timeout.value
+
+# Event types which are dispatched whatever the event filter, as the Connection relies on them
+_ALWAYS_DISPATCHED = frozenset({EventType.Connection.value, EventType.ConnectionLost.value})
+
+
+class PointMapping(NamedTuple):
+    """The point mapping of the scene, as arrays over a buffer owned by the Connection
+
+    The arrays are overwritten by the next call to `Connection.get_point_mapping`.
+    """
+
+    frame_id: int
+    timestamp: int
+    points: np.ndarray  # (n, 3) float32
+    ids: np.ndarray  # (n,) uint32
+
+
 class ConnectionConfig:
     """Configuration for a Connection
 
@@ -55,6 +87,10 @@ class Connection:
     """Connection to a Leap Server
 
     :param listeners: A List of event listeners. Defaults to None
+    :param event_types: The EventTypes to dispatch to listeners. Other messages are discarded
+        as soon as they are polled, before any Event is created. Connection events, and
+        events the Connection is waiting for, are always dispatched. Defaults to None, which
+        dispatches every event.
     :param poll_timeout: A timeout of poll messages, in seconds. Defaults to 1 second.
     :param response_timeout: A timeout to wait for specific events in response to events.
         Defaults to 10 seconds.
@@ -66,12 +102,15 @@ class Connection:
         server_namespace: Optional[Dict[str, str]] = None,
         multi_device_aware: bool = False,
         listeners: Optional[List[Listener]] = None,
+        event_types: Optional[Iterable[EventType]] = None,
         poll_timeout: float = 1,
         response_timeout: float = 10,
     ):
         if listeners is None:
             listeners = []
         self._listeners = listeners
+        # Listeners which only receive events from a single device, keyed by device id
+        self._device_listeners: Dict[int, List[Listener]] = {}
 
         self._connection_ptr = self._create_connection(server_namespace, multi_device_aware)
 
@@ -81,6 +120,23 @@ class Connection:
 
         self._is_open = False
         self._poll_thread = None
+        # Set while a ConnectionGroup is polling this connection
+        self._scheduler = None
+        # The native handle of a running NativePoller. Only the handle is held, not the
+        # NativePoller, which holds this connection, so that there is no reference cycle.
+        self._native_poller = None
+
+        # Integer event types to dispatch, or None for every type. This is replaced rather
+        # than mutated, so the poll thread can read it without locking.
+        self._allowed_types = None
+        self._event_filter = None
+        self._awaited_types: Dict[int, int] = {}
+        self._filter_lock = threading.Lock()
+        self._discarded: Dict[int, int] = {}
+        self.set_event_filter(event_types)
+
+        self._point_mapping_size_ptr = ffi.new("uint64_t*")
+        self._point_mapping_buffer = None
 
     def __del__(self):
         # Since 'destroy_connection' only tells C to free the memory that it allocated
@@ -89,13 +145,67 @@ class Connection:
         if hasattr(self, "_connection_ptr"):
             # We have this 'if' statement to deal with the possibility that an Exception
             # could be raised in the __init__ method, before this has been assigned.
+            # A native poll thread must not be inside LeapPollConnection when it is destroyed.
+            self._stop_native_poller()
             self._destroy_connection(self._connection_ptr)
 
-    def add_listener(self, listener: Listener):
-        self._listeners.append(listener)
+    def add_listener(self, listener: Listener, device: Union[Device, int, None] = None):
+        """Add a listener to this connection
+
+        :param listener: The listener to add.
+        :param device: A Device or device id. If given, the listener only receives events
+            from that device, which requires a multi device aware Connection. Defaults to
+            None, in which case the listener receives every event.
+        """
+        if device is None:
+            self._listeners.append(listener)
+            return
+        device_id = self._get_device_id(device)
+        # Replace rather than mutate the list so the poll thread never sees a partial update
+        listeners = self._device_listeners.get(device_id, [])
+        self._device_listeners[device_id] = listeners + [listener]
+
+    def remove_listener(self, listener: Listener, device: Union[Device, int, None] = None):
+        """Remove a listener which was added with the same `device` argument"""
+        if device is None:
+            self._listeners.remove(listener)
+            return
+        device_id = self._get_device_id(device)
+        listeners = list(self._device_listeners[device_id])
+        listeners.remove(listener)
+        if listeners:
+            self._device_listeners[device_id] = listeners
+        else:
+            del self._device_listeners[device_id]
 
-    def remove_listener(self, listener: Listener):
-        self._listeners.remove(listener)
+    def set_event_filter(self, event_types: Optional[Iterable[EventType]]):
+        """Set the EventTypes to dispatch to listeners
+
+        :param event_types: The types to dispatch, or None to dispatch every event.
+        """
+        if event_types is None:
+            event_filter = None
+        else:
+            event_filter = frozenset(t.value for t in event_types) | _ALWAYS_DISPATCHED
+        with self._filter_lock:
+            self._event_filter = event_filter
+            self._update_allowed_types()
+
+    @property
+    def event_filter(self) -> Optional[List[EventType]]:
+        """The EventTypes dispatched to listeners, or None if every event is dispatched"""
+        event_filter = self._event_filter
+        return None if event_filter is None else [EventType(t) for t in sorted(event_filter)]
+
+    @property
+    def discarded_counts(self) -> Dict[EventType, int]:
+        """The number of messages of each type discarded by the event filter"""
+        return {EventType(t): count for t, count in list(self._discarded.items())}
+
+    @property
+    def discarded(self) -> int:
+        """The total number of messages discarded by the event filter"""
+        return sum(list(self._discarded.values()))
 
     def poll(self, timeout: Optional[float] = None) -> Event:
         """Manually poll the connection from this thread
@@ -105,7 +215,7 @@ class Connection:
         :param timeout: The timeout of the poll, in seconds.
             Defaults to the number the Connection was initialised with.
         """
-        if self._poll_thread is not None:
+        if self._is_polled():
             raise LeapConcurrentPollError
         if timeout is None:
             timeout = self._poll_timeout
@@ -115,6 +225,73 @@ class Connection:
         success_or_raise(libleapc.LeapPollConnection, self._connection_ptr[0], timeout, event_ptr)
         return create_event(event_ptr)
 
+    def events(
+        self,
+        types: Optional[Iterable[EventType]] = None,
+        timeout: Optional[float] = None,
+    ) -> Iterator[Union[Event, _PollTimeout]]:
+        """Manually poll the connection from this thread, yielding events as they arrive
+
+        One message buffer is reused for every poll, and messages of other types are
+        discarded before any Event is created. If no message arrives within the timeout,
+        TIMEOUT is yielded instead of raising LeapTimeoutError, so the caller can do other
+        work or stop iterating. Listeners are not notified.
+
+        A TrackingEvent copies its frame header, hands and metadata out of the message buffer
+        when it is created, so it stays valid after later polls. Other events may refer to
+        LeapC memory which is only valid until the next poll, so they should be handled
+        before asking for the next event.
+
+        :param types: The EventTypes to yield. Defaults to every type.
+        :param timeout: The timeout of each poll, in seconds.
+            Defaults to the number the Connection was initialised with.
+        """
+        if self._is_polled():
+            raise LeapConcurrentPollError
+        timeout = self._poll_timeout if timeout is None else int(timeout * 1000)
+        type_values = None if types is None else frozenset(t.value for t in types)
+        connection = self._connection_ptr[0]
+        event_ptr = ffi.new("LEAP_CONNECTION_MESSAGE*")
+        poll = libleapc.LeapPollConnection
+
+        while True:
+            result = poll(connection, timeout, event_ptr)
+            if result == _RS_TIMEOUT:
+                yield TIMEOUT
+            elif result != _RS_SUCCESS:
+                raise create_exception(LeapRS(result))
+            elif type_values is None or event_ptr.type in type_values:
+                yield create_event(event_ptr)
+
+    def poll_many(self, max_events: Optional[int] = None, *, timeout: float = 0) -> List[Event]:
+        """Manually poll every pending message from this thread
+
+        Waits up to `timeout` for the first message, then takes messages until none are
+        waiting. Listeners are not notified. Every message is polled into the same buffer, so
+        as with `events`, only the TrackingEvents in the result are fully valid: other events
+        may refer to LeapC memory which later polls have reused.
+
+        :param max_events: The most events to take. Defaults to no limit.
+        :param timeout: The timeout for the first message, in seconds. Defaults to 0.
+        """
+        if self._is_polled():
+            raise LeapConcurrentPollError
+        connection = self._connection_ptr[0]
+        event_ptr = ffi.new("LEAP_CONNECTION_MESSAGE*")
+        poll = libleapc.LeapPollConnection
+
+        events = []
+        poll_timeout = int(timeout * 1000)  # Seconds to milliseconds
+        while max_events is None or len(events) < max_events:
+            result = poll(connection, poll_timeout, event_ptr)
+            if result == _RS_TIMEOUT:
+                break
+            if result != _RS_SUCCESS:
+                raise create_exception(LeapRS(result))
+            events.append(create_event(event_ptr))
+            poll_timeout = 0
+        return events
+
     def poll_until(
         self,
         event_type: EventType,
@@ -242,6 +419,33 @@ class Connection:
         )
         return ConnectionStatus(connection_info_ptr.status)
 
+    def get_point_mapping(self) -> PointMapping:
+        """Get the current point mapping of the scene
+
+        The points and ids are NumPy views over a buffer which is reused, and only
+        reallocated when the mapping outgrows it, so copy them if they need to outlive the
+        next call.
+        """
+        size_ptr = self._point_mapping_size_ptr
+        success_or_raise(libleapc.LeapGetPointMappingSize, self._connection_ptr[0], size_ptr)
+        if self._point_mapping_buffer is None or size_ptr[0] > len(self._point_mapping_buffer):
+            self._point_mapping_buffer = ffi.new("char[]", size_ptr[0])
+        size_ptr[0] = len(self._point_mapping_buffer)
+
+        mapping_ptr = ffi.cast("LEAP_POINT_MAPPING*", self._point_mapping_buffer)
+        success_or_raise(
+            libleapc.LeapGetPointMapping, self._connection_ptr[0], mapping_ptr, size_ptr
+        )
+        n_points = mapping_ptr.nPoints
+        if n_points == 0:
+            points = np.zeros((0, 3), dtype=np.float32)
+            ids = np.zeros(0, dtype=np.uint32)
+        else:
+            points_buffer = ffi.buffer(mapping_ptr.pPoints, n_points * ffi.sizeof("LEAP_VECTOR"))
+            points = np.frombuffer(points_buffer, dtype=np.float32).reshape(n_points, 3)
+            ids = np.frombuffer(ffi.buffer(mapping_ptr.pIDs, n_points * 4), dtype=np.uint32)
+        return PointMapping(mapping_ptr.frame_id, mapping_ptr.timestamp, points, ids)
+
     def get_devices(self) -> List[Device]:
         """Get the devices which the Server knows about"""
         count_ptr = ffi.new("uint32_t*")
@@ -319,6 +523,7 @@ class Connection:
 
     def _close_connection(self):
         # Close the connection. Must be done on all opened connections.
+        self._stop_native_poller()
         if self._connection_ptr is not None:
             libleapc.LeapCloseConnection(self._connection_ptr[0])
         self._is_open = False
@@ -340,28 +545,83 @@ class Connection:
             self._stop_poll_flag = False
             self._poll_thread = None
 
+    def _is_polled(self) -> bool:
+        """Whether a poll thread, ConnectionGroup or NativePoller is polling this connection"""
+        return (
+            self._poll_thread is not None
+            or self._scheduler is not None
+            or self._native_poller is not None
+        )
+
+    def _stop_native_poller(self):
+        """Stop a running NativePoller, waiting for its thread's current poll to finish"""
+        poller = self._native_poller
+        if poller is not None:
+            self._native_poller = None
+            libleapc.LeapPyPollerStop(poller)
+
     def _poll_loop(self):
         event_ptr = ffi.new("LEAP_CONNECTION_MESSAGE*")
         while True:
             if self._stop_poll_flag:
                 break
             try:
-                success_or_raise(
-                    libleapc.LeapPollConnection,
-                    self._connection_ptr[0],
-                    self._poll_timeout,
-                    event_ptr,
-                )
-                event = create_event(event_ptr)
-                for listener in self._listeners:
-                    try:
-                        listener.on_event(event)
-                    except Exception as exc:
-                        msg = f"Caught exception in listener callback: {type(exc)}, {exc}, {exc.__traceback__}"
-                        print(msg, file=sys.stderr)
+                self._poll_and_dispatch(self._poll_timeout, event_ptr)
             except LeapError as exc:
-                for listener in self._listeners:
-                    listener.on_error(exc)
+                self._dispatch_error(exc)
+
+    def _poll_and_dispatch(self, timeout: int, event_ptr: ffi.CData):
+        """Poll once, then notify listeners of the event
+
+        Raises a LeapError if the poll fails, including LeapTimeoutError if there was no
+        message within the timeout.
+
+        :param timeout: The poll timeout, in milliseconds.
+        :param event_ptr: The `LEAP_CONNECTION_MESSAGE*` to poll into.
+        """
+        success_or_raise(libleapc.LeapPollConnection, self._connection_ptr[0], timeout, event_ptr)
+        allowed_types = self._allowed_types
+        if allowed_types is not None and event_ptr.type not in allowed_types:
+            self._discarded[event_ptr.type] = self._discarded.get(event_ptr.type, 0) + 1
+            return
+        self._dispatch(create_event(event_ptr), event_ptr.device_id)
+
+    def _update_allowed_types(self):
+        """Recompute the types to dispatch. Must be called with the filter lock held."""
+        if self._event_filter is None:
+            self._allowed_types = None
+        else:
+            self._allowed_types = self._event_filter | frozenset(self._awaited_types)
+
+    def _await_type(self, event_type: EventType, awaiting: bool):
+        """Mark an event type as being waited for, so the event filter does not discard it"""
+        with self._filter_lock:
+            count = self._awaited_types.get(event_type.value, 0) + (1 if awaiting else -1)
+            if count > 0:
+                self._awaited_types[event_type.value] = count
+            else:
+                self._awaited_types.pop(event_type.value, None)
+            self._update_allowed_types()
+
+    def _dispatch(self, event: Event, device_id: int):
+        """Notify the listeners for all devices, then those for the event's device"""
+        dispatch_event(self._listeners, event)
+        dispatch_event(self._device_listeners.get(device_id, ()), event)
+
+    def _dispatch_error(self, error: LeapError):
+        for listener in self._listeners:
+            listener.on_error(error)
+        for listeners in list(self._device_listeners.values()):
+            for listener in listeners:
+                listener.on_error(error)
+
+    @staticmethod
+    def _get_device_id(device: Union[Device, int]) -> int:
+        if isinstance(device, Device):
+            if device.id is None:
+                raise ValueError("Device does not have an id")
+            return device.id
+        return device
 
     def _call_and_wait_for_event(
         self,
@@ -380,6 +640,7 @@ class Connection:
         Return the requested event.
         """
         listener = LatestEventListener(event_type)
+        self._await_type(event_type, True)
         self.add_listener(listener)
 
         if func is not None:
@@ -390,6 +651,7 @@ class Connection:
                 func(*args)
             except Exception as exc:
                 self.remove_listener(listener)
+                self._await_type(event_type, False)
                 raise exc
 
         if timeout is None:
@@ -399,6 +661,7 @@ class Connection:
         while listener.event is None and timer() - start_time < timeout:
             time.sleep(0.01)
         self.remove_listener(listener)
+        self._await_type(event_type, False)
 
         if listener.event is None:
             raise LeapTimeoutError("Did not received expected event in time")
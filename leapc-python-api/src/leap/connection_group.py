@@ -0,0 +1,243 @@
+"""Polling several Connections from a shared pool of threads"""
+
+from collections import deque
+from contextlib import contextmanager
+import threading
+import time
+from timeit import default_timer as timer
+from typing import Dict, List, Optional
+
+from leapc_cffi import ffi
+
+from .connection import Connection
+from .enums import EventType
+from .event_listener import LatestEventListener, Listener
+from .exceptions import LeapError, LeapTimeoutError
+from .functions import get_now
+
+
+class ConnectionMetrics:
+    """Polling statistics for one Connection in a ConnectionGroup
+
+    LeapC does not expose the depth of its message queue, so the backlog is estimated from
+    how the most recent turns went: a turn which reaches the batch limit means that more
+    messages were waiting.
+    """
+
+    def __init__(self):
+        self.messages = 0
+        self.errors = 0
+        self.turns = 0
+        self.saturated_turns = 0
+        # The number of consecutive turns which reached the batch limit
+        self.backlog_turns = 0
+        # Microseconds between the latest tracking frame's timestamp and its dispatch
+        self.tracking_latency = None
+
+    @property
+    def has_backlog(self) -> bool:
+        return self.backlog_turns > 0
+
+    def as_dict(self) -> Dict[str, object]:
+        return {
+            "messages": self.messages,
+            "errors": self.errors,
+            "turns": self.turns,
+            "saturated_turns": self.saturated_turns,
+            "backlog_turns": self.backlog_turns,
+            "tracking_latency": self.tracking_latency,
+        }
+
+
+class _TrackingLatencyListener(Listener):
+    def __init__(self, metrics: ConnectionMetrics):
+        self._metrics = metrics
+
+    def on_tracking_event(self, event):
+        self._metrics.tracking_latency = get_now() - event.timestamp
+
+
+class ConnectionGroup:
+    """Poll several Connections from a fixed pool of worker threads
+
+    Connections are serviced in round-robin order. A worker takes the next connection from a
+    shared queue, polls it with a short timeout until it either times out or `max_batch`
+    messages have been dispatched, and then returns it to the back of the queue. A
+    connection is only ever held by one worker, so its listeners are never called
+    concurrently.
+
+    Connections must not be opened with `auto_poll=True`; the group opens them itself.
+
+    :param connections: The connections to poll. More can be added before the group is
+        connected.
+    :param workers: The number of worker threads. Defaults to 1.
+    :param poll_timeout: The timeout of each individual poll, in seconds. Defaults to 2ms.
+    :param max_batch: The most messages to dispatch from one connection before moving on to
+        the next. Defaults to 16.
+    """
+
+    def __init__(
+        self,
+        connections: Optional[List[Connection]] = None,
+        *,
+        workers: int = 1,
+        poll_timeout: float = 0.002,
+        max_batch: int = 16,
+    ):
+        if workers < 1:
+            raise ValueError("A ConnectionGroup needs at least one worker")
+        self._connections: List[Connection] = []
+        self._metrics: Dict[int, ConnectionMetrics] = {}
+        self._latency_listeners = {}
+        self._n_workers = workers
+        self._poll_timeout = int(poll_timeout * 1000)  # Seconds to milliseconds
+        self._max_batch = max_batch
+
+        self._queue = deque()
+        self._queue_condition = threading.Condition()
+        self._workers: List[threading.Thread] = []
+        self._stop_flag = False
+
+        for connection in connections or []:
+            self.add(connection)
+
+    @property
+    def connections(self) -> List[Connection]:
+        return list(self._connections)
+
+    def add(self, connection: Connection):
+        """Add a connection to the group, before the group is connected"""
+        if self._workers:
+            raise RuntimeError("Cannot add connections while the group is running")
+        metrics = ConnectionMetrics()
+        self._connections.append(connection)
+        self._metrics[id(connection)] = metrics
+        self._latency_listeners[id(connection)] = _TrackingLatencyListener(metrics)
+
+    def metrics(self, connection: Connection) -> ConnectionMetrics:
+        """Get the polling statistics of a connection in this group"""
+        return self._metrics[id(connection)]
+
+    def all_metrics(self) -> List[Dict[str, object]]:
+        """Get a snapshot of the statistics of every connection, in the order they were added"""
+        return [self._metrics[id(connection)].as_dict() for connection in self._connections]
+
+    @contextmanager
+    def open(self, *, timeout: float = 10):
+        """Open every connection and start polling them
+
+        :param timeout: A timeout for the initial connection of each Connection, in seconds.
+            Defaults to 10s.
+        """
+        self.connect(timeout=timeout)
+        try:
+            yield self
+        finally:
+            self.disconnect()
+
+    def connect(self, *, timeout: float = 10):
+        """Open every connection and start polling them
+
+        The caller is responsible for disconnecting afterwards.
+
+        :param timeout: A timeout for the initial connection of each Connection, in seconds.
+            Defaults to 10s.
+        """
+        connected_listeners = []
+        opened = []
+        try:
+            for connection in self._connections:
+                listener = LatestEventListener(EventType.Connection)
+                connection.add_listener(listener)
+                connected_listeners.append(listener)
+                connection.connect(auto_poll=False)
+                connection.add_listener(self._latency_listeners[id(connection)])
+                connection._scheduler = self
+                opened.append(connection)
+                self._queue.append(connection)
+        except BaseException:
+            # Roll back the connections opened so far, so a failed connect leaves nothing behind
+            self._queue.clear()
+            for connection, listener in zip(self._connections, connected_listeners):
+                connection.remove_listener(listener)
+            self._close_connections(opened)
+            raise
+
+        self._stop_flag = False
+        for _ in range(self._n_workers):
+            worker = threading.Thread(target=self._worker_loop, daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+        start_time = timer()
+        try:
+            while timer() - start_time < timeout:
+                if all(listener.event is not None for listener in connected_listeners):
+                    break
+                time.sleep(0.01)
+            else:
+                self.disconnect()
+                raise LeapTimeoutError("Did not connect to every server in time")
+        finally:
+            for connection, listener in zip(self._connections, connected_listeners):
+                connection.remove_listener(listener)
+
+    def disconnect(self):
+        """Stop polling and close every connection"""
+        with self._queue_condition:
+            self._stop_flag = True
+            self._queue_condition.notify_all()
+        for worker in self._workers:
+            worker.join()
+        self._workers = []
+        self._queue.clear()
+        self._close_connections(self._connections)
+
+    def _close_connections(self, connections: List[Connection]):
+        for connection in connections:
+            connection._scheduler = None
+            try:
+                connection.remove_listener(self._latency_listeners[id(connection)])
+            except ValueError:
+                pass  # Already disconnected
+            connection.disconnect()
+
+    def _worker_loop(self):
+        event_ptr = ffi.new("LEAP_CONNECTION_MESSAGE*")
+        while True:
+            with self._queue_condition:
+                while not self._queue and not self._stop_flag:
+                    self._queue_condition.wait()
+                if self._stop_flag:
+                    return
+                connection = self._queue.popleft()
+
+            try:
+                self._service(connection, event_ptr)
+            finally:
+                with self._queue_condition:
+                    self._queue.append(connection)
+                    self._queue_condition.notify()
+
+    def _service(self, connection: Connection, event_ptr: ffi.CData):
+        """Dispatch up to `max_batch` messages from a single connection"""
+        metrics = self._metrics[id(connection)]
+        metrics.turns += 1
+        n_messages = 0
+        while n_messages < self._max_batch:
+            try:
+                connection._poll_and_dispatch(self._poll_timeout, event_ptr)
+            except LeapTimeoutError:
+                break
+            except LeapError as exc:
+                metrics.errors += 1
+                connection._dispatch_error(exc)
+                break
+            n_messages += 1
+
+        metrics.messages += n_messages
+        if n_messages == self._max_batch:
+            metrics.saturated_turns += 1
+            metrics.backlog_turns += 1
+        else:
+            metrics.backlog_turns = 0
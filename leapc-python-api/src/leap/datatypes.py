@@ -1,7 +1,11 @@
 """Wrappers for LeapC Data types"""
 
+from typing import NamedTuple, Tuple
+
+import numpy as np
+
 from .cstruct import LeapCStruct
-from .enums import HandType
+from .enums import HandType, ImageType, ImageFormat
 from leapc_cffi import ffi
 
 
@@ -235,7 +239,115 @@ class Hand(LeapCStruct):
         return Bone(self._data.arm)
 
 
+class HeadPose(NamedTuple):
+    """A head pose, copied out of a LEAP_HEAD_POSE_EVENT
+
+    Vectors are (x, y, z) tuples and the orientation is an (x, y, z, w) tuple.
+    """
+
+    timestamp: int
+    position: Tuple[float, float, float]
+    orientation: Tuple[float, float, float, float]
+    linear_velocity: Tuple[float, float, float]
+    angular_velocity: Tuple[float, float, float]
+
+
+class EyePositions(NamedTuple):
+    """Eye positions, copied out of a LEAP_EYE_EVENT
+
+    Positions are (x, y, z) tuples, and errors are the estimated error of each position.
+    """
+
+    frame_id: int
+    timestamp: int
+    left_position: Tuple[float, float, float]
+    right_position: Tuple[float, float, float]
+    left_error: float
+    right_error: float
+
+
+class ImageProperties(LeapCStruct):
+    @property
+    def type(self):
+        return ImageType(self._data.type)
+
+    @property
+    def format(self):
+        return ImageFormat(self._data.format)
+
+    @property
+    def bpp(self):
+        """Get the number of bytes per pixel"""
+        return self._data.bpp
+
+    @property
+    def width(self):
+        return self._data.width
+
+    @property
+    def height(self):
+        return self._data.height
+
+    @property
+    def x_scale(self):
+        return self._data.x_scale
+
+    @property
+    def x_offset(self):
+        return self._data.x_offset
+
+    @property
+    def y_scale(self):
+        return self._data.y_scale
+
+    @property
+    def y_offset(self):
+        return self._data.y_offset
+
+
 class Image(LeapCStruct):
+    """An image from one of the device cameras
+
+    The pixel data and distortion matrix are owned by LeapC, and are only valid until the
+    connection is next polled. Copy anything which needs to outlive the event callback, for
+    example by using an `ImagePool`.
+    """
+
+    @property
+    def properties(self):
+        return ImageProperties(self._data.properties)
+
     @property
     def matrix_version(self):
         return self._data.matrix_version
+
+    @property
+    def shape(self):
+        """Get the shape of the array returned by `as_array`"""
+        properties = self._data.properties
+        if properties.bpp == 1:
+            return properties.height, properties.width
+        return properties.height, properties.width, properties.bpp
+
+    @property
+    def distortion_matrix(self):
+        """Get the distortion matrix as an (N, N, 2) float32 array
+
+        The array is a view over LeapC memory, see `as_array`.
+        """
+        size = ffi.sizeof("LEAP_DISTORTION_MATRIX")
+        n = int(round((size // (2 * ffi.sizeof("float"))) ** 0.5))
+        matrix = np.frombuffer(ffi.buffer(self._data.distortion_matrix, size), dtype=np.float32)
+        return matrix.reshape(n, n, 2)
+
+    def as_array(self):
+        """Get the pixel data as a uint8 array without copying it
+
+        The array has shape (height, width), or (height, width, bpp) for multi-byte pixel
+        formats. It is a view over the buffer owned by LeapC, so it must not be used after
+        the event callback which produced this Image has returned.
+        """
+        properties = self._data.properties
+        size = properties.width * properties.height * properties.bpp
+        pixels = ffi.cast("uint8_t*", self._data.data) + self._data.offset
+        return np.frombuffer(ffi.buffer(pixels, size), dtype=np.uint8).reshape(self.shape)
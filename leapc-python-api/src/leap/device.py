@@ -4,7 +4,16 @@ from leapc_cffi import ffi, libleapc
 
 from .datatypes import LeapCStruct
 from .enums import get_enum_entries, DevicePID, DeviceStatus
-from .exceptions import success_or_raise, LeapError, LeapCannotOpenDeviceError
+from .exceptions import (
+    success_or_raise,
+    LeapError,
+    LeapCannotOpenDeviceError,
+    LeapInsufficientBufferError,
+)
+
+# Large enough for any current device serial, so that LeapGetDeviceInfo is usually only called
+# once. A larger buffer is allocated if LeapC reports that this is too small.
+_SERIAL_BUFFER_SIZE = 64
 
 
 class DeviceNotOpenException(LeapError):
@@ -36,6 +45,14 @@ class DeviceStatusInfo:
 
 
 class DeviceInfo(LeapCStruct):
+    def __init__(self, data, *, owner=None):
+        """Create the DeviceInfo
+
+        The 'owner' argument keeps the serial buffer referenced by the data alive.
+        """
+        super().__init__(data)
+        self._owner = owner
+
     @property
     def status(self):
         return DeviceStatusInfo(self._data.status)
@@ -110,17 +127,25 @@ class Device:
 
     @contextmanager
     def open(self):
+        self._open()
+        try:
+            yield self
+        finally:
+            self._close()
+
+    def _open(self):
         if self._device is not None:
             raise LeapCannotOpenDeviceError("Device is already open")
 
         device_ptr = ffi.new("LEAP_DEVICE*")
         success_or_raise(libleapc.LeapOpenDevice, self._device_ref, device_ptr)
         self._device = device_ptr[0]
-        try:
-            yield self
-        finally:
+
+    def _close(self):
+        if self._device is not None:
+            device = self._device
             self._device = None
-            libleapc.LeapCloseDevice(device_ptr[0])
+            libleapc.LeapCloseDevice(device)
 
     def get_info(self):
         """Get a DeviceInfo object containing information about this device
@@ -132,11 +157,17 @@ class Device:
             raise DeviceNotOpenException()
         info_ptr = ffi.new("LEAP_DEVICE_INFO*")
         info_ptr.size = ffi.sizeof(info_ptr[0])
-        info_ptr.serial = ffi.NULL
-        success_or_raise(libleapc.LeapGetDeviceInfo, self._device, info_ptr)
-        info_ptr.serial = ffi.new("char[]", info_ptr.serial_length)
-        success_or_raise(libleapc.LeapGetDeviceInfo, self._device, info_ptr)
-        return DeviceInfo(info_ptr[0])
+        serial = ffi.new("char[]", _SERIAL_BUFFER_SIZE)
+        info_ptr.serial_length = _SERIAL_BUFFER_SIZE
+        info_ptr.serial = serial
+        try:
+            success_or_raise(libleapc.LeapGetDeviceInfo, self._device, info_ptr)
+        except LeapInsufficientBufferError:
+            # LeapC has updated serial_length to the required size
+            serial = ffi.new("char[]", info_ptr.serial_length)
+            info_ptr.serial = serial
+            success_or_raise(libleapc.LeapGetDeviceInfo, self._device, info_ptr)
+        return DeviceInfo(info_ptr[0], owner=(info_ptr, serial))
 
     def get_camera_count(self):
         if not self._device:
@@ -0,0 +1,156 @@
+"""A registry of connected devices, kept up to date from device events"""
+
+import sys
+import threading
+from typing import Dict, List, Optional
+
+from leapc_cffi import ffi
+
+from .device import Device, DeviceInfo, DeviceStatusInfo
+from .event_listener import Listener
+from .exceptions import LeapError
+
+
+class DeviceRecord:
+    """A device known to a DeviceRegistry, along with its cached DeviceInfo
+
+    The device is held open for as long as it is in the registry.
+    """
+
+    def __init__(self, device: Device, info: DeviceInfo, status: DeviceStatusInfo):
+        self._device = device
+        self._info = info
+        self._serial = info.serial
+        self._status = status
+
+    @property
+    def id(self):
+        return self._device.id
+
+    @property
+    def serial(self):
+        return self._serial
+
+    @property
+    def device(self):
+        return self._device
+
+    @property
+    def info(self):
+        return self._info
+
+    @property
+    def status(self):
+        return self._status
+
+
+class DeviceRegistry(Listener):
+    """Listener which maintains the set of devices known to a Connection
+
+    Each `DeviceEvent` adds a single device, each `DeviceLostEvent` removes one and each
+    `DeviceStatusChangeEvent` updates one in place, so hot-plugging never requires
+    re-listing or re-opening every device. DeviceInfo is fetched once per device and cached.
+
+    Lookups can be made from any thread.
+
+    :param connection: The Connection to subscribe devices on. Only required if
+        `subscribe` is True.
+    :param subscribe: Whether to subscribe to events from each device as it is added. This
+        is required to receive tracking from every device on a multi device aware
+        Connection. Defaults to False.
+    """
+
+    def __init__(self, connection=None, *, subscribe: bool = False):
+        if subscribe and connection is None:
+            raise ValueError("A connection is required to subscribe to devices")
+        self._connection = connection
+        self._subscribe = subscribe
+        self._lock = threading.Lock()
+        self._by_id: Dict[int, DeviceRecord] = {}
+        self._by_serial: Dict[str, DeviceRecord] = {}
+
+    def __len__(self):
+        return len(self._by_id)
+
+    def __contains__(self, device_id: int):
+        return device_id in self._by_id
+
+    def devices(self) -> List[DeviceRecord]:
+        """Get a snapshot of every registered device"""
+        with self._lock:
+            return list(self._by_id.values())
+
+    def get(self, device_id: int) -> Optional[DeviceRecord]:
+        return self._by_id.get(device_id)
+
+    def get_by_serial(self, serial: str) -> Optional[DeviceRecord]:
+        return self._by_serial.get(serial)
+
+    def on_device_event(self, event):
+        device_id = event.device.id
+        if device_id in self._by_id:
+            self._set_status(device_id, event.status)
+            return
+
+        try:
+            record = self._add(event.device.c_data_device_ref, event.status)
+        except LeapError as exc:
+            print(f"Unable to register device {device_id}: {exc}", file=sys.stderr)
+            return
+        self.on_device_added(record)
+
+    def on_device_lost_event(self, event):
+        with self._lock:
+            record = self._by_id.pop(event.device.id, None)
+            if record is not None:
+                self._by_serial.pop(record.serial, None)
+        if record is None:
+            return
+
+        record.device._close()
+        self.on_device_removed(record)
+
+    def on_device_status_change_event(self, event):
+        self._set_status(event.device.id, event.status)
+
+    def on_device_added(self, record: DeviceRecord):
+        """Called after a device has been added. Override to react to new devices."""
+        pass
+
+    def on_device_removed(self, record: DeviceRecord):
+        """Called after a device has been removed. Override to react to lost devices."""
+        pass
+
+    def close(self):
+        """Close every registered device and clear the registry"""
+        with self._lock:
+            records = list(self._by_id.values())
+            self._by_id = {}
+            self._by_serial = {}
+        for record in records:
+            record.device._close()
+
+    def _add(self, device_ref, status: DeviceStatusInfo) -> DeviceRecord:
+        # The device ref in the event lives in LeapC message memory, so take a copy
+        owned_ref = ffi.new("LEAP_DEVICE_REF*")
+        owned_ref[0] = device_ref
+        device = Device(owned_ref[0], owner=owned_ref)
+        device._open()
+        try:
+            info = device.get_info()
+            if self._subscribe:
+                self._connection.subscribe_events(device)
+        except LeapError:
+            device._close()
+            raise
+
+        record = DeviceRecord(device, info, status)
+        with self._lock:
+            self._by_id[record.id] = record
+            self._by_serial[record.serial] = record
+        return record
+
+    def _set_status(self, device_id: int, status: DeviceStatusInfo):
+        record = self._by_id.get(device_id)
+        if record is not None:
+            record._status = status
@@ -1,4 +1,5 @@
-from typing import Optional
+import sys
+from typing import Iterable, Optional
 
 from .events import Event
 from .enums import EventType
@@ -123,3 +124,17 @@ class LatestEventListener(Listener):
     def on_event(self, event: Event):
         if event.type == self._target:
             self.event = event
+
+
+def dispatch_event(listeners: Iterable[Listener], event: Event):
+    """Pass an event to each listener
+
+    An exception raised by one listener is reported and does not stop the others from being
+    notified.
+    """
+    for listener in listeners:
+        try:
+            listener.on_event(event)
+        except Exception as exc:
+            msg = f"Caught exception in listener callback: {type(exc)}, {exc}, {exc.__traceback__}"
+            print(msg, file=sys.stderr)
@@ -4,10 +4,13 @@ These are created so that the members can be accessed as our custom Python objec
 instead of C Objects.
 """
 
+from .arrays import hands_from_ptr, MAX_HANDS, RECORD_DTYPE
 from .cstruct import LeapCStruct
-from .datatypes import FrameHeader, Hand, Vector, Image
+from .datatypes import EyePositions, FrameHeader, HeadPose, Hand, Vector, Image
 from .device import Device, DeviceStatusInfo
 from .enums import EventType, get_enum_entries, TrackingMode, PolicyFlag, IMUFlag
+from .serialization import decode_record, encode_record
+import numpy as np
 from leapc_cffi import ffi
 
 
@@ -143,15 +146,23 @@ class TrackingEvent(Event):
     _EVENT_ATTRIBUTE = "tracking_event"
 
     def __init__(self, data):
-        super().__init__(data)
-        self._info = FrameHeader(data.info)
-        self._tracking_frame_id = data.tracking_frame_id
-        self._num_hands = data.nHands
-        self._framerate = data.framerate
+        # Copy the frame and its hands out of the message, which LeapC reuses on the next
+        # poll, so the event stays valid however long it is kept
+        frame = ffi.new("LEAP_TRACKING_EVENT*")
+        frame[0] = data[0]
+        super().__init__(frame)
+        header = ffi.new("LEAP_FRAME_HEADER*")
+        header.frame_id = frame.info.frame_id
+        header.timestamp = frame.info.timestamp
+        self._info = FrameHeader(header)
+        self._tracking_frame_id = frame.tracking_frame_id
+        self._num_hands = frame.nHands
+        self._framerate = frame.framerate
 
         # Copy hands to safe region of memory to protect against use-after-free (UAF)
         self._hands = ffi.new("LEAP_HAND[2]")
         ffi.memmove(self._hands, data.pHands, ffi.sizeof("LEAP_HAND") * data.nHands)
+        frame.pHands = self._hands
 
     @property
     def info(self):
@@ -169,10 +180,69 @@ class TrackingEvent(Event):
     def hands(self):
         return [Hand(self._hands[i]) for i in range(self._num_hands)]
 
+    @property
+    def hands_array(self):
+        """Get the hands as an array of `leap.arrays.HAND_DTYPE`, without copying"""
+        return hands_from_ptr(self._hands, self._num_hands)
+
     @property
     def framerate(self):
         return self._framerate
 
+    def to_record(self, record=None):
+        """Copy this event into a `leap.arrays.RECORD_DTYPE` record
+
+        :param record: A record to write into, which avoids an allocation. If not given, a
+            new single element array is returned.
+        """
+        if record is None:
+            record = np.zeros(1, dtype=RECORD_DTYPE)[0]
+        record["timestamp"] = self._info.timestamp
+        record["frame_id"] = self._info.frame_id
+        record["tracking_frame_id"] = self._tracking_frame_id
+        record["framerate"] = self._framerate
+        record["n_hands"] = self._num_hands
+        record["device_id"] = 0 if self._metadata is None else self._metadata.device_id
+        record["hands"] = np.frombuffer(ffi.buffer(self._hands), dtype=record["hands"].dtype)
+        return record
+
+    @classmethod
+    def from_record(cls, record):
+        """Create a TrackingEvent from a `leap.arrays.RECORD_DTYPE` record
+
+        The event has no metadata, as it did not come from a connection.
+        """
+        data = ffi.new("LEAP_TRACKING_EVENT*")
+        data.info.frame_id = int(record["frame_id"])
+        data.info.timestamp = int(record["timestamp"])
+        data.tracking_frame_id = int(record["tracking_frame_id"])
+        data.framerate = float(record["framerate"])
+        data.nHands = min(int(record["n_hands"]), MAX_HANDS)
+        hands = ffi.new("LEAP_HAND[]", MAX_HANDS)
+        ffi.memmove(hands, np.ascontiguousarray(record["hands"]), ffi.sizeof(hands))
+        data.pHands = hands
+        return cls(data)
+
+    def to_bytes(self, *, half_precision=False, reference=None):
+        """Serialise this event in the compact format of `leap.serialization`
+
+        :param half_precision: Whether to round float fields to float16. Defaults to False.
+        :param reference: A previous TrackingEvent to delta encode against. The decoder must
+            be given the same frame. Defaults to None.
+        """
+        ref_record = None if reference is None else reference.to_record()
+        return encode_record(self.to_record(), half_precision=half_precision, reference=ref_record)
+
+    @classmethod
+    def from_bytes(cls, data, *, reference=None):
+        """Create a TrackingEvent from the output of `to_bytes`
+
+        :param data: The serialised event.
+        :param reference: The decoded reference frame, if the event was delta encoded.
+        """
+        ref_record = None if reference is None else reference.to_record()
+        return cls.from_record(decode_record(data, reference=ref_record))
+
 
 class ImageRequestErrorEvent(Event):
     _EVENT_TYPE = EventType.ImageRequestError
@@ -251,8 +321,17 @@ class ImageEvent(Event):
 
     def __init__(self, data):
         super().__init__(data)
+        self._info = FrameHeader(data.info)
         self._images = data.image
 
+    @property
+    def info(self):
+        return self._info
+
+    @property
+    def timestamp(self):
+        return self._info.timestamp
+
     @property
     def image(self):
         return [Image(self._images[0]), Image(self._images[1])]
@@ -262,6 +341,24 @@ class PointMappingChangeEvent(Event):
     _EVENT_TYPE = EventType.PointMappingChange
     _EVENT_ATTRIBUTE = "point_mapping_change_event"
 
+    def __init__(self, data):
+        super().__init__(data)
+        self._frame_id = data.frame_id
+        self._timestamp = data.timestamp
+        self._n_points = data.nPoints
+
+    @property
+    def frame_id(self):
+        return self._frame_id
+
+    @property
+    def timestamp(self):
+        return self._timestamp
+
+    @property
+    def n_points(self):
+        return self._n_points
+
 
 class TrackingModeEvent(Event):
     _EVENT_TYPE = EventType.TrackingMode
@@ -285,11 +382,86 @@ class HeadPoseEvent(Event):
     _EVENT_TYPE = EventType.HeadPose
     _EVENT_ATTRIBUTE = "head_pose_event"
 
+    def __init__(self, data):
+        super().__init__(data)
+        # Copy the pose out of LeapC memory, so it stays valid after the next poll
+        self._pose = HeadPose(
+            data.timestamp,
+            tuple(data.head_position.v),
+            tuple(data.head_orientation.v),
+            tuple(data.head_linear_velocity.v),
+            tuple(data.head_angular_velocity.v),
+        )
+
+    @property
+    def pose(self) -> HeadPose:
+        return self._pose
+
+    @property
+    def timestamp(self):
+        return self._pose.timestamp
+
+    @property
+    def position(self):
+        return self._pose.position
+
+    @property
+    def orientation(self):
+        return self._pose.orientation
+
+    @property
+    def linear_velocity(self):
+        return self._pose.linear_velocity
+
+    @property
+    def angular_velocity(self):
+        return self._pose.angular_velocity
+
 
 class EyesEvent(Event):
     _EVENT_TYPE = EventType.Eyes
     _EVENT_ATTRIBUTE = "eye_event"
 
+    def __init__(self, data):
+        super().__init__(data)
+        # Copy the positions out of LeapC memory, so they stay valid after the next poll
+        self._eyes = EyePositions(
+            data.frame_id,
+            data.timestamp,
+            tuple(data.left_eye_position.v),
+            tuple(data.right_eye_position.v),
+            data.left_eye_estimated_error,
+            data.right_eye_estimated_error,
+        )
+
+    @property
+    def eyes(self) -> EyePositions:
+        return self._eyes
+
+    @property
+    def frame_id(self):
+        return self._eyes.frame_id
+
+    @property
+    def timestamp(self):
+        return self._eyes.timestamp
+
+    @property
+    def left_eye_position(self):
+        return self._eyes.left_position
+
+    @property
+    def right_eye_position(self):
+        return self._eyes.right_position
+
+    @property
+    def left_eye_estimated_error(self):
+        return self._eyes.left_error
+
+    @property
+    def right_eye_estimated_error(self):
+        return self._eyes.right_error
+
 
 class IMUEvent(Event):
     _EVENT_TYPE = EventType.IMU
@@ -316,14 +488,29 @@ class IMUEvent(Event):
     def flags(self):
         return get_enum_entries(IMUFlag, self._flags)
 
+    @property
+    def flags_value(self) -> int:
+        """The flags as an integer bitmask of IMUFlag values, without building a list"""
+        return self._flags
+
     @property
     def acceleration(self):
         return Vector(self._accelerometer)
 
+    @property
+    def raw_accelerometer(self):
+        """The acceleration as `LEAP_VECTOR` cdata, without building a Vector"""
+        return self._accelerometer
+
     @property
     def angular_velocity(self):
         return Vector(self._gyroscope)
 
+    @property
+    def raw_gyroscope(self):
+        """The angular velocity as `LEAP_VECTOR` cdata, without building a Vector"""
+        return self._gyroscope
+
     @property
     def temperature(self):
         return self._temperature
@@ -0,0 +1,278 @@
+"""Export tracking data to columnar formats
+
+Recordings are read in fixed size chunks and written as two tables:
+
+- frames: one row per frame. Columns: frame_index, timestamp, frame_id, tracking_frame_id,
+  framerate, n_hands, device_id.
+- hands: one row per hand. Columns: frame_index, hand_index and timestamp, followed by every
+  field of LEAP_HAND flattened to a scalar column, eg. 'confidence', 'palm_position_x',
+  'index_distal_next_joint_z', 'arm_rotation_w'.
+
+Supported formats are chosen by the output file extension:
+
+- '.parquet' (requires pyarrow)
+- '.arrow' or '.feather', the Arrow IPC file format (requires pyarrow)
+- '.h5' or '.hdf5' (requires h5py), with 'frames' and 'hands' groups of column datasets
+- '.npz', with arrays named 'frames/<column>' and 'hands/<column>'
+
+Parquet and Arrow write the hands table to the output path, and the frames table alongside it
+with '_frames' appended to the file name.
+
+Usage:
+```
+python -m leap.export recording.lmt recording.parquet
+```
+"""
+
+import argparse
+import os
+import tempfile
+from typing import Dict, Iterable, Tuple
+import zipfile
+
+import numpy as np
+
+from .arrays import FRAME_DTYPE, HAND_DTYPE, MAX_HANDS, copy_frame
+from .recording import Recording
+
+_AXES = {3: "xyz", 4: "xyzw"}
+_ELEMENT_NAMES = {
+    "digits": ["thumb", "index", "middle", "ring", "pinky"],
+    "bones": ["metacarpal", "proximal", "intermediate", "distal"],
+}
+
+
+def _flatten(array: np.ndarray, prefix: str, columns: Dict[str, np.ndarray]):
+    for name in array.dtype.names:
+        values = array[name]
+        if name in _ELEMENT_NAMES:
+            for i, element in enumerate(_ELEMENT_NAMES[name]):
+                _flatten(values[:, i], f"{prefix}{element}_", columns)
+        elif values.dtype.names:
+            _flatten(values, f"{prefix}{name}_", columns)
+        elif values.ndim > 1:
+            for i, axis in enumerate(_AXES[values.shape[1]]):
+                columns[f"{prefix}{name}_{axis}"] = values[:, i]
+        else:
+            columns[f"{prefix}{name}"] = values
+
+
+def frame_columns(frames: np.ndarray, first_frame_index: int = 0) -> Dict[str, np.ndarray]:
+    """Get the frames table columns for an array of FRAME_DTYPE"""
+    columns = {"frame_index": np.arange(len(frames), dtype=np.int64) + first_frame_index}
+    _flatten(frames, "", columns)
+    return columns
+
+
+def hand_columns(
+    frames: np.ndarray, hands: np.ndarray, first_frame_index: int = 0
+) -> Dict[str, np.ndarray]:
+    """Get the hands table columns for frame and (n_frames, MAX_HANDS) hand arrays"""
+    valid = np.arange(hands.shape[1]) < frames["n_hands"][:, None]
+    frame_rows, hand_index = np.nonzero(valid)
+    columns = {
+        "frame_index": frame_rows.astype(np.int64) + first_frame_index,
+        "hand_index": hand_index.astype(np.uint8),
+        "timestamp": frames["timestamp"][frame_rows],
+    }
+    _flatten(hands[valid], "", columns)
+    return columns
+
+
+def read_chunks(recording: Recording, chunk_size: int) -> Iterable[Tuple[np.ndarray, np.ndarray]]:
+    """Read a recording as chunks of frame and hand arrays
+
+    The same arrays are reused for every chunk, so each chunk is only valid until the next.
+    """
+    frames = np.zeros(chunk_size, dtype=FRAME_DTYPE)
+    hands = np.zeros((chunk_size, MAX_HANDS), dtype=HAND_DTYPE)
+    while True:
+        n_frames = 0
+        while n_frames < chunk_size:
+            frame_ptr = recording.read_frame_ptr()
+            if frame_ptr is None:
+                break
+            copy_frame(frame_ptr, frames[n_frames], hands[n_frames])
+            n_frames += 1
+        if n_frames > 0:
+            yield frames[:n_frames], hands[:n_frames]
+        if n_frames < chunk_size:
+            return
+
+
+class _ArrowWriter:
+    def __init__(self, path: str, file_format: str, compression: str):
+        import pyarrow
+
+        self._pyarrow = pyarrow
+        self._paths = {"hands": path, "frames": _sibling_path(path, "_frames")}
+        self._format = file_format
+        self._compression = compression
+        self._writers = {}
+
+    def write(self, table_name: str, columns: Dict[str, np.ndarray]):
+        table = self._pyarrow.table(columns)
+        writer = self._writers.get(table_name)
+        if writer is None:
+            path = self._paths[table_name]
+            if self._format == "parquet":
+                import pyarrow.parquet
+
+                writer = pyarrow.parquet.ParquetWriter(
+                    path, table.schema, compression=self._compression
+                )
+            else:
+                import pyarrow.ipc
+
+                writer = pyarrow.ipc.new_file(path, table.schema)
+            self._writers[table_name] = writer
+        writer.write_table(table)
+
+    def close(self):
+        for writer in self._writers.values():
+            writer.close()
+
+
+class _HDF5Writer:
+    def __init__(self, path: str, compression: str):
+        import h5py
+
+        self._file = h5py.File(path, "w")
+        self._compression = None if compression == "none" else "gzip"
+
+    def write(self, table_name: str, columns: Dict[str, np.ndarray]):
+        group = self._file.require_group(table_name)
+        for name, values in columns.items():
+            if name not in group:
+                group.create_dataset(
+                    name,
+                    shape=(0,),
+                    maxshape=(None,),
+                    dtype=values.dtype,
+                    chunks=True,
+                    compression=self._compression,
+                )
+            dataset = group[name]
+            start = dataset.shape[0]
+            dataset.resize((start + len(values),))
+            dataset[start:] = values
+
+    def close(self):
+        self._file.close()
+
+
+class _NpzWriter:
+    """Spools every column to a temporary file, then packs them into the npz when closed
+
+    This keeps memory bounded by the chunk size, since an npz member cannot be appended to.
+    """
+
+    def __init__(self, path: str, compression: str):
+        self._path = path
+        self._compression = zipfile.ZIP_STORED if compression == "none" else zipfile.ZIP_DEFLATED
+        self._directory = tempfile.TemporaryDirectory()
+        self._columns = {}
+
+    def write(self, table_name: str, columns: Dict[str, np.ndarray]):
+        for name, values in columns.items():
+            key = f"{table_name}/{name}"
+            if key not in self._columns:
+                spool_path = os.path.join(self._directory.name, str(len(self._columns)))
+                self._columns[key] = (open(spool_path, "wb"), spool_path, values.dtype)
+            np.ascontiguousarray(values).tofile(self._columns[key][0])
+
+    def close(self):
+        try:
+            with zipfile.ZipFile(self._path, "w", compression=self._compression) as archive:
+                for key, (spool, spool_path, dtype) in self._columns.items():
+                    spool.close()
+                    if os.path.getsize(spool_path) == 0:
+                        values = np.zeros(0, dtype=dtype)
+                    else:
+                        values = np.memmap(spool_path, dtype=dtype, mode="r")
+                    with archive.open(key + ".npy", "w", force_zip64=True) as member:
+                        np.lib.format.write_array(member, values)
+                    del values
+        finally:
+            self._directory.cleanup()
+
+
+def _sibling_path(path: str, suffix: str) -> str:
+    root, ext = os.path.splitext(path)
+    return f"{root}{suffix}{ext}"
+
+
+def _create_writer(path: str, compression: str):
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".parquet":
+        return _ArrowWriter(path, "parquet", compression)
+    if ext in (".arrow", ".feather"):
+        return _ArrowWriter(path, "arrow", compression)
+    if ext in (".h5", ".hdf5"):
+        return _HDF5Writer(path, compression)
+    if ext == ".npz":
+        return _NpzWriter(path, compression)
+    raise ValueError(f"Unsupported export format: '{ext}'")
+
+
+def export_chunks(
+    chunks: Iterable[Tuple[np.ndarray, np.ndarray]], path: str, *, compression: str = "snappy"
+) -> int:
+    """Export chunks of frame and hand arrays to a columnar file
+
+    Returns the number of frames written.
+
+    :param chunks: An iterable of (frames, hands) arrays, as produced by `read_chunks`.
+    :param path: The output file. The format is chosen by its extension.
+    :param compression: The compression to use. Parquet accepts any pyarrow codec name;
+        HDF5 and npz compress unless this is 'none'. Defaults to 'snappy'.
+    """
+    writer = _create_writer(path, compression)
+    n_frames = 0
+    try:
+        for frames, hands in chunks:
+            writer.write("frames", frame_columns(frames, n_frames))
+            writer.write("hands", hand_columns(frames, hands, n_frames))
+            n_frames += len(frames)
+    finally:
+        writer.close()
+    return n_frames
+
+
+def export_recording(
+    recording_path: str, path: str, *, chunk_size: int = 4096, compression: str = "snappy"
+) -> int:
+    """Export a LeapC recording to a columnar file
+
+    Returns the number of frames written.
+
+    :param recording_path: The recording to read.
+    :param path: The output file. The format is chosen by its extension.
+    :param chunk_size: The number of frames held in memory at once. Defaults to 4096.
+    :param compression: See `export_chunks`.
+    """
+    with Recording(recording_path) as recording:
+        return export_chunks(read_chunks(recording, chunk_size), path, compression=compression)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m leap.export",
+        description="Export a LeapC recording to Parquet, Arrow, HDF5 or npz",
+    )
+    parser.add_argument("input", help="The recording to export")
+    parser.add_argument("output", help="The output file, whose extension selects the format")
+    parser.add_argument(
+        "--chunk-size", type=int, default=4096, help="Frames held in memory at once"
+    )
+    parser.add_argument("--compression", default="snappy", help="The compression codec")
+    args = parser.parse_args(argv)
+
+    n_frames = export_recording(
+        args.input, args.output, chunk_size=args.chunk_size, compression=args.compression
+    )
+    print(f"Exported {n_frames} frames to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
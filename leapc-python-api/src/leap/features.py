@@ -0,0 +1,163 @@
+"""Fixed length hand feature vectors for machine learning
+
+`hand_features` turns joint arrays into one vector of FEATURE_SIZE values per hand, for a
+single hand or for any batch of hands at once. Every step is a NumPy operation over the
+whole batch, so a `leap.history.HistoryWindow` of thousands of frames is handled in one
+call:
+
+```
+window = frame_history.last(1000)
+features = features_from_window(window)  # (1000, MAX_HANDS, FEATURE_SIZE)
+```
+
+Each vector is laid out as:
+
+- JOINT_ANGLES: the bend, in radians, between consecutive bones of each digit. (5 x 3)
+- FINGERTIP_DISTANCES: the distance between each pair of fingertips. (10)
+- PALM_JOINTS: every joint in the palm's frame, where x is `normal x direction`, y is the
+  palm normal and z is the palm direction, with the palm position at the origin. (5 x 5 x 3)
+- BONE_LENGTHS: the length of each bone. (5 x 4)
+
+Distances, coordinates and lengths are divided by the length of the middle finger, so the
+features do not depend on the size of the hand.
+"""
+
+from typing import Optional
+
+import numpy as np
+
+from .arrays import joint_positions
+from .enums import HandType
+
+DIGIT_NAMES = ["thumb", "index", "middle", "ring", "pinky"]
+BONE_NAMES = ["metacarpal", "proximal", "intermediate", "distal"]
+
+JOINT_ANGLES = slice(0, 15)
+FINGERTIP_DISTANCES = slice(15, 25)
+PALM_JOINTS = slice(25, 100)
+BONE_LENGTHS = slice(100, 120)
+FEATURE_SIZE = 120
+
+_FINGERTIP_PAIRS = np.triu_indices(5, 1)
+
+FEATURE_NAMES = (
+    [f"{digit}_angle_{joint}" for digit in DIGIT_NAMES for joint in range(1, 4)]
+    + [
+        f"{DIGIT_NAMES[a]}_{DIGIT_NAMES[b]}_distance"
+        for a, b in zip(*(pair.tolist() for pair in _FINGERTIP_PAIRS))
+    ]
+    + [
+        f"{digit}_joint_{joint}_{axis}"
+        for digit in DIGIT_NAMES
+        for joint in range(5)
+        for axis in "xyz"
+    ]
+    + [f"{digit}_{bone}_length" for digit in DIGIT_NAMES for bone in BONE_NAMES]
+)
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norm = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norm > 0, norm, 1)
+
+
+def hand_features(
+    joints: np.ndarray,
+    palm_position: np.ndarray,
+    palm_normal: np.ndarray,
+    palm_direction: np.ndarray,
+    *,
+    hand_types: Optional[np.ndarray] = None,
+    out: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    """Compute the feature vector of each hand
+
+    Hands whose joints are all zero, such as unused slots of a HistoryWindow, give finite
+    features rather than NaN.
+
+    :param joints: A (..., 5, 5, 3) array of joint positions, as returned by
+        `leap.arrays.joint_positions`.
+    :param palm_position: The (..., 3) palm positions.
+    :param palm_normal: The (..., 3) palm normals.
+    :param palm_direction: The (..., 3) palm directions.
+    :param hand_types: The (...) HandType values. If given, left hands are mirrored in the
+        palm's x axis, so that left and right hands in the same pose have the same
+        features. Defaults to None.
+    :param out: A (..., FEATURE_SIZE) array to write into. Defaults to a new float32 array.
+    """
+    joints = np.asarray(joints)
+    batch_shape = joints.shape[:-3]
+    if out is None:
+        out = np.empty(batch_shape + (FEATURE_SIZE,), dtype=np.float32)
+
+    bones = joints[..., 1:, :] - joints[..., :-1, :]  # (..., 5, 4, 3)
+    lengths = np.linalg.norm(bones, axis=-1)  # (..., 5, 4)
+    scale = lengths[..., 2, :].sum(axis=-1)
+    scale = np.where(scale > 0, scale, 1)[..., None]
+
+    # The angle between consecutive bones. Zero length bones, such as the thumb
+    # metacarpal, count as straight.
+    directions = _normalize(bones)
+    cosines = np.sum(directions[..., :-1, :] * directions[..., 1:, :], axis=-1)
+    cosines[(lengths[..., :-1] == 0) | (lengths[..., 1:] == 0)] = 1
+    out[..., JOINT_ANGLES] = np.arccos(np.clip(cosines, -1, 1)).reshape(batch_shape + (15,))
+
+    tips = joints[..., :, 4, :]
+    first, second = _FINGERTIP_PAIRS
+    distances = np.linalg.norm(tips[..., first, :] - tips[..., second, :], axis=-1)
+    out[..., FINGERTIP_DISTANCES] = distances / scale
+
+    # Rows of the palm basis, so coordinates are basis @ (joint - palm_position)
+    normal = _normalize(np.asarray(palm_normal))
+    direction = _normalize(np.asarray(palm_direction))
+    x_axis = _normalize(np.cross(normal, direction))
+    if hand_types is not None:
+        left = np.asarray(hand_types) == HandType.Left.value
+        x_axis = np.where(left[..., None], -x_axis, x_axis)
+    basis = np.stack([x_axis, normal, direction], axis=-2)  # (..., 3, 3)
+    relative = joints - np.asarray(palm_position)[..., None, None, :]
+    palm_joints = np.einsum("...ij,...dkj->...dki", basis, relative)
+    out[..., PALM_JOINTS] = (palm_joints / scale[..., None, None]).reshape(batch_shape + (75,))
+
+    out[..., BONE_LENGTHS] = (lengths / scale[..., None]).reshape(batch_shape + (20,))
+    return out
+
+
+def features_from_hands(
+    hands: np.ndarray, *, mirror_left: bool = True, out: Optional[np.ndarray] = None
+) -> np.ndarray:
+    """Compute the feature vector of each hand in an array of `leap.arrays.HAND_DTYPE`
+
+    :param mirror_left: Whether to mirror left hands to match right hands. Defaults to True.
+    :param out: A (..., FEATURE_SIZE) array to write into. Defaults to a new float32 array.
+    """
+    palm = hands["palm"]
+    return hand_features(
+        joint_positions(hands),
+        palm["position"],
+        palm["normal"],
+        palm["direction"],
+        hand_types=hands["type"] if mirror_left else None,
+        out=out,
+    )
+
+
+def features_from_window(
+    window, *, mirror_left: bool = True, out: Optional[np.ndarray] = None
+) -> np.ndarray:
+    """Compute the feature vector of every hand slot in a `leap.history.HistoryWindow`
+
+    Returns an array of shape (n_frames, n_slots, FEATURE_SIZE). Select the slots holding
+    hands with `window.hand_ids != leap.history.NO_HAND`.
+
+    :param mirror_left: Whether to mirror left hands to match right hands. Defaults to True.
+    :param out: An array to write into. Defaults to a new float32 array.
+    """
+    return hand_features(
+        window.joints,
+        window.palm_position,
+        window.palm_normal,
+        window.palm_direction,
+        hand_types=window.hand_types if mirror_left else None,
+        out=out,
+    )
@@ -1,12 +1,15 @@
 """Wrap around LeapC functions"""
 import leap.enums
 
-from .enums import PerspectiveType
+from .enums import PerspectiveType, CameraCalibrationType
 from .connection import Connection
+from .datatypes import HeadPose
+from .device import Device
+from .events import HeadPoseEvent
 from .exceptions import success_or_raise
 from leapc_cffi import ffi, libleapc
 
-from typing import Optional, List, Dict
+from typing import Optional, List, Dict, Tuple
 
 
 def get_now() -> int:
@@ -64,7 +67,119 @@ def interpolate_frame(
     )
 
 
-def get_extrinsic_matrix(connection: Connection, camera: PerspectiveType) -> ffi.CData:
+def interpolate_head_pose(
+    connection: Connection, timestamp: int, device: Optional[Device] = None
+) -> HeadPose:
+    """Get the head pose at a timestamp, interpolated or predicted by LeapC
+
+    :param device: An open Device to query. Defaults to the primary device.
+    """
+    head_pose_ptr = ffi.new("LEAP_HEAD_POSE_EVENT*")
+    if device is None:
+        success_or_raise(
+            libleapc.LeapInterpolateHeadPose,
+            connection.get_connection_ptr(),
+            timestamp,
+            head_pose_ptr,
+        )
+    else:
+        success_or_raise(
+            libleapc.LeapInterpolateHeadPoseEx,
+            connection.get_connection_ptr(),
+            device.c_data_device,
+            timestamp,
+            head_pose_ptr,
+        )
+    return HeadPoseEvent(head_pose_ptr).pose
+
+
+def get_extrinsic_matrix(
+    connection: Connection, camera: PerspectiveType, device: Optional[Device] = None
+) -> ffi.CData:
+    """Get the 4x4 extrinsic matrix of a camera, in column major order
+
+    :param device: An open Device to query. Defaults to the primary device.
+    """
     matrix = ffi.new("float[]", 16)
-    libleapc.LeapExtrinsicCameraMatrix(connection.get_connection_ptr(), camera.value, matrix)
+    if device is None:
+        libleapc.LeapExtrinsicCameraMatrix(connection.get_connection_ptr(), camera.value, matrix)
+    else:
+        libleapc.LeapExtrinsicCameraMatrixEx(
+            connection.get_connection_ptr(), device.c_data_device, camera.value, matrix
+        )
     return matrix
+
+
+def get_camera_matrix(
+    connection: Connection, camera: PerspectiveType, device: Optional[Device] = None
+) -> ffi.CData:
+    """Get the 3x3 intrinsic matrix of a camera, in column major order
+
+    :param device: An open Device to query. Defaults to the primary device.
+    """
+    matrix = ffi.new("float[]", 9)
+    if device is None:
+        libleapc.LeapCameraMatrix(connection.get_connection_ptr(), camera.value, matrix)
+    else:
+        libleapc.LeapCameraMatrixEx(
+            connection.get_connection_ptr(), device.c_data_device, camera.value, matrix
+        )
+    return matrix
+
+
+def pixel_to_rectilinear(
+    connection: Connection,
+    camera: PerspectiveType,
+    pixel: Tuple[float, float],
+    device: Optional[Device] = None,
+    calibration: CameraCalibrationType = CameraCalibrationType.infraredCalibration,
+) -> Tuple[float, float]:
+    """Convert a pixel in a camera image into a rectilinear ray slope (x/z, y/z)
+
+    :param device: An open Device to query. Defaults to the primary device.
+    :param calibration: The calibration to use when a device is given.
+    """
+    vector = ffi.new("LEAP_VECTOR*")
+    vector.x, vector.y, vector.z = pixel[0], pixel[1], 0
+    if device is None:
+        result = libleapc.LeapPixelToRectilinear(
+            connection.get_connection_ptr(), camera.value, vector[0]
+        )
+    else:
+        result = libleapc.LeapPixelToRectilinearEx(
+            connection.get_connection_ptr(),
+            device.c_data_device,
+            camera.value,
+            calibration.value,
+            vector[0],
+        )
+    return result.x, result.y
+
+
+def rectilinear_to_pixel(
+    connection: Connection,
+    camera: PerspectiveType,
+    ray: Tuple[float, float],
+    device: Optional[Device] = None,
+    calibration: CameraCalibrationType = CameraCalibrationType.infraredCalibration,
+) -> Tuple[float, float]:
+    """Convert a rectilinear ray slope (x/z, y/z) into a pixel in a camera image
+
+    :param device: An open Device to query. Defaults to the primary device.
+    :param calibration: The calibration to use when a device is given.
+    """
+    vector = ffi.new("LEAP_VECTOR*")
+    vector.x, vector.y, vector.z = ray[0], ray[1], 1
+    if device is None:
+        result = libleapc.LeapRectilinearToPixel(
+            connection.get_connection_ptr(), camera.value, vector[0]
+        )
+    else:
+        result = libleapc.LeapRectilinearToPixelEx(
+            connection.get_connection_ptr(),
+            device.c_data_device,
+            camera.value,
+            calibration.value,
+            vector[0],
+        )
+    return result.x, result.y
@@ -0,0 +1,359 @@
+"""Fusing the hands seen by several devices into a single stream of frames
+
+On a multi device aware Connection each device sends its own tracking frames, so a hand in
+view of two devices arrives twice, with different ids. A HandFusion takes world-space
+frames from any number of devices (for example from a `leap.transform.WorldTransform`),
+aligns them in time, works out which hands are the same physical hand, and merges them
+into one frame whose hands keep stable ids:
+
+```
+fusion = HandFusion(listeners=[history])
+world = WorldTransform(connection, placements=placements, listeners=[fusion])
+connection.add_listener(world)
+```
+"""
+
+import threading
+import time
+from typing import Dict, List, NamedTuple, Optional
+
+import numpy as np
+
+from .arrays import HAND_DTYPE, MAX_HANDS, RECORD_DTYPE
+from .enums import EventType
+from .event_listener import dispatch_event, Listener
+from .events import TrackingEvent
+
+# Positions, which are moved by the palm velocity when frames are aligned in time
+_POSITIONS = [
+    ("palm", "position"),
+    ("palm", "stabilized_position"),
+    ("digits", "bones", "prev_joint"),
+    ("digits", "bones", "next_joint"),
+    ("arm", "prev_joint"),
+    ("arm", "next_joint"),
+]
+# Fields which are merged by a weighted average
+_AVERAGED = _POSITIONS + [
+    ("palm", "velocity"),
+    ("palm", "width"),
+    ("digits", "bones", "width"),
+    ("arm", "width"),
+    ("pinch_distance",),
+    ("grab_angle",),
+    ("pinch_strength",),
+    ("grab_strength",),
+]
+# Unit vectors, which are renormalised after averaging
+_DIRECTIONS = [("palm", "normal"), ("palm", "direction")]
+# (x, y, z, w) quaternions
+_ROTATIONS = [("palm", "orientation"), ("digits", "bones", "rotation"), ("arm", "rotation")]
+
+
+def _field(hands: np.ndarray, path) -> np.ndarray:
+    for name in path:
+        hands = hands[name]
+    return hands
+
+
+def _weighted_sum(weights: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """Combine (m, ...) values with (n, m) weights into (n, ...) values, in one matmul"""
+    flat = values.reshape(len(values), -1)
+    return (weights @ flat).reshape(weights.shape[:1] + values.shape[1:])
+
+
+class FusedFrame(NamedTuple):
+    """One frame of fused hands
+
+    `hands` is ordered by confidence, and each hand's `id` is its fused id. It is a view of
+    the HandFusion's buffer, valid until the next fused frame.
+    """
+
+    timestamp: int
+    frame_id: int
+    hands: np.ndarray  # (n,) HAND_DTYPE
+    n_sources: np.ndarray  # (n,) int, the number of devices merged into each hand
+    device_ids: np.ndarray  # (n_devices,) uint32, the devices whose frames were fused
+
+
+class FusionStats(NamedTuple):
+    """Timings of the fusion step, in seconds"""
+
+    frames: int
+    over_budget: int
+    last_duration: float
+    max_duration: float
+
+
+class HandFusion(Listener):
+    """Listener which fuses world-space frames from several devices
+
+    The latest frame from each device is kept. A fused frame is produced once every recent
+    device has sent a new frame, or as soon as any device sends a second frame, so one slow
+    or stalled device never holds back the others. Devices whose latest frame is more than
+    `max_age` older than the newest are left out.
+
+    Each fused frame is built in four vectorised steps:
+
+    - Every hand is moved to the newest timestamp along its palm velocity.
+    - A cost matrix of palm distances between every pair of hands is built, with pairs from
+      the same device or of different chirality excluded. Pairs are then joined greedily,
+      closest first, while they are within `max_distance` and no group would contain two
+      hands from one device.
+    - The hands in each group are merged by averaging weighted by confidence. Quaternions are
+      aligned to the most confident hand before averaging, and unit vectors renormalised.
+    - Each group takes the fused id which its source hands had in the previous fused frame,
+      or a new id if none of them were fused before.
+
+    Fused frames are passed to `on_fused_frame`. If listeners are given, they receive each
+    fused frame as a TrackingEvent holding its MAX_HANDS most confident hands, and every
+    other event unchanged.
+
+    The time taken by each fusion is compared to `time_budget` and reported by `stats`.
+
+    :param max_distance: The furthest apart, in millimetres, that two devices' palms can be
+        and still be taken as the same hand. Defaults to 60.
+    :param max_age: The age, in microseconds, beyond which a device's latest frame is not
+        fused. Defaults to 50,000.
+    :param extrapolate: Whether to move hands along their palm velocity to the fused
+        timestamp. Defaults to True.
+    :param time_budget: The target time for each fusion, in seconds. Defaults to 0.002.
+    :param listeners: A List of event listeners to forward events to. Defaults to None.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_distance: float = 60.0,
+        max_age: int = 50_000,
+        extrapolate: bool = True,
+        time_budget: float = 0.002,
+        listeners: Optional[List[Listener]] = None,
+    ):
+        self._max_distance = max_distance
+        self._max_age = max_age
+        self._extrapolate = extrapolate
+        self._time_budget = time_budget
+        self._listeners = listeners if listeners is not None else []
+        self._lock = threading.Lock()
+
+        # The latest frame from each device, by slot
+        self._slots: Dict[int, int] = {}
+        self._latest = np.zeros(4, dtype=RECORD_DTYPE)
+        self._pending = np.zeros(4, dtype=bool)
+
+        # The fused id of each (device id, hand id) in the last fused frame
+        self._fused_ids: Dict[tuple, int] = {}
+        self._next_id = 1
+        self._frame_id = 0
+
+        self._fused = np.zeros(4 * MAX_HANDS, dtype=HAND_DTYPE)
+        self._input = np.zeros(1, dtype=RECORD_DTYPE)
+        self._output = np.zeros(1, dtype=RECORD_DTYPE)
+
+        self._n_fused = 0
+        self._n_over_budget = 0
+        self._last_duration = 0.0
+        self._max_duration = 0.0
+
+    def add_listener(self, listener: Listener):
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener: Listener):
+        self._listeners.remove(listener)
+
+    @property
+    def stats(self) -> FusionStats:
+        return FusionStats(
+            self._n_fused, self._n_over_budget, self._last_duration, self._max_duration
+        )
+
+    def add_frame(self, record: np.void) -> Optional[FusedFrame]:
+        """Add a world-space `leap.arrays.RECORD_DTYPE` record from one device
+
+        Returns the fused frame if adding this record produced one, otherwise None.
+        """
+        with self._lock:
+            device_id = int(record["device_id"])
+            slot = self._slots.get(device_id)
+            if slot is None:
+                slot = len(self._slots)
+                if slot == len(self._latest):
+                    self._latest = np.concatenate([self._latest, np.zeros_like(self._latest)])
+                    self._pending = np.concatenate([self._pending, np.zeros_like(self._pending)])
+                self._slots[device_id] = slot
+
+            was_pending = self._pending[slot]
+            self._latest[slot] = record
+            self._pending[slot] = True
+
+            n_devices = len(self._slots)
+            timestamps = self._latest["timestamp"][:n_devices]
+            active = timestamps >= timestamps.max() - self._max_age
+            if not (was_pending or np.all(self._pending[:n_devices][active])):
+                return None
+
+            start = time.perf_counter()
+            fused = self._fuse(self._latest[:n_devices][active])
+            self._pending[:] = False
+            self._record_duration(time.perf_counter() - start)
+
+        self.on_fused_frame(fused)
+        if self._listeners:
+            dispatch_event(self._listeners, TrackingEvent.from_record(self._to_record(fused)))
+        return fused
+
+    def on_event(self, event):
+        super().on_event(event)
+        if event.type != EventType.Tracking:
+            dispatch_event(self._listeners, event)
+
+    def on_tracking_event(self, event):
+        self.add_frame(event.to_record(self._input[0]))
+
+    def on_fused_frame(self, frame: FusedFrame):
+        """Called with each fused frame. Override to consume fused frames directly."""
+        pass
+
+    def reset(self):
+        """Forget every device's latest frame and every fused id"""
+        with self._lock:
+            self._slots = {}
+            self._pending[:] = False
+            self._fused_ids = {}
+
+    def _fuse(self, frames: np.ndarray) -> FusedFrame:
+        timestamp = int(frames["timestamp"].max())
+        valid = np.arange(MAX_HANDS) < frames["n_hands"][:, None]
+        hands = frames["hands"][valid]
+        n_hands = len(hands)
+        device_ids = np.broadcast_to(frames["device_id"][:, None], valid.shape)[valid]
+        device_index = np.broadcast_to(np.arange(len(frames))[:, None], valid.shape)[valid]
+
+        if self._extrapolate:
+            age = timestamp - np.broadcast_to(frames["timestamp"][:, None], valid.shape)[valid]
+            offset = hands["palm"]["velocity"] * (age * 1e-6)[:, None]
+            for path in _POSITIONS:
+                field = _field(hands, path)
+                field += offset.reshape(offset.shape[:1] + (1,) * (field.ndim - 2) + (3,))
+
+        labels = self._associate(hands, device_index)
+        n_fused = int(labels.max()) + 1 if n_hands else 0
+        if len(self._fused) < n_fused:
+            self._fused = np.zeros(2 * n_fused, dtype=HAND_DTYPE)
+        out = self._fused[:n_fused]
+        self._frame_id += 1
+        if n_hands == 0:
+            self._fused_ids = {}
+            return FusedFrame(
+                timestamp, self._frame_id, out, np.zeros(0, dtype=int), frames["device_id"].copy()
+            )
+
+        # weights[i, j] is the share of hand j in fused hand i
+        confidence = np.maximum(hands["confidence"].astype(np.float64), 1e-3)
+        weights = np.zeros((n_fused, n_hands))
+        weights[labels, np.arange(n_hands)] = confidence
+        fused_confidence = weights.max(axis=1)
+        order = np.argsort(-fused_confidence, kind="stable")
+        weights = weights[order] / weights[order].sum(axis=1, keepdims=True)
+        reference = np.argmax(weights, axis=1)
+        # The index of the fused hand each source hand is merged into
+        rank = np.empty_like(order)
+        rank[order] = np.arange(n_fused)
+        merged_into = rank[labels]
+
+        out[...] = hands[reference]
+        out["confidence"] = fused_confidence[order]
+        for path in _AVERAGED:
+            _field(out, path)[...] = _weighted_sum(weights, _field(hands, path))
+        for path in _DIRECTIONS:
+            average = _weighted_sum(weights, _field(hands, path))
+            norm = np.linalg.norm(average, axis=-1, keepdims=True)
+            _field(out, path)[...] = average / np.where(norm > 0, norm, 1)
+        for path in _ROTATIONS:
+            rotations = _field(hands, path).astype(np.float64)
+            # q and -q are the same rotation, so flip each to the same side as its reference
+            dot = np.sum(rotations * rotations[reference[merged_into]], axis=-1, keepdims=True)
+            average = _weighted_sum(weights, np.where(dot < 0, -rotations, rotations))
+            norm = np.linalg.norm(average, axis=-1, keepdims=True)
+            _field(out, path)[...] = average / np.where(norm > 0, norm, 1)
+
+        out["id"] = self._assign_ids(hands["id"], device_ids, merged_into, n_fused)
+        return FusedFrame(
+            timestamp,
+            self._frame_id,
+            out,
+            np.count_nonzero(weights, axis=1),
+            frames["device_id"].copy(),
+        )
+
+    def _associate(self, hands: np.ndarray, device_index: np.ndarray) -> np.ndarray:
+        """Group hands which are the same physical hand, returning a group label per hand"""
+        n_hands = len(hands)
+        positions = hands["palm"]["position"].astype(np.float64)
+        cost = np.linalg.norm(positions[:, None] - positions[None], axis=-1)
+        excluded = (device_index[:, None] == device_index[None]) | (
+            hands["type"][:, None] != hands["type"][None]
+        )
+        cost[excluded] = np.inf
+
+        first, second = np.nonzero(np.triu(cost <= self._max_distance, 1))
+        order = np.argsort(cost[first, second], kind="stable")
+
+        group = np.arange(n_hands)
+        # group_devices[g, d] is whether group g has a hand from device d
+        group_devices = np.zeros((n_hands, device_index.max() + 1 if n_hands else 0), bool)
+        group_devices[group, device_index] = True
+        for a, b in zip(first[order].tolist(), second[order].tolist()):
+            ga, gb = group[a], group[b]
+            if ga == gb or np.any(group_devices[ga] & group_devices[gb]):
+                continue
+            group[group == gb] = ga
+            group_devices[ga] |= group_devices[gb]
+
+        return np.unique(group, return_inverse=True)[1].reshape(n_hands)
+
+    def _assign_ids(
+        self, hand_ids: np.ndarray, device_ids: np.ndarray, merged_into: np.ndarray, n_fused: int
+    ) -> np.ndarray:
+        """Give each fused hand the fused id of its source hands in the previous frame"""
+        keys = list(zip(device_ids.tolist(), hand_ids.tolist()))
+
+        # Fused hands are in order of confidence, so the most confident claims an id first
+        fused_ids = np.zeros(n_fused, dtype=np.uint32)
+        taken = set()
+        for i in range(n_fused):
+            members = np.flatnonzero(merged_into == i).tolist()
+            previous = [self._fused_ids.get(keys[j]) for j in members]
+            candidates = [fused_id for fused_id in previous if fused_id not in (None, *taken)]
+            if candidates:
+                fused_id = max(set(candidates), key=candidates.count)
+            else:
+                fused_id = self._next_id
+                self._next_id += 1
+            taken.add(fused_id)
+            fused_ids[i] = fused_id
+
+        self._fused_ids = {key: int(fused_ids[i]) for key, i in zip(keys, merged_into.tolist())}
+        return fused_ids
+
+    def _to_record(self, frame: FusedFrame) -> np.void:
+        record = self._output[0]
+        n_hands = min(len(frame.hands), MAX_HANDS)
+        record["timestamp"] = frame.timestamp
+        record["frame_id"] = frame.frame_id
+        record["tracking_frame_id"] = frame.frame_id
+        record["framerate"] = self._latest["framerate"][: len(self._slots)].max()
+        record["n_hands"] = n_hands
+        record["device_id"] = 0
+        hands = self._output["hands"][0]
+        hands[:n_hands] = frame.hands[:n_hands]
+        hands[n_hands:] = np.zeros(1, dtype=HAND_DTYPE)
+        return record
+
+    def _record_duration(self, duration: float):
+        self._n_fused += 1
+        self._last_duration = duration
+        self._max_duration = max(self._max_duration, duration)
+        if duration > self._time_budget:
+            self._n_over_budget += 1
@@ -0,0 +1,281 @@
+"""A history of head poses, for compensating tracking data for head motion in batches
+
+When tracking in `TrackingMode.HMD`, hand positions are relative to the headset. Combining
+them with the head pose at each frame's timestamp gives positions in a fixed, world frame.
+A HeadPoseHistory keeps recent head poses in NumPy arrays so that this can be done for many
+frames at once, for example with a window from a `leap.history.FrameHistory`:
+
+```
+window = frame_history.last_duration(500_000)
+world_joints = head_poses.to_world(window.timestamps, window.joints)
+```
+"""
+
+import threading
+from typing import NamedTuple, Optional
+
+import numpy as np
+
+from .event_listener import Listener
+from .history import _MirroredBuffer
+from .imu import quaternion_multiply
+
+
+class HeadPoseSeries(NamedTuple):
+    """A range of head poses, or head poses interpolated at a series of timestamps
+
+    Positions are in the same units as the head pose events, and orientations are (x, y, z, w)
+    quaternions.
+    """
+
+    timestamps: np.ndarray  # (n,) int64
+    positions: np.ndarray  # (n, 3) float32
+    orientations: np.ndarray  # (n, 4) float32
+    linear_velocities: np.ndarray  # (n, 3) float32
+    angular_velocities: np.ndarray  # (n, 3) float32
+
+    @property
+    def n_poses(self) -> int:
+        return len(self.timestamps)
+
+
+def quaternion_rotate(quaternions: np.ndarray, vectors: np.ndarray) -> np.ndarray:
+    """Rotate vectors by (x, y, z, w) unit quaternions, broadcasting over leading axes"""
+    quaternions = np.asarray(quaternions)
+    vectors = np.asarray(vectors)
+    xyz = quaternions[..., :3]
+    w = quaternions[..., 3:]
+    # v' = v + 2w(q x v) + 2q x (q x v), which avoids building rotation matrices
+    t = 2 * np.cross(xyz, vectors)
+    return vectors + w * t + np.cross(xyz, t)
+
+
+def quaternion_slerp(a: np.ndarray, b: np.ndarray, t: np.ndarray) -> np.ndarray:
+    """Spherically interpolate between arrays of (x, y, z, w) unit quaternions
+
+    :param a: The (n, 4) start quaternions.
+    :param b: The (n, 4) end quaternions.
+    :param t: The (n,) interpolation parameters, where 0 gives `a` and 1 gives `b`.
+    """
+    a = np.asarray(a, dtype=np.float64)
+    b = np.asarray(b, dtype=np.float64)
+    t = np.asarray(t, dtype=np.float64)[..., None]
+    dot = np.sum(a * b, axis=-1, keepdims=True)
+    # Take the shorter path
+    b = np.where(dot < 0, -b, b)
+    dot = np.abs(dot)
+
+    theta = np.arccos(np.clip(dot, -1.0, 1.0))
+    sin_theta = np.sin(theta)
+    # Nearly identical quaternions are linearly interpolated, avoiding division by ~0
+    close = sin_theta < 1e-6
+    safe_sin = np.where(close, 1.0, sin_theta)
+    wa = np.where(close, 1 - t, np.sin((1 - t) * theta) / safe_sin)
+    wb = np.where(close, t, np.sin(t * theta) / safe_sin)
+    result = wa * a + wb * b
+    return result / np.linalg.norm(result, axis=-1, keepdims=True)
+
+
+def quaternion_conjugate(quaternions: np.ndarray) -> np.ndarray:
+    """Invert (x, y, z, w) unit quaternions"""
+    return np.asarray(quaternions) * np.array([-1.0, -1.0, -1.0, 1.0])
+
+
+# The fields of a HAND_DTYPE which are positions, directions and orientations, given as
+# the path to the field and the number of axes it has beyond the hand array's axes
+_HAND_POSITIONS = [
+    (("palm", "position"), 0),
+    (("palm", "stabilized_position"), 0),
+    (("digits", "bones", "prev_joint"), 2),
+    (("digits", "bones", "next_joint"), 2),
+    (("arm", "prev_joint"), 0),
+    (("arm", "next_joint"), 0),
+]
+_HAND_DIRECTIONS = [
+    (("palm", "velocity"), 0),
+    (("palm", "normal"), 0),
+    (("palm", "direction"), 0),
+]
+_HAND_ROTATIONS = [
+    (("palm", "orientation"), 0),
+    (("digits", "bones", "rotation"), 2),
+    (("arm", "rotation"), 0),
+]
+
+
+def _hand_field(hands: np.ndarray, path) -> np.ndarray:
+    for name in path:
+        hands = hands[name]
+    return hands
+
+
+def _expand(values: np.ndarray, extra_axes: int) -> np.ndarray:
+    """Insert axes before the last, so per-hand values broadcast against a hand field"""
+    return values.reshape(values.shape[:-1] + (1,) * extra_axes + values.shape[-1:])
+
+
+def transform_hands(
+    hands: np.ndarray,
+    orientation: np.ndarray,
+    position: np.ndarray,
+    out: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    """Apply a rigid transform to every position, direction and orientation of some hands
+
+    Positions are rotated then translated, directions and velocities are rotated, and
+    orientations are pre-multiplied by the rotation.
+
+    :param hands: An array of `leap.arrays.HAND_DTYPE`.
+    :param orientation: The rotation, as (x, y, z, w) quaternions whose leading axes
+        broadcast against `hands`.
+    :param position: The translation, as vectors whose leading axes broadcast against
+        `hands`.
+    :param out: An array of HAND_DTYPE to write into, which may be `hands`. Defaults to a
+        new array.
+    """
+    if out is None:
+        out = hands.copy()
+    elif out is not hands:
+        out[...] = hands
+    orientation = np.asarray(orientation, dtype=np.float64)
+    position = np.asarray(position, dtype=np.float64)
+
+    for path, extra_axes in _HAND_POSITIONS:
+        field = _hand_field(out, path)
+        rotated = quaternion_rotate(_expand(orientation, extra_axes), field)
+        field[...] = rotated + _expand(position, extra_axes)
+    for path, extra_axes in _HAND_DIRECTIONS:
+        field = _hand_field(out, path)
+        field[...] = quaternion_rotate(_expand(orientation, extra_axes), field)
+    for path, extra_axes in _HAND_ROTATIONS:
+        field = _hand_field(out, path)
+        field[...] = quaternion_multiply(_expand(orientation, extra_axes), field)
+    return out
+
+
+class HeadPoseHistory(Listener):
+    """Listener which keeps the most recent head poses in NumPy arrays
+
+    Storage is mirrored in the same way as `leap.history.FrameHistory`, so queries return
+    views which are overwritten as new poses arrive. Pass `copy=True` if the result needs to
+    outlive `capacity` more poses.
+
+    :param capacity: The number of poses to keep. Defaults to 1024.
+    """
+
+    def __init__(self, capacity: int = 1024):
+        self._lock = threading.Lock()
+        self._buffer = _MirroredBuffer(
+            capacity,
+            [
+                ((), np.int64),
+                ((3,), np.float32),
+                ((4,), np.float32),
+                ((3,), np.float32),
+                ((3,), np.float32),
+            ],
+        )
+        (
+            self._timestamps,
+            self._positions,
+            self._orientations,
+            self._linear_velocities,
+            self._angular_velocities,
+        ) = self._buffer.arrays
+
+    def __len__(self):
+        return len(self._buffer)
+
+    @property
+    def capacity(self):
+        return self._buffer.capacity
+
+    def on_head_pose_event(self, event):
+        pose = event.pose
+        with self._lock:
+            row = self._buffer.next_slot
+            self._timestamps[row] = pose.timestamp
+            self._positions[row] = pose.position
+            self._orientations[row] = pose.orientation
+            self._linear_velocities[row] = pose.linear_velocity
+            self._angular_velocities[row] = pose.angular_velocity
+            self._buffer.commit()
+
+    def last(self, n_poses: Optional[int] = None, *, copy: bool = False) -> HeadPoseSeries:
+        """Get the most recent poses, oldest first
+
+        :param n_poses: The number of poses. Defaults to every stored pose.
+        :param copy: Whether to copy the data out of the history. Defaults to False.
+        """
+        with self._lock:
+            return HeadPoseSeries(*self._buffer.last(n_poses, copy))
+
+    def between(
+        self, start_timestamp: int, end_timestamp: int, *, copy: bool = False
+    ) -> HeadPoseSeries:
+        """Get the stored poses with timestamps in [start_timestamp, end_timestamp]"""
+        with self._lock:
+            return HeadPoseSeries(*self._buffer.between(start_timestamp, end_timestamp, copy))
+
+    def interpolate(self, timestamps: np.ndarray) -> HeadPoseSeries:
+        """Get the head pose at each timestamp
+
+        Positions and velocities are interpolated linearly and orientations spherically.
+        Timestamps outside the stored range take the nearest stored pose.
+
+        :param timestamps: The (n,) timestamps to interpolate at.
+        """
+        timestamps = np.asarray(timestamps, dtype=np.int64)
+        with self._lock:
+            if len(self._buffer) == 0:
+                raise ValueError("No head poses have been received")
+            stored = HeadPoseSeries(*self._buffer.last(copy=True))
+
+        n_stored = stored.n_poses
+        upper = np.clip(np.searchsorted(stored.timestamps, timestamps, "right"), 1, n_stored - 1)
+        lower = upper - 1 if n_stored > 1 else upper
+        span = (stored.timestamps[upper] - stored.timestamps[lower]).astype(np.float64)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            t = np.where(span > 0, (timestamps - stored.timestamps[lower]) / span, 0.0)
+        t = np.clip(t, 0.0, 1.0)
+
+        def lerp(values):
+            return values[lower] + (values[upper] - values[lower]) * t[:, None]
+
+        return HeadPoseSeries(
+            timestamps,
+            lerp(stored.positions),
+            quaternion_slerp(stored.orientations[lower], stored.orientations[upper], t),
+            lerp(stored.linear_velocities),
+            lerp(stored.angular_velocities),
+        )
+
+    def to_world(self, timestamps: np.ndarray, points: np.ndarray) -> np.ndarray:
+        """Transform head-relative points into the world frame
+
+        :param timestamps: The (n,) timestamps of the points, such as frame timestamps.
+        :param points: An (n, ..., 3) array of points, for example the joints of a
+            `leap.history.HistoryWindow`.
+        """
+        poses = self.interpolate(timestamps)
+        points = np.asarray(points)
+        extra_axes = (1,) * (points.ndim - 2)
+        orientations = poses.orientations.reshape(poses.n_poses, *extra_axes, 4)
+        positions = poses.positions.reshape(poses.n_poses, *extra_axes, 3)
+        return quaternion_rotate(orientations, points) + positions
+
+    def to_world_rotations(self, timestamps: np.ndarray, rotations: np.ndarray) -> np.ndarray:
+        """Transform head-relative (x, y, z, w) orientations into the world frame
+
+        :param timestamps: The (n,) timestamps of the orientations.
+        :param rotations: An (n, ..., 4) array of quaternions, such as palm orientations.
+        """
+        poses = self.interpolate(timestamps)
+        rotations = np.asarray(rotations)
+        extra_axes = (1,) * (rotations.ndim - 2)
+        orientations = poses.orientations.reshape(poses.n_poses, *extra_axes, 4)
+        return quaternion_multiply(orientations, rotations)
+
+    def clear(self):
+        with self._lock:
+            self._buffer.clear()
@@ -0,0 +1,256 @@
+"""A bounded history of recent tracking frames, stored in NumPy arrays"""
+
+import threading
+from typing import NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .arrays import MAX_HANDS, joint_positions
+from .event_listener import Listener
+
+# The hand id stored in unused hand slots
+NO_HAND = -1
+
+
+class HistoryWindow(NamedTuple):
+    """A range of frames from a FrameHistory
+
+    Every array has the frames along its first axis, and hand arrays have MAX_HANDS slots
+    along their second axis. Unused slots have a hand id of NO_HAND.
+    """
+
+    timestamps: np.ndarray  # (n,) int64
+    hand_ids: np.ndarray  # (n, MAX_HANDS) int64
+    hand_types: np.ndarray  # (n, MAX_HANDS) int32
+    confidence: np.ndarray  # (n, MAX_HANDS) float32
+    joints: np.ndarray  # (n, MAX_HANDS, 5, 5, 3) float32
+    palm_position: np.ndarray  # (n, MAX_HANDS, 3) float32
+    palm_velocity: np.ndarray  # (n, MAX_HANDS, 3) float32
+    palm_normal: np.ndarray  # (n, MAX_HANDS, 3) float32
+    palm_direction: np.ndarray  # (n, MAX_HANDS, 3) float32
+    palm_orientation: np.ndarray  # (n, MAX_HANDS, 4) float32
+
+    @property
+    def n_frames(self) -> int:
+        return len(self.timestamps)
+
+    def hand(self, hand_id: int) -> "HistoryWindow":
+        """Select the frames containing a hand, with that hand's data in slot 0
+
+        The hand arrays of the result have a single slot.
+        """
+        frames, slots = np.nonzero(self.hand_ids == hand_id)
+        return HistoryWindow(
+            self.timestamps[frames],
+            *(array[frames, slots][:, None] for array in self[1:]),
+        )
+
+
+class _MirroredBuffer:
+    """Fixed capacity columns of rows, which any run of up to `capacity` rows is a view of
+
+    Each row is stored twice, at slot `i` and `i + capacity` of arrays twice the capacity in
+    length, which means any run of up to `capacity` consecutive rows is contiguous. The
+    first column holds the timestamps of the rows, which must not decrease, so that time
+    lookups are binary searches.
+
+    A row is added by writing it to slot `next_slot` of each array and calling `commit`.
+    The buffer does no locking of its own, so its owner must hold a lock around writes and
+    queries.
+
+    :param capacity: The number of rows to keep.
+    :param columns: The (row shape, dtype) of each column, or (row shape, dtype, fill) to
+        initialise it with something other than zero.
+    """
+
+    def __init__(self, capacity: int, columns: Sequence[tuple]):
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self._capacity = capacity
+        self._n_written = 0
+        self.arrays = [
+            np.full((2 * capacity,) + tuple(shape), fill[0] if fill else 0, dtype=dtype)
+            for shape, dtype, *fill in columns
+        ]
+        self._timestamps = self.arrays[0]
+
+    def __len__(self):
+        return min(self._n_written, self._capacity)
+
+    @property
+    def capacity(self) -> int:
+        return self._capacity
+
+    @property
+    def n_written(self) -> int:
+        """The number of rows committed since the buffer was created or cleared"""
+        return self._n_written
+
+    @property
+    def next_slot(self) -> int:
+        """The slot the next row should be written to"""
+        return self._n_written % self._capacity
+
+    def commit(self):
+        """Mirror the row written to `next_slot` into its second slot, and count it"""
+        slot = self._n_written % self._capacity
+        for array in self.arrays:
+            array[slot + self._capacity] = array[slot]
+        self._n_written += 1
+
+    def clear(self):
+        self._n_written = 0
+
+    def stored_range(self) -> Tuple[int, int]:
+        """Get the contiguous [start, end) rows holding the stored rows, oldest first"""
+        n_stored = min(self._n_written, self._capacity)
+        start = (self._n_written - n_stored) % self._capacity
+        return start, start + n_stored
+
+    def window(self, start: int, end: int, copy: bool = False) -> list:
+        """Get rows [start, end) of every column"""
+        if copy:
+            return [array[start:end].copy() for array in self.arrays]
+        return [array[start:end] for array in self.arrays]
+
+    def last(self, n_rows: Optional[int] = None, copy: bool = False) -> list:
+        """Get the most recent `n_rows` rows, or every stored row, oldest first"""
+        start, end = self.stored_range()
+        if n_rows is not None:
+            start = max(start, end - n_rows)
+        return self.window(start, end, copy)
+
+    def last_duration(self, duration: int, copy: bool = False) -> list:
+        """Get the rows within `duration` of the most recent row"""
+        start, end = self.stored_range()
+        if end == start:
+            return self.window(start, end, copy)
+        latest = self._timestamps[end - 1]
+        offset = np.searchsorted(self._timestamps[start:end], latest - duration, "left")
+        return self.window(start + int(offset), end, copy)
+
+    def between(self, start_timestamp: int, end_timestamp: int, copy: bool = False) -> list:
+        """Get the stored rows with timestamps in [start_timestamp, end_timestamp]"""
+        start, end = self.stored_range()
+        timestamps = self._timestamps[start:end]
+        first = int(np.searchsorted(timestamps, start_timestamp, "left"))
+        last = int(np.searchsorted(timestamps, end_timestamp, "right"))
+        return self.window(start + first, start + last, copy)
+
+    def nearest(self, timestamp: int) -> Optional[int]:
+        """Get the stored timestamp nearest to the given timestamp"""
+        start, end = self.stored_range()
+        if end == start:
+            return None
+        timestamps = self._timestamps[start:end]
+        i = int(np.searchsorted(timestamps, timestamp))
+        candidates = timestamps[max(i - 1, 0) : i + 1]
+        return int(candidates[np.argmin(np.abs(candidates - timestamp))])
+
+
+class FrameHistory(Listener):
+    """Listener which keeps joint and palm data for the most recent frames
+
+    All storage is allocated up front, so memory is bounded by `capacity`. Each frame is
+    written twice, at slot `i` and `i + capacity` of arrays twice the capacity in length,
+    which means any run of up to `capacity` consecutive frames is contiguous. Queries
+    therefore return views rather than copies, and timestamp lookups are binary searches.
+
+    Views are overwritten as new frames arrive; pass `copy=True` to queries, or copy the
+    result, if it needs to outlive `capacity` more frames or be read on another thread while
+    frames are arriving.
+
+    :param capacity: The number of frames to keep. Defaults to 1024.
+    """
+
+    def __init__(self, capacity: int = 1024):
+        self._lock = threading.Lock()
+        self._buffer = _MirroredBuffer(
+            capacity,
+            [
+                ((), np.int64),
+                ((MAX_HANDS,), np.int64, NO_HAND),
+                ((MAX_HANDS,), np.int32),
+                ((MAX_HANDS,), np.float32),
+                ((MAX_HANDS, 5, 5, 3), np.float32),
+                ((MAX_HANDS, 3), np.float32),
+                ((MAX_HANDS, 3), np.float32),
+                ((MAX_HANDS, 3), np.float32),
+                ((MAX_HANDS, 3), np.float32),
+                ((MAX_HANDS, 4), np.float32),
+            ],
+        )
+        (
+            self._timestamps,
+            self._hand_ids,
+            self._hand_types,
+            self._confidence,
+            self._joints,
+            self._palm_position,
+            self._palm_velocity,
+            self._palm_normal,
+            self._palm_direction,
+            self._palm_orientation,
+        ) = self._buffer.arrays
+
+    def __len__(self):
+        return len(self._buffer)
+
+    @property
+    def capacity(self):
+        return self._buffer.capacity
+
+    @property
+    def frames_received(self):
+        return self._buffer.n_written
+
+    def on_tracking_event(self, event):
+        hands = event.hands_array
+        n_hands = len(hands)
+        palm = hands["palm"]
+        joints = joint_positions(hands)
+
+        with self._lock:
+            row = self._buffer.next_slot
+            self._timestamps[row] = event.timestamp
+            self._hand_ids[row, :n_hands] = hands["id"]
+            self._hand_ids[row, n_hands:] = NO_HAND
+            self._hand_types[row, :n_hands] = hands["type"]
+            self._confidence[row, :n_hands] = hands["confidence"]
+            self._joints[row, :n_hands] = joints
+            self._palm_position[row, :n_hands] = palm["position"]
+            self._palm_velocity[row, :n_hands] = palm["velocity"]
+            self._palm_normal[row, :n_hands] = palm["normal"]
+            self._palm_direction[row, :n_hands] = palm["direction"]
+            self._palm_orientation[row, :n_hands] = palm["orientation"]
+            self._buffer.commit()
+
+    def last(self, n_frames: Optional[int] = None, *, copy: bool = False) -> HistoryWindow:
+        """Get the most recent frames, oldest first
+
+        :param n_frames: The number of frames. Defaults to every stored frame.
+        :param copy: Whether to copy the data out of the history. Defaults to False.
+        """
+        with self._lock:
+            return HistoryWindow(*self._buffer.last(n_frames, copy))
+
+    def last_duration(self, duration: int, *, copy: bool = False) -> HistoryWindow:
+        """Get the frames within `duration` microseconds of the most recent frame"""
+        with self._lock:
+            return HistoryWindow(*self._buffer.last_duration(duration, copy))
+
+    def between(
+        self, start_timestamp: int, end_timestamp: int, *, copy: bool = False
+    ) -> HistoryWindow:
+        """Get the stored frames with timestamps in [start_timestamp, end_timestamp]"""
+        with self._lock:
+            return HistoryWindow(*self._buffer.between(start_timestamp, end_timestamp, copy))
+
+    def nearest(self, timestamp: int) -> Optional[int]:
+        """Get the timestamp of the stored frame nearest to the given timestamp"""
+        with self._lock:
+            return self._buffer.nearest(timestamp)
+
+    def clear(self):
+        with self._lock:
+            self._buffer.clear()
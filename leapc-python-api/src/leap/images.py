@@ -0,0 +1,160 @@
+"""Copying camera images out of LeapC before their memory is reused
+
+The pixel data in an `ImageEvent` is only valid until the connection is polled again. An
+`ImagePool` is a Listener which copies each stereo pair into one slot of a preallocated
+buffer, so consumers on other threads can work on the images without any allocation per
+frame.
+
+Images are only sent by the Server when the `PolicyFlag.Images` policy is set.
+"""
+
+from contextlib import contextmanager
+import threading
+from typing import Optional
+
+import numpy as np
+
+from .event_listener import Listener
+
+
+class StereoImage:
+    """A stereo pair held in a slot of an ImagePool
+
+    `left` and `right` are views over the pool buffer. They remain valid while the pair is
+    acquired from the pool.
+    """
+
+    def __init__(self, slot: int, frame_id: int, timestamp: int, left, right):
+        self._slot = slot
+        self._frame_id = frame_id
+        self._timestamp = timestamp
+        self._left = left
+        self._right = right
+
+    @property
+    def frame_id(self):
+        return self._frame_id
+
+    @property
+    def timestamp(self):
+        return self._timestamp
+
+    @property
+    def left(self):
+        return self._left
+
+    @property
+    def right(self):
+        return self._right
+
+
+class ImagePool(Listener):
+    """Listener which copies each stereo pair into a preallocated ring of slots
+
+    The buffer is allocated when the first image arrives, and reallocated only if the image
+    size changes. Slots which are currently acquired are never overwritten; if every slot is
+    held, the incoming pair is dropped and counted in `dropped`.
+
+    :param capacity: The number of stereo pairs the pool can hold. Defaults to 4.
+    """
+
+    def __init__(self, capacity: int = 4):
+        if capacity < 2:
+            raise ValueError("An ImagePool needs at least 2 slots")
+        self._capacity = capacity
+        self._lock = threading.Lock()
+        self._buffer = None
+        self._frame_ids = np.zeros(capacity, dtype=np.int64)
+        self._timestamps = np.zeros(capacity, dtype=np.int64)
+        self._held = np.zeros(capacity, dtype=np.int32)
+        self._next_slot = 0
+        self._latest_slot = None
+        self._received = 0
+        self._dropped = 0
+
+    @property
+    def capacity(self):
+        return self._capacity
+
+    @property
+    def received(self):
+        """The number of stereo pairs copied into the pool"""
+        return self._received
+
+    @property
+    def dropped(self):
+        """The number of stereo pairs dropped because every slot was held"""
+        return self._dropped
+
+    def on_image_event(self, event):
+        left, right = event.image
+        left_pixels = left.as_array()
+        right_pixels = right.as_array()
+
+        with self._lock:
+            slot = self._find_free_slot()
+            if slot is None:
+                self._dropped += 1
+                return
+
+            shape = (self._capacity, 2) + left_pixels.shape
+            if self._buffer is None or self._buffer.shape != shape:
+                if self._held.any():
+                    # Never reallocate underneath a consumer
+                    self._dropped += 1
+                    return
+                self._buffer = np.empty(shape, dtype=np.uint8)
+
+            np.copyto(self._buffer[slot, 0], left_pixels)
+            np.copyto(self._buffer[slot, 1], right_pixels)
+            self._frame_ids[slot] = event.info.frame_id
+            self._timestamps[slot] = event.timestamp
+            self._latest_slot = slot
+            self._next_slot = (slot + 1) % self._capacity
+            self._received += 1
+
+    @contextmanager
+    def acquire(self):
+        """Hold the most recent stereo pair while it is in use
+
+        Yields a StereoImage, or None if no images have been received yet.
+        """
+        with self._lock:
+            slot = self._latest_slot
+            if slot is None:
+                stereo = None
+            else:
+                self._held[slot] += 1
+                stereo = StereoImage(
+                    slot,
+                    int(self._frame_ids[slot]),
+                    int(self._timestamps[slot]),
+                    self._buffer[slot, 0],
+                    self._buffer[slot, 1],
+                )
+        try:
+            yield stereo
+        finally:
+            if stereo is not None:
+                with self._lock:
+                    self._held[slot] -= 1
+
+    def latest_copy(self) -> Optional[StereoImage]:
+        """Get a copy of the most recent stereo pair, which is never overwritten"""
+        with self.acquire() as stereo:
+            if stereo is None:
+                return None
+            return StereoImage(
+                stereo._slot,
+                stereo.frame_id,
+                stereo.timestamp,
+                stereo.left.copy(),
+                stereo.right.copy(),
+            )
+
+    def _find_free_slot(self):
+        for i in range(self._capacity):
+            slot = (self._next_slot + i) % self._capacity
+            if self._held[slot] == 0:
+                return slot
+        return None
@@ -0,0 +1,252 @@
+"""Accumulating IMU samples into NumPy arrays
+
+IMU events arrive far more often than tracking frames, so rather than handling each
+IMUEvent in Python, an IMUAccumulator stores them in preallocated arrays and hands them out
+in batches or time windows.
+"""
+
+import threading
+from typing import NamedTuple, Optional
+
+import numpy as np
+
+from .event_listener import Listener
+from .history import _MirroredBuffer
+
+
+class IMUBatch(NamedTuple):
+    """A run of consecutive IMU samples
+
+    Accelerations are in m/s^2 and angular velocities in rad/s, both in the device's frame.
+    `orientation` holds the integrated orientation after each sample as (x, y, z, w)
+    quaternions, or is None if orientation was not integrated.
+    """
+
+    timestamps: np.ndarray  # (n,) int64, microseconds
+    timestamps_hardware: np.ndarray  # (n,) int64
+    flags: np.ndarray  # (n,) uint32
+    acceleration: np.ndarray  # (n, 3) float32
+    angular_velocity: np.ndarray  # (n, 3) float32
+    temperature: np.ndarray  # (n,) float32
+    orientation: Optional[np.ndarray] = None  # (n, 4) float64
+
+    @property
+    def n_samples(self) -> int:
+        return len(self.timestamps)
+
+
+def quaternion_multiply(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Multiply arrays of (x, y, z, w) quaternions elementwise"""
+    ax, ay, az, aw = np.moveaxis(a, -1, 0)
+    bx, by, bz, bw = np.moveaxis(b, -1, 0)
+    return np.stack(
+        [
+            aw * bx + ax * bw + ay * bz - az * by,
+            aw * by - ax * bz + ay * bw + az * bx,
+            aw * bz + ax * by - ay * bx + az * bw,
+            aw * bw - ax * bx - ay * by - az * bz,
+        ],
+        axis=-1,
+    )
+
+
+def cumulative_quaternion_product(quaternions: np.ndarray) -> np.ndarray:
+    """Get the running products q[0] q[1] ... q[i] of an (n, 4) array of quaternions
+
+    Uses a parallel prefix scan, which takes log2(n) vectorised multiplications rather than
+    n Python-level ones.
+    """
+    result = np.array(quaternions, dtype=np.float64)
+    shift = 1
+    while shift < len(result):
+        result[shift:] = quaternion_multiply(result[:-shift], result[shift:])
+        shift *= 2
+    return result / np.linalg.norm(result, axis=-1, keepdims=True)
+
+
+def integrate_gyroscope(
+    timestamps: np.ndarray,
+    angular_velocity: np.ndarray,
+    *,
+    initial: Optional[np.ndarray] = None,
+    previous_timestamp: Optional[int] = None,
+) -> np.ndarray:
+    """Integrate angular velocities into orientations
+
+    Each sample's angular velocity is held from the previous sample until its own timestamp.
+    Returns an (n, 4) array of (x, y, z, w) quaternions, the orientation after each sample.
+
+    :param timestamps: The sample timestamps, in microseconds.
+    :param angular_velocity: An (n, 3) array of angular velocities in rad/s, in the frame of
+        the rotating body.
+    :param initial: The orientation before the first sample. Defaults to the identity.
+    :param previous_timestamp: The timestamp of the sample before the first. Defaults to
+        the first timestamp, so the first sample adds no rotation.
+    """
+    timestamps = np.asarray(timestamps, dtype=np.int64)
+    if len(timestamps) == 0:
+        return np.zeros((0, 4))
+    if previous_timestamp is None:
+        previous_timestamp = timestamps[0]
+    dt = np.diff(timestamps, prepend=previous_timestamp) / 1e6
+
+    # The rotation over each interval, as a quaternion
+    rotation = np.asarray(angular_velocity, dtype=np.float64) * dt[:, None]
+    angle = np.linalg.norm(rotation, axis=-1, keepdims=True)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        axis = np.where(angle > 0, rotation / angle, 0.0)
+    steps = np.concatenate([axis * np.sin(angle / 2), np.cos(angle / 2)], axis=-1)
+
+    if initial is not None:
+        steps[0] = quaternion_multiply(np.asarray(initial, dtype=np.float64), steps[0])
+    return cumulative_quaternion_product(steps)
+
+
+class IMUAccumulator(Listener):
+    """Listener which stores IMU samples in preallocated arrays
+
+    Like `leap.history.FrameHistory`, each sample is stored twice in arrays of twice the
+    capacity, so any run of up to `capacity` samples can be returned as views. Views are
+    overwritten as new samples arrive; copy them if they need to last longer.
+
+    If `batch_size` is given, `on_imu_batch` is called on the polling thread with every
+    `batch_size` consecutive samples. Override it to process batches as they fill.
+
+    To only accumulate one device's samples, add the accumulator to a Connection with the
+    `device` argument.
+
+    :param capacity: The number of samples to keep. Defaults to 4096.
+    :param batch_size: The number of samples in each batch, at most `capacity`. Defaults to
+        None, which disables batches.
+    :param integrate: Whether to integrate the gyroscope into `orientation` for each batch.
+        Defaults to False.
+    """
+
+    def __init__(
+        self, capacity: int = 4096, *, batch_size: Optional[int] = None, integrate: bool = False
+    ):
+        if batch_size is not None and not 1 <= batch_size <= capacity:
+            raise ValueError("batch_size must be between 1 and capacity")
+        self._batch_size = batch_size
+        self._integrate = integrate
+        self._lock = threading.Lock()
+        self._n_batched = 0
+
+        # The integrated orientation after the last batched sample, and its timestamp
+        self._orientation = np.array([0.0, 0.0, 0.0, 1.0])
+        self._orientation_timestamp = None
+
+        self._buffer = _MirroredBuffer(
+            capacity,
+            [
+                ((), np.int64),
+                ((), np.int64),
+                ((), np.uint32),
+                ((3,), np.float32),
+                ((3,), np.float32),
+                ((), np.float32),
+            ],
+        )
+        (
+            self._timestamps,
+            self._timestamps_hardware,
+            self._flags,
+            self._acceleration,
+            self._angular_velocity,
+            self._temperature,
+        ) = self._buffer.arrays
+
+    def __len__(self):
+        return len(self._buffer)
+
+    @property
+    def capacity(self):
+        return self._buffer.capacity
+
+    @property
+    def samples_received(self):
+        return self._buffer.n_written
+
+    @property
+    def orientation(self) -> np.ndarray:
+        """The orientation integrated up to the last batch, as an (x, y, z, w) quaternion"""
+        return self._orientation.copy()
+
+    def reset_orientation(self, orientation: Optional[np.ndarray] = None):
+        """Restart orientation integration from `orientation`, or the identity"""
+        if orientation is None:
+            orientation = [0.0, 0.0, 0.0, 1.0]
+        self._orientation = np.array(orientation, dtype=np.float64)
+
+    def on_imu_event(self, event):
+        acceleration = event.raw_accelerometer
+        angular_velocity = event.raw_gyroscope
+
+        with self._lock:
+            row = self._buffer.next_slot
+            self._timestamps[row] = event.timestamp
+            self._timestamps_hardware[row] = event.timestamp_hardware
+            self._flags[row] = event.flags_value
+            self._acceleration[row] = (acceleration.x, acceleration.y, acceleration.z)
+            self._angular_velocity[row] = (
+                angular_velocity.x,
+                angular_velocity.y,
+                angular_velocity.z,
+            )
+            self._temperature[row] = event.temperature
+            self._buffer.commit()
+
+            batch = None
+            if self._batch_size is not None:
+                # Samples which were overwritten before being batched are skipped
+                n_written = self._buffer.n_written
+                capacity = self._buffer.capacity
+                self._n_batched = max(self._n_batched, n_written - capacity)
+                if n_written - self._n_batched >= self._batch_size:
+                    start = self._n_batched % capacity
+                    batch = IMUBatch(*self._buffer.window(start, start + self._batch_size))
+                    self._n_batched += self._batch_size
+
+        if batch is not None:
+            if self._integrate:
+                batch = batch._replace(orientation=self._integrate_batch(batch))
+            self.on_imu_batch(batch)
+
+    def on_imu_batch(self, batch: IMUBatch):
+        """Called with every `batch_size` consecutive samples, if `batch_size` was given"""
+        pass
+
+    def last(self, n_samples: Optional[int] = None, *, copy: bool = False) -> IMUBatch:
+        """Get the most recent samples, oldest first
+
+        :param n_samples: The number of samples. Defaults to every stored sample.
+        :param copy: Whether to copy the data out of the accumulator. Defaults to False.
+        """
+        with self._lock:
+            return IMUBatch(*self._buffer.last(n_samples, copy))
+
+    def last_duration(self, duration: int, *, copy: bool = False) -> IMUBatch:
+        """Get the samples within `duration` microseconds of the most recent sample"""
+        with self._lock:
+            return IMUBatch(*self._buffer.last_duration(duration, copy))
+
+    def between(self, start_timestamp: int, end_timestamp: int, *, copy: bool = False) -> IMUBatch:
+        """Get the stored samples with timestamps in [start_timestamp, end_timestamp]"""
+        with self._lock:
+            return IMUBatch(*self._buffer.between(start_timestamp, end_timestamp, copy))
+
+    def clear(self):
+        with self._lock:
+            self._buffer.clear()
+            self._n_batched = 0
+
+    def _integrate_batch(self, batch: IMUBatch) -> np.ndarray:
+        orientation = integrate_gyroscope(
+            batch.timestamps,
+            batch.angular_velocity,
+            initial=self._orientation,
+            previous_timestamp=self._orientation_timestamp,
+        )
+        self._orientation = orientation[-1]
+        self._orientation_timestamp = int(batch.timestamps[-1])
+        return orientation
@@ -0,0 +1,219 @@
+"""Interpolated frames and latency-compensated hands for head mounted displays
+
+LeapC can interpolate, or predict, tracking frames and head poses at arbitrary timestamps.
+A FrameInterpolator wraps those calls, reusing its buffers between calls, and combines them
+to express hands in the head frame at the time an image will be displayed.
+
+Hands in `TrackingMode.HMD` are relative to the headset at the time they were tracked. If
+the head moves between then and display time, the hands appear to lag behind it. Moving
+the hands into the head frame at display time removes that lag:
+
+```
+interpolator = FrameInterpolator(connection)
+hands = interpolator.hands_in_head_frame(display_timestamp, frame_timestamp=latest_timestamp)
+```
+"""
+
+from typing import NamedTuple, Optional
+
+import numpy as np
+from leapc_cffi import ffi, libleapc
+
+from .arrays import HAND_DTYPE, MAX_HANDS, RECORD_DTYPE, copy_frame
+from .connection import Connection
+from .datatypes import HeadPose
+from .device import Device
+from .events import HeadPoseEvent
+from .exceptions import success_or_raise
+from .head_pose import quaternion_conjugate, quaternion_rotate, transform_hands
+from .imu import quaternion_multiply
+
+
+class HeadFrameHands(NamedTuple):
+    """Hands moved into the head frame at one or more display timestamps
+
+    `hands` has shape (n_hands,) for a single display timestamp, or (n_display, n_hands) for
+    several. It is a view of the interpolator's buffer, valid until its next call.
+    """
+
+    frame_timestamp: int
+    display_timestamps: np.ndarray  # (n_display,) int64
+    head_orientations: np.ndarray  # (n_display, 4) float64, (x, y, z, w)
+    head_positions: np.ndarray  # (n_display, 3) float64
+    hands: np.ndarray
+
+
+class FrameInterpolator:
+    """Interpolates frames and head poses for one Connection, reusing buffers between calls
+
+    :param connection: An open Connection.
+    :param device: An open Device to interpolate for. Defaults to the primary device.
+    """
+
+    def __init__(self, connection: Connection, *, device: Optional[Device] = None):
+        self._connection = connection
+        self._device = device
+        self._device_id = 0 if device is None or device.id is None else device.id
+
+        self._size_ptr = ffi.new("uint64_t*")
+        self._frame_buffer = None
+        self._frame_buffer_size = 0
+        self._head_pose_ptr = ffi.new("LEAP_HEAD_POSE_EVENT*")
+
+        self._record = np.zeros(1, dtype=RECORD_DTYPE)
+        self._hands_out = np.zeros((1, MAX_HANDS), dtype=HAND_DTYPE)
+
+    def frame(self, timestamp: int, *, source_timestamp: Optional[int] = None) -> np.void:
+        """Interpolate the frame at a timestamp
+
+        Returns a `leap.arrays.RECORD_DTYPE` record, which is reused by the next call.
+
+        :param timestamp: The timestamp to interpolate at, in microseconds.
+        :param source_timestamp: If given, use LeapInterpolateFrameFromTime: the hands are
+            interpolated at `source_timestamp`, and LeapC corrects them for the head motion
+            between then and `timestamp`. Defaults to None.
+        """
+        frame_ptr, size = self._frame_buffer_for(
+            timestamp if source_timestamp is None else source_timestamp
+        )
+        connection = self._connection.get_connection_ptr()
+        if source_timestamp is None:
+            if self._device is None:
+                success_or_raise(
+                    libleapc.LeapInterpolateFrame, connection, timestamp, frame_ptr, size
+                )
+            else:
+                success_or_raise(
+                    libleapc.LeapInterpolateFrameEx,
+                    connection,
+                    self._device.c_data_device,
+                    timestamp,
+                    frame_ptr,
+                    size,
+                )
+        else:
+            if self._device is None:
+                success_or_raise(
+                    libleapc.LeapInterpolateFrameFromTime,
+                    connection,
+                    timestamp,
+                    source_timestamp,
+                    frame_ptr,
+                    size,
+                )
+            else:
+                success_or_raise(
+                    libleapc.LeapInterpolateFrameFromTimeEx,
+                    connection,
+                    self._device.c_data_device,
+                    timestamp,
+                    source_timestamp,
+                    frame_ptr,
+                    size,
+                )
+
+        record = self._record[0]
+        copy_frame(frame_ptr, record, self._record["hands"][0], self._device_id)
+        return record
+
+    def head_pose(self, timestamp: int) -> HeadPose:
+        """Interpolate, or predict, the head pose at a timestamp"""
+        self._interpolate_head_pose(timestamp)
+        return HeadPoseEvent(self._head_pose_ptr).pose
+
+    def head_poses(self, timestamps) -> tuple:
+        """Interpolate the head pose at each timestamp
+
+        Returns (orientations, positions) as (n, 4) (x, y, z, w) and (n, 3) arrays.
+        """
+        timestamps = np.atleast_1d(np.asarray(timestamps, dtype=np.int64))
+        orientations = np.empty((len(timestamps), 4))
+        positions = np.empty((len(timestamps), 3))
+        data = self._head_pose_ptr
+        for i, timestamp in enumerate(timestamps.tolist()):
+            self._interpolate_head_pose(timestamp)
+            orientations[i] = data.head_orientation.v
+            positions[i] = data.head_position.v
+        return orientations, positions
+
+    def hands_in_head_frame(
+        self, display_timestamp: int, *, frame_timestamp: Optional[int] = None
+    ) -> HeadFrameHands:
+        """Get the hands in the head frame at a display timestamp
+
+        :param display_timestamp: The time the hands will be displayed, in microseconds.
+        :param frame_timestamp: The time to interpolate the hands at, such as the latest
+            frame's timestamp. Defaults to `display_timestamp`, in which case LeapC
+            predicts the hands.
+        """
+        result = self.hands_in_head_frames([display_timestamp], frame_timestamp=frame_timestamp)
+        return result._replace(hands=result.hands[0])
+
+    def hands_in_head_frames(
+        self, display_timestamps, *, frame_timestamp: Optional[int] = None
+    ) -> HeadFrameHands:
+        """Get the hands in the head frame at several display timestamps
+
+        The frame is interpolated once, and the head motion from `frame_timestamp` to each
+        display timestamp is applied to all hands in one vectorised pass.
+
+        :param display_timestamps: The times the hands will be displayed, in microseconds.
+        :param frame_timestamp: The time to interpolate the hands at. Defaults to the first
+            display timestamp.
+        """
+        display_timestamps = np.atleast_1d(np.asarray(display_timestamps, dtype=np.int64))
+        if frame_timestamp is None:
+            frame_timestamp = int(display_timestamps[0])
+        record = self.frame(frame_timestamp)
+        n_hands = int(record["n_hands"])
+
+        source_orientation, source_position = self.head_poses([frame_timestamp])
+        orientations, positions = self.head_poses(display_timestamps)
+
+        # The transform from the head at frame time to the head at display time
+        inverse = quaternion_conjugate(orientations)
+        relative_orientation = quaternion_multiply(inverse, source_orientation)
+        relative_position = quaternion_rotate(inverse, source_position - positions)
+
+        n_display = len(display_timestamps)
+        if len(self._hands_out) < n_display:
+            self._hands_out = np.zeros((n_display, MAX_HANDS), dtype=HAND_DTYPE)
+        out = self._hands_out[:n_display, :n_hands]
+        out[...] = record["hands"][:n_hands]
+        transform_hands(out, relative_orientation[:, None], relative_position[:, None], out=out)
+
+        return HeadFrameHands(frame_timestamp, display_timestamps, orientations, positions, out)
+
+    def _frame_buffer_for(self, timestamp: int):
+        """Get a frame buffer large enough for the frame at a timestamp, and its size"""
+        connection = self._connection.get_connection_ptr()
+        if self._device is None:
+            success_or_raise(libleapc.LeapGetFrameSize, connection, timestamp, self._size_ptr)
+        else:
+            success_or_raise(
+                libleapc.LeapGetFrameSizeEx,
+                connection,
+                self._device.c_data_device,
+                timestamp,
+                self._size_ptr,
+            )
+        size = self._size_ptr[0]
+        if size > self._frame_buffer_size:
+            self._frame_buffer = ffi.new("char[]", size)
+            self._frame_buffer_size = size
+        return ffi.cast("LEAP_TRACKING_EVENT*", self._frame_buffer), self._frame_buffer_size
+
+    def _interpolate_head_pose(self, timestamp: int):
+        connection = self._connection.get_connection_ptr()
+        if self._device is None:
+            success_or_raise(
+                libleapc.LeapInterpolateHeadPose, connection, timestamp, self._head_pose_ptr
+            )
+        else:
+            success_or_raise(
+                libleapc.LeapInterpolateHeadPoseEx,
+                connection,
+                self._device.c_data_device,
+                timestamp,
+                self._head_pose_ptr,
+            )
@@ -0,0 +1,192 @@
+"""Polling a Connection from a native thread
+
+The Python poll loop runs Python code for every message, which limits the rate it can poll
+at. A NativePoller instead polls on a thread in the leapc_cffi extension, which copies
+tracking frames into a preallocated ring buffer of `leap.arrays.RECORD_DTYPE` records.
+Python then drains the buffer in batches, with a single call per batch.
+
+This requires a leapc_cffi build which includes the native poller; see `is_available`.
+"""
+
+from contextlib import contextmanager
+from typing import List, NamedTuple, Optional
+
+import numpy as np
+from leapc_cffi import ffi, libleapc
+
+from .arrays import RECORD_DTYPE
+from .connection import Connection
+from .enums import EventType, RS as LeapRS
+from .event_listener import dispatch_event, Listener
+from .events import TrackingEvent
+from .exceptions import create_exception, LeapConcurrentPollError, LeapError
+
+# A non-tracking message seen by the native poller
+NATIVE_EVENT_DTYPE = np.dtype([("type", "<i4"), ("device_id", "<u4")])
+
+
+def is_available() -> bool:
+    """Whether the installed leapc_cffi includes the native poller"""
+    return hasattr(libleapc, "LeapPyPollerCreate")
+
+
+class NativePollStats(NamedTuple):
+    """Counters from a NativePoller
+
+    Overwritten counts are frames or events which were dropped because the ring buffer was
+    full when they arrived.
+    """
+
+    messages: int
+    frames: int
+    frames_overwritten: int
+    events: int
+    events_overwritten: int
+    timeouts: int
+    errors: int
+    last_error: int
+    buffered_frames: int
+    buffered_events: int
+
+
+class NativePoller:
+    """Polls a Connection on a native thread, buffering tracking frames for Python
+
+    The Connection must be opened with `auto_poll=False`, as it cannot be polled from
+    Python while the native poller is running. Only tracking frames are kept in full; other
+    messages are recorded as their type and device id, and can be read with `drain_events`.
+
+    :param connection: The Connection to poll.
+    :param capacity: The number of frames the ring buffer holds. Defaults to 1024.
+    :param event_capacity: The number of other events the ring buffer holds. Defaults to 64.
+    :param poll_timeout: The timeout of each poll, in seconds, which bounds how long `stop`
+        takes. Defaults to 0.1 seconds.
+    :param listeners: A List of event listeners for `dispatch`. Defaults to None.
+    """
+
+    def __init__(
+        self,
+        connection: Connection,
+        *,
+        capacity: int = 1024,
+        event_capacity: int = 64,
+        poll_timeout: float = 0.1,
+        listeners: Optional[List[Listener]] = None,
+    ):
+        if not is_available():
+            raise RuntimeError("The installed leapc_cffi was built without the native poller")
+        if ffi.sizeof("LEAP_PY_FRAME_RECORD") != RECORD_DTYPE.itemsize:
+            raise RuntimeError("The native poller's frame record does not match RECORD_DTYPE")
+
+        self._connection = connection
+        self._listeners = listeners if listeners is not None else []
+        self._buffer = np.zeros(capacity, dtype=RECORD_DTYPE)
+        self._event_buffer = np.zeros(event_capacity, dtype=NATIVE_EVENT_DTYPE)
+        self._poller = ffi.gc(
+            libleapc.LeapPyPollerCreate(
+                connection.get_connection_ptr(),
+                capacity,
+                event_capacity,
+                int(poll_timeout * 1000),  # Seconds to milliseconds
+            ),
+            libleapc.LeapPyPollerDestroy,
+        )
+        if self._poller == ffi.NULL:
+            raise MemoryError("Unable to allocate the native poller")
+        self._stats_ptr = ffi.new("LEAP_PY_POLLER_STATS*")
+        self._running = False
+
+    def add_listener(self, listener: Listener):
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener: Listener):
+        self._listeners.remove(listener)
+
+    @property
+    def running(self) -> bool:
+        # The Connection stops the poller itself when it is closed
+        return self._running and self._connection._native_poller is self._poller
+
+    @contextmanager
+    def open(self):
+        self.start()
+        try:
+            yield self
+        finally:
+            self.stop()
+
+    def start(self):
+        """Start polling on the native thread"""
+        connection = self._connection
+        if connection._is_polled():
+            raise LeapConcurrentPollError
+        if libleapc.LeapPyPollerStart(self._poller) != 0:
+            raise RuntimeError("Unable to start the native poll thread")
+        # The Connection holds the native handle, so it can stop the thread before the
+        # connection is closed or destroyed
+        connection._native_poller = self._poller
+        self._running = True
+
+    def stop(self):
+        """Stop polling, waiting for the native thread to finish. Buffered frames are kept."""
+        if not self._running:
+            return
+        libleapc.LeapPyPollerStop(self._poller)
+        if self._connection._native_poller is self._poller:
+            self._connection._native_poller = None
+        self._running = False
+
+    def drain(self, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """Take the buffered frames, oldest first
+
+        Returns a view of the frames taken, which is valid until the next call if `out` is
+        not given.
+
+        :param out: A contiguous array of RECORD_DTYPE to copy into, whose length is the
+            most frames to take. Defaults to an internal buffer of `capacity` frames.
+        """
+        if out is None:
+            out = self._buffer
+        elif out.dtype != RECORD_DTYPE or not out.flags.c_contiguous:
+            raise ValueError("out must be a contiguous array of RECORD_DTYPE")
+        out_ptr = ffi.from_buffer("LEAP_PY_FRAME_RECORD[]", out, require_writable=True)
+        count = libleapc.LeapPyPollerDrain(self._poller, out_ptr, len(out))
+        return out[:count]
+
+    def drain_events(self) -> np.ndarray:
+        """Take the buffered non-tracking events, as an array of NATIVE_EVENT_DTYPE
+
+        The result is valid until the next call.
+        """
+        out = self._event_buffer
+        out_ptr = ffi.from_buffer("LEAP_PY_EVENT_RECORD[]", out, require_writable=True)
+        count = libleapc.LeapPyPollerDrainEvents(self._poller, out_ptr, len(out))
+        return out[:count]
+
+    def dispatch(self) -> int:
+        """Drain the buffered frames and pass each to the listeners as a TrackingEvent
+
+        Returns the number of frames dispatched.
+        """
+        frames = self.drain()
+        for record in frames:
+            dispatch_event(self._listeners, TrackingEvent.from_record(record))
+        return len(frames)
+
+    def stats(self) -> NativePollStats:
+        libleapc.LeapPyPollerGetStats(self._poller, self._stats_ptr)
+        stats = self._stats_ptr[0]
+        return NativePollStats(*(getattr(stats, name) for name in NativePollStats._fields))
+
+    def last_error(self) -> Optional[LeapError]:
+        """Get the most recent poll error, other than timeouts, if there was one"""
+        stats = self.stats()
+        if stats.errors == 0:
+            return None
+        # The result is stored as an int32, but LeapRS values are unsigned
+        return create_exception(LeapRS(stats.last_error & 0xFFFFFFFF), "Native poll failed")
+
+    @staticmethod
+    def event_type(event: np.void) -> EventType:
+        """Get the EventType of a record from `drain_events`"""
+        return EventType(int(event["type"]))
@@ -0,0 +1,149 @@
+"""Replaying recorded tracking frames into Listeners"""
+
+import threading
+import time
+from typing import Iterable, List, Optional
+
+from .event_listener import dispatch_event, Listener
+from .events import TrackingEvent
+
+# Sleep until this long before a frame is due, then spin, as sleep() can overshoot
+_SPIN_THRESHOLD = 0.002
+
+
+class PlaybackStats:
+    """Timing statistics of a playback
+
+    Lateness is measured between when a frame was due and when it was dispatched, in
+    seconds. It is always zero when playing as fast as possible.
+    """
+
+    def __init__(self):
+        self.frames = 0
+        self.elapsed = 0.0
+        self.recording_duration = 0.0
+        self.max_lateness = 0.0
+        self.total_lateness = 0.0
+
+    @property
+    def frames_per_second(self) -> float:
+        return self.frames / self.elapsed if self.elapsed > 0 else 0.0
+
+    @property
+    def mean_lateness(self) -> float:
+        return self.total_lateness / self.frames if self.frames > 0 else 0.0
+
+    @property
+    def realtime_factor(self) -> float:
+        """How many times faster than real time the frames were dispatched"""
+        return self.recording_duration / self.elapsed if self.elapsed > 0 else 0.0
+
+    def __repr__(self):
+        return (
+            f"PlaybackStats(frames={self.frames}, elapsed={self.elapsed:.3f}s, "
+            f"fps={self.frames_per_second:.1f}, realtime_factor={self.realtime_factor:.2f}, "
+            f"max_lateness={self.max_lateness * 1000:.3f}ms)"
+        )
+
+
+class RecordingPlayer:
+    """Feed recorded TrackingEvents to Listeners, as a Connection would
+
+    Frames are dispatched on a schedule derived from their timestamps. Each frame's due time
+    is computed from the start of playback rather than from the previous frame, so delays
+    in listeners or in sleeping never accumulate into drift.
+
+    :param source: A Recording, or any iterable of TrackingEvents such as the result of
+        `Recording.frames_between`.
+    :param listeners: A List of event listeners. Defaults to None.
+    :param speed: The playback speed relative to real time. None plays as fast as possible.
+        Defaults to 1.
+    """
+
+    def __init__(
+        self,
+        source: Iterable[TrackingEvent],
+        *,
+        listeners: Optional[List[Listener]] = None,
+        speed: Optional[float] = 1.0,
+    ):
+        if speed is not None and speed <= 0:
+            raise ValueError("Playback speed must be positive, or None for as fast as possible")
+        self._source = source
+        self._listeners = listeners if listeners is not None else []
+        self._speed = speed
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._stats = PlaybackStats()
+
+    @property
+    def stats(self) -> PlaybackStats:
+        """Statistics of the current, or most recent, playback"""
+        return self._stats
+
+    def add_listener(self, listener: Listener):
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener: Listener):
+        self._listeners.remove(listener)
+
+    def play(self) -> PlaybackStats:
+        """Play the source from this thread until it is exhausted or stopped"""
+        self._stop_event.clear()
+        stats = PlaybackStats()
+        self._stats = stats
+
+        first_timestamp = None
+        timestamp = None
+        start_time = time.perf_counter()
+        for event in self._source:
+            if self._stop_event.is_set():
+                break
+            timestamp = event.timestamp
+            if first_timestamp is None:
+                first_timestamp = timestamp
+                start_time = time.perf_counter()
+
+            if self._speed is not None:
+                due = start_time + (timestamp - first_timestamp) / 1e6 / self._speed
+                lateness = self._wait_until(due)
+                stats.max_lateness = max(stats.max_lateness, lateness)
+                stats.total_lateness += lateness
+
+            dispatch_event(self._listeners, event)
+            stats.frames += 1
+
+        stats.elapsed = time.perf_counter() - start_time
+        if first_timestamp is not None:
+            stats.recording_duration = (timestamp - first_timestamp) / 1e6
+        return stats
+
+    def start(self):
+        """Play the source on a separate thread"""
+        if self._thread is not None:
+            raise RuntimeError("Playback is already running")
+        self._thread = threading.Thread(target=self.play, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop playback and wait for the playback thread, if any, to finish"""
+        self._stop_event.set()
+        self.join()
+
+    def join(self, timeout: Optional[float] = None):
+        """Wait for playback on the separate thread to finish"""
+        if self._thread is not None:
+            self._thread.join(timeout)
+            if not self._thread.is_alive():
+                self._thread = None
+
+    def _wait_until(self, due: float) -> float:
+        """Wait until the due time, and return how late we are, in seconds"""
+        remaining = due - time.perf_counter()
+        if remaining > _SPIN_THRESHOLD:
+            # Waiting on the event rather than sleeping lets stop() interrupt long gaps
+            self._stop_event.wait(remaining - _SPIN_THRESHOLD)
+        while True:
+            now = time.perf_counter()
+            if now >= due or self._stop_event.is_set():
+                return max(now - due, 0.0)
@@ -0,0 +1,120 @@
+"""Keeping a copy of the scene's point mapping up to date"""
+
+import threading
+from typing import NamedTuple, Optional
+
+import numpy as np
+
+from .connection import Connection
+from .event_listener import Listener
+
+
+class PointMapUpdate(NamedTuple):
+    """The ids which changed in a PointMap update"""
+
+    added: np.ndarray  # (n,) uint32
+    removed: np.ndarray  # (n,) uint32
+    moved: np.ndarray  # (n,) uint32
+
+    def __bool__(self):
+        return bool(len(self.added) or len(self.removed) or len(self.moved))
+
+
+class PointMap(Listener):
+    """Listener which keeps a copy of the point mapping, sorted by point id
+
+    A PointMappingChangeEvent only marks the map as stale. The mapping is fetched and merged
+    the next time `update` is called, so the polling thread never does the work, and bursts
+    of changes are merged once.
+
+    :param connection: The Connection to get the point mapping from.
+    :param tolerance: Points which move less than this distance are not reported as moved.
+        Defaults to 0.
+    """
+
+    def __init__(self, connection: Connection, *, tolerance: float = 0.0):
+        self._connection = connection
+        self._tolerance = tolerance
+        self._lock = threading.Lock()
+        self._stale = True
+        self._frame_id = None
+        self._timestamp = None
+        self._ids = np.zeros(0, dtype=np.uint32)
+        self._points = np.zeros((0, 3), dtype=np.float32)
+
+    def __len__(self):
+        return len(self._ids)
+
+    @property
+    def stale(self) -> bool:
+        """Whether the mapping has changed since the last update"""
+        return self._stale
+
+    @property
+    def frame_id(self) -> Optional[int]:
+        return self._frame_id
+
+    @property
+    def timestamp(self) -> Optional[int]:
+        return self._timestamp
+
+    @property
+    def ids(self) -> np.ndarray:
+        """The point ids, in ascending order"""
+        return self._ids
+
+    @property
+    def points(self) -> np.ndarray:
+        """The (n, 3) point positions, in the same order as `ids`"""
+        return self._points
+
+    def on_point_mapping_change_event(self, event):
+        self._stale = True
+
+    def update(self, *, force: bool = False) -> PointMapUpdate:
+        """Fetch the point mapping if it has changed, and merge it by point id
+
+        Returns the ids which were added, removed or moved.
+
+        :param force: Whether to fetch the mapping even if no change has been reported.
+        """
+        with self._lock:
+            if not (self._stale or force):
+                empty = np.zeros(0, dtype=np.uint32)
+                return PointMapUpdate(empty, empty, empty)
+            self._stale = False
+            mapping = self._connection.get_point_mapping()
+
+            # Indexing by the sort order also copies out of the Connection's reused buffer
+            order = np.argsort(mapping.ids, kind="stable")
+            ids = mapping.ids[order]
+            points = mapping.points[order]
+
+            # Compare points which are in both the old and new mappings
+            _, old_index, new_index = np.intersect1d(
+                self._ids, ids, assume_unique=True, return_indices=True
+            )
+            distance = np.linalg.norm(points[new_index] - self._points[old_index], axis=1)
+            moved = ids[new_index[distance > self._tolerance]]
+            update = PointMapUpdate(
+                added=np.setdiff1d(ids, self._ids, assume_unique=True),
+                removed=np.setdiff1d(self._ids, ids, assume_unique=True),
+                moved=moved,
+            )
+
+            self._ids = ids
+            self._points = points
+            self._frame_id = mapping.frame_id
+            self._timestamp = mapping.timestamp
+            return update
+
+    def get(self, ids: np.ndarray) -> np.ndarray:
+        """Get the positions of points by id, with NaN for unknown ids"""
+        ids = np.asarray(ids, dtype=np.uint32)
+        result = np.full(ids.shape + (3,), np.nan, dtype=np.float32)
+        if len(self._ids) == 0:
+            return result
+        index = np.minimum(np.searchsorted(self._ids, ids), len(self._ids) - 1)
+        found = self._ids[index] == ids
+        result[found] = self._points[index[found]]
+        return result
@@ -0,0 +1,367 @@
+import os
+import zipfile
+
+import numpy as np
+from leapc_cffi import libleapc, ffi
+
+from ..enums import RecordingFlags
+from ..event_listener import Listener
+from ..events import TrackingEvent
+from ..exceptions import success_or_raise, LeapUnknownError
+
+# One entry per frame of a recording. LeapC does not expose file positions, so 'position' is
+# the number of bytes of decoded frame data before the frame: the sum of the sizes of the
+# frames before it. It is not a byte offset into the recording file, and cannot be seeked to.
+INDEX_DTYPE = np.dtype(
+    [
+        ("position", "<u8"),
+        ("size", "<u8"),
+        ("timestamp", "<i8"),
+        ("frame_id", "<i8"),
+    ]
+)
+
+_INDEX_SUFFIX = ".idx"
+
+
+class Recording:
+    """A LeapC recording of tracking frames
+
+    When reading, a frame index can be built which records the position, timestamp and
+    frame id of each frame. The index is saved to a sidecar file next to the recording
+    (the recording path with '.idx' appended), and reused while the recording is unchanged.
+    It allows `len`, `seek` and `frames_between` without decoding frames into Python
+    objects. Frames are assumed to be stored in timestamp order.
+    """
+
+    def __init__(self, fpath, mode="r"):
+        self._path = fpath
+        self._mode = mode
+        self._fpath = ffi.new("char[]", fpath.encode("utf-8"))
+        self._recording_ptr = ffi.new("LEAP_RECORDING*")
+        self._recording_params_ptr = ffi.new("LEAP_RECORDING_PARAMETERS*")
+        self._recording_params_ptr.mode = self._parse_mode(mode)
+        self._read_buffer = ffi.new("uint8_t*", 0)
+        self._position = 0
+        self._index = None
+        self._frame_buffer = ffi.new("char[]", 0)
+
+    def __enter__(self):
+        self._open()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._close()
+
+    def __len__(self):
+        return len(self.index)
+
+    @property
+    def path(self):
+        return self._path
+
+    @property
+    def position(self):
+        """The index of the next frame which will be read"""
+        return self._position
+
+    @property
+    def index(self) -> np.ndarray:
+        """The frame index, as an array of INDEX_DTYPE
+
+        This is loaded from the sidecar file if it is up to date, and built otherwise.
+        """
+        if self._index is None:
+            self._index = self.load_index()
+        if self._index is None:
+            self._index = self.build_index()
+        return self._index
+
+    @property
+    def index_path(self):
+        return self._path + _INDEX_SUFFIX
+
+    def build_index(self, *, save: bool = True) -> np.ndarray:
+        """Read the whole recording once to build the frame index
+
+        Frames are read into a single reused buffer and only their headers are inspected.
+        The read position is restored afterwards.
+
+        :param save: Whether to write the index to the sidecar file. Defaults to True.
+        """
+        position = self._position
+        self._rewind()
+
+        entries = []
+        stream_position = 0
+        buffer = ffi.new("char[]", 0)
+        while True:
+            size = self._read_size()
+            if size is None:
+                break
+            if len(buffer) < size:
+                buffer = ffi.new("char[]", size)
+            frame_ptr = ffi.cast("LEAP_TRACKING_EVENT*", buffer)
+            success_or_raise(libleapc.LeapRecordingRead, self._recording_ptr[0], frame_ptr, size)
+            entries.append(
+                (stream_position, size, frame_ptr.info.timestamp, frame_ptr.info.frame_id)
+            )
+            stream_position += size
+
+        index = np.array(entries, dtype=INDEX_DTYPE)
+        self._index = index
+        self._position = len(index)
+        self.seek_frame(position)
+
+        if save:
+            self._save_index(index)
+        return index
+
+    def load_index(self):
+        """Load the frame index from the sidecar file
+
+        Returns None if there is no sidecar file, or if it is unreadable, was written in an
+        older format or does not match the recording.
+        """
+        try:
+            with open(self.index_path, "rb") as fp:
+                data = np.load(fp)
+                source = data["source"]
+                index = data["index"]
+        except (OSError, KeyError, ValueError, zipfile.BadZipFile):
+            return None
+
+        if index.dtype != INDEX_DTYPE or tuple(source) != self._source_signature():
+            return None
+        return index
+
+    def seek(self, timestamp: int) -> int:
+        """Move to the first frame at or after the timestamp
+
+        Returns the index of that frame, which is the next frame to be read.
+        """
+        frame = int(np.searchsorted(self.index["timestamp"], timestamp, side="left"))
+        self.seek_frame(frame)
+        return frame
+
+    def seek_frame(self, frame: int):
+        """Move to the frame with the given position in the recording
+
+        Seeking backwards reopens the recording. Frames which are skipped over are read into
+        a reused buffer without being decoded.
+        """
+        if frame < self._position:
+            self._rewind()
+        if frame > self._position:
+            self._skip(frame - self._position)
+
+    def frames_between(self, start_timestamp: int, end_timestamp: int):
+        """Iterate over the TrackingEvents with timestamps in [start_timestamp, end_timestamp]"""
+        timestamps = self.index["timestamp"]
+        end = int(np.searchsorted(timestamps, end_timestamp, side="right"))
+        start = self.seek(start_timestamp)
+        for _ in range(start, end):
+            try:
+                frame = self.read_frame()
+            except StopIteration:
+                # The index is longer than the recording, so it is out of date
+                return
+            yield frame
+
+    def _open(self):
+        success_or_raise(
+            libleapc.LeapRecordingOpen,
+            self._recording_ptr,
+            self._fpath,
+            self._recording_params_ptr[0],
+        )
+        self._position = 0
+
+    def _close(self):
+        success_or_raise(libleapc.LeapRecordingClose, self._recording_ptr)
+
+    def _rewind(self):
+        if self._position != 0:
+            self._close()
+            self._open()
+
+    def _read_size(self):
+        """Get the size of the next frame, or None at the end of the recording"""
+        frame_size = ffi.new("uint64_t*")
+        try:
+            success_or_raise(libleapc.LeapRecordingReadSize, self._recording_ptr[0], frame_size)
+        except LeapUnknownError:
+            # When the recording has finished reading, an "UnknownError" is
+            # returned from the LeapC API.
+            return None
+        return frame_size[0]
+
+    def _skip(self, n_frames: int):
+        if self._index is not None:
+            end = min(self._position + n_frames, len(self._index))
+            max_size = int(self._index["size"][self._position : end].max(initial=0))
+        else:
+            max_size = 0
+        buffer = ffi.new("char[]", max_size)
+
+        for _ in range(n_frames):
+            size = self._read_size()
+            if size is None:
+                break
+            if len(buffer) < size:
+                buffer = ffi.new("char[]", size)
+            success_or_raise(
+                libleapc.LeapRecordingRead,
+                self._recording_ptr[0],
+                ffi.cast("LEAP_TRACKING_EVENT*", buffer),
+                size,
+            )
+            self._position += 1
+
+    def _source_signature(self):
+        stat = os.stat(self._path)
+        return stat.st_size, stat.st_mtime_ns
+
+    def _save_index(self, index: np.ndarray):
+        with open(self.index_path, "wb") as fp:
+            np.savez(fp, index=index, source=np.array(self._source_signature(), dtype=np.int64))
+
+    def write(self, frame):
+        """Write a frame of tracking data to the recording"""
+        bytes_written = ffi.new("uint64_t*")
+        success_or_raise(
+            libleapc.LeapRecordingWrite,
+            self._recording_ptr[0],
+            frame._data,
+            bytes_written,
+        )
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return self.read_frame()
+
+    def read(self):
+        """Read the recording
+
+        Returns a list of TrackingEvents in the recording.
+        """
+        return list(self)
+
+    def read_frame_ptr(self):
+        """Read the next frame into a buffer which is reused between calls
+
+        Returns a `LEAP_TRACKING_EVENT*` which is only valid until the next read, or None at
+        the end of the recording. This avoids creating a TrackingEvent for every frame.
+        """
+        frame_size = self._read_size()
+        if frame_size is None:
+            return None
+        if len(self._frame_buffer) < frame_size:
+            self._frame_buffer = ffi.new("char[]", frame_size)
+        frame_ptr = ffi.cast("LEAP_TRACKING_EVENT*", self._frame_buffer)
+        success_or_raise(libleapc.LeapRecordingRead, self._recording_ptr[0], frame_ptr, frame_size)
+        self._position += 1
+        return frame_ptr
+
+    def read_frame(self):
+        frame_size = self._read_size()
+        if frame_size is None:
+            raise StopIteration
+
+        frame_data = self._FrameData(frame_size)
+
+        success_or_raise(
+            libleapc.LeapRecordingRead,
+            self._recording_ptr[0],
+            frame_data.buffer_ptr(),
+            frame_size,
+        )
+        self._position += 1
+        return TrackingEvent(frame_data)
+
+    def status(self):
+        """Get the current recording status
+
+        Return a string, which may contain or omit the following characters:
+            'rwfc'
+                'r': Reading
+                'w': Writing
+                'f': Flushing
+                'c': Compressed
+
+        Raises a RuntimeError if the recording is an invalid state.
+        """
+        recording_status = ffi.new("LEAP_RECORDING_STATUS*")
+        success_or_raise(libleapc.LeapRecordingGetStatus, self._recording_ptr[0], recording_status)
+
+        flags = recording_status.mode
+        mode = ""
+
+        if flags & RecordingFlags.Reading.value:
+            mode += "r"
+        if flags & RecordingFlags.Writing.value:
+            mode += "w"
+        if flags & RecordingFlags.Flushing.value:
+            mode += "f"
+        if flags & RecordingFlags.Compressed.value:
+            mode += "c"
+
+        if len(mode) == 0:
+            raise RuntimeError("Recording is in an invalid state")
+        return mode
+
+    @staticmethod
+    def _parse_mode(mode):
+        flags = RecordingFlags.Error.value
+        if "r" in mode:
+            flags |= RecordingFlags.Reading.value
+        if "w" in mode:
+            flags |= RecordingFlags.Writing.value
+        if "c" in mode:
+            flags |= RecordingFlags.Compressed.value
+        return flags
+
+    class _FrameData:
+        """Wrapper which owns all the data required to read the Frame
+
+        A LEAP_TRACKING_EVENT has a fixed size, but some fields are pointers to memory stored
+        outside of the struct. This means the size required for all the information about a
+        frame is larger than the size of the struct.
+
+        This wrapper owns the buffer required for all of that data. Reading attributes or
+        items from this wrapper returns the corresponding item or wrapper on the underlying
+        LEAP_TRACKING_EVENT.
+
+        It is intended to by used in the TrackingEvent constructor.
+        """
+
+        def __init__(self, size):
+            self._buffer = ffi.new("char[]", size)
+            self._frame_ptr = ffi.cast("LEAP_TRACKING_EVENT*", self._buffer)
+
+        def __getattr__(self, name):
+            return getattr(self._frame_ptr, name)
+
+        def __getitem__(self, key):
+            return self._frame_ptr[key]
+
+        def buffer_ptr(self):
+            return self._frame_ptr
+
+
+class Recorder(Listener):
+    def __init__(self, recording, *, auto_start=True):
+        self._recording = recording
+        self._running = auto_start
+
+    def on_tracking_event(self, event):
+        if self._running:
+            self._recording.write(event)
+
+    def start(self):
+        self._running = True
+
+    def stop(self):
+        self._running = False
@@ -0,0 +1,291 @@
+"""Decoding recordings in parallel across a pool of processes
+
+Each worker decodes frames straight into FRAME_DTYPE and HAND_DTYPE arrays which live in
+shared memory, so results are handed back to the caller without pickling any events.
+
+Example:
+```
+with decode_recordings(paths) as results:
+    for decoded in results:
+        print(decoded.path, len(decoded.frames), decoded.hands["palm"]["position"].mean())
+```
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+import os
+from multiprocessing import shared_memory
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+from leapc_cffi import ffi
+
+from . import Recording
+from ..arrays import FRAME_DTYPE, HAND_DTYPE, MAX_HANDS, copy_frame
+
+# The alignment of each frame in the staging block used by decode_recording
+_STAGING_ALIGNMENT = 8
+
+
+def _layout(n_frames: int) -> Tuple[int, int]:
+    """Get the byte offset of the hands array and the total size of a results block"""
+    hands_offset = n_frames * FRAME_DTYPE.itemsize
+    hands_offset += -hands_offset % 8
+    total = hands_offset + n_frames * MAX_HANDS * HAND_DTYPE.itemsize
+    return hands_offset, max(total, 1)
+
+
+def _arrays(buffer, n_frames: int) -> Tuple[np.ndarray, np.ndarray]:
+    hands_offset, _ = _layout(n_frames)
+    frames = np.ndarray((n_frames,), dtype=FRAME_DTYPE, buffer=buffer)
+    hands = np.ndarray((n_frames, MAX_HANDS), dtype=HAND_DTYPE, buffer=buffer, offset=hands_offset)
+    return frames, hands
+
+
+class DecodedRecording:
+    """Frame and hand arrays decoded from a recording, held in shared memory
+
+    `frames` is an array of FRAME_DTYPE, and `hands` an array of HAND_DTYPE with shape
+    (n_frames, MAX_HANDS), where only the first `frames["n_hands"]` entries of each row are
+    valid. The arrays are views over the shared memory block, so copy anything which needs to
+    outlive `close()`.
+    """
+
+    def __init__(self, path: str, shm: shared_memory.SharedMemory, n_frames: int):
+        self._path = path
+        self._shm = shm
+        self._frames, self._hands = _arrays(shm.buf, n_frames)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __len__(self):
+        return len(self._frames)
+
+    @property
+    def path(self):
+        return self._path
+
+    @property
+    def frames(self) -> np.ndarray:
+        return self._frames
+
+    @property
+    def hands(self) -> np.ndarray:
+        return self._hands
+
+    def close(self):
+        """Release the shared memory. The arrays must not be used afterwards."""
+        if self._shm is None:
+            return
+        self._frames = None
+        self._hands = None
+        self._shm.close()
+        self._shm.unlink()
+        self._shm = None
+
+
+class DecodedRecordings(list):
+    """A list of DecodedRecordings which can be closed together"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        for decoded in self:
+            decoded.close()
+
+
+def _decode_into(recording: Recording, frames: np.ndarray, hands: np.ndarray) -> int:
+    n_frames = 0
+    for i in range(len(frames)):
+        frame_ptr = recording.read_frame_ptr()
+        if frame_ptr is None:
+            break
+        copy_frame(frame_ptr, frames[i], hands[i])
+        n_frames += 1
+    return n_frames
+
+
+def _count_frames(path: str) -> int:
+    """Worker: count the frames of a recording, building its index if needed"""
+    with Recording(path) as recording:
+        return len(recording)
+
+
+def _decode_range(path: str, start: int, stop: int, shm_name: str, n_frames: int) -> int:
+    """Worker: decode frames [start, stop) of a recording into an existing block"""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    frames, hands = _arrays(shm.buf, n_frames)
+    try:
+        with Recording(path) as recording:
+            recording.seek_frame(start)
+            n_decoded = _decode_into(recording, frames[start:stop], hands[start:stop])
+    finally:
+        # The arrays export the shared buffer, so must be released before closing it
+        del frames, hands
+        shm.close()
+    return n_decoded
+
+
+def _stage_frames(recording: Recording, staging, frame_offsets: np.ndarray) -> np.ndarray:
+    """Read every frame of a recording, undecoded, into a staging buffer
+
+    Returns the offset of each frame's hands from the start of the frame, as the `pHands`
+    pointers are only meaningful in this process.
+    """
+    base = ffi.from_buffer(staging)
+    hands_offsets = np.zeros(len(frame_offsets), dtype=np.int64)
+    try:
+        for i, (offset, size) in enumerate(zip(frame_offsets.tolist(), recording.index["size"])):
+            frame_ptr = recording.read_frame_ptr()
+            if frame_ptr is None:
+                raise RuntimeError(f"{recording.path} is shorter than its index")
+            ffi.memmove(base + offset, frame_ptr, int(size))
+            hands_offsets[i] = int(ffi.cast("uintptr_t", frame_ptr.pHands)) - int(
+                ffi.cast("uintptr_t", frame_ptr)
+            )
+    finally:
+        ffi.release(base)
+    return hands_offsets
+
+
+def _convert_range(
+    staging_name: str,
+    frame_offsets: np.ndarray,
+    hands_offsets: np.ndarray,
+    start: int,
+    shm_name: str,
+    n_frames: int,
+) -> int:
+    """Worker: convert staged frames into rows [start, start + len(frame_offsets)) of a block"""
+    staging = shared_memory.SharedMemory(name=staging_name)
+    shm = shared_memory.SharedMemory(name=shm_name)
+    base = ffi.from_buffer(staging.buf)
+    frames, hands = _arrays(shm.buf, n_frames)
+    try:
+        for i, (offset, hands_offset) in enumerate(
+            zip(frame_offsets.tolist(), hands_offsets.tolist()), start
+        ):
+            frame_ptr = ffi.cast("LEAP_TRACKING_EVENT*", base + offset)
+            frame_ptr.pHands = ffi.cast("LEAP_HAND*", base + offset + hands_offset)
+            copy_frame(frame_ptr, frames[i], hands[i])
+    finally:
+        # Release everything which exports the shared buffers before closing them
+        del frames, hands
+        ffi.release(base)
+        staging.close()
+        shm.close()
+    return len(frame_offsets)
+
+
+def decode_recordings(
+    paths: Sequence[str], *, max_workers: Optional[int] = None
+) -> DecodedRecordings:
+    """Decode several recordings in parallel, one recording per task
+
+    The workers first count the frames of each recording, building any missing indexes, so
+    that this process can create every shared memory block before the workers write to it.
+
+    :param paths: The recordings to decode.
+    :param max_workers: The number of processes. Defaults to the number of CPUs.
+    """
+    results = DecodedRecordings()
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        try:
+            counts = list(executor.map(_count_frames, paths))
+            futures = []
+            for path, n_frames in zip(paths, counts):
+                shm = shared_memory.SharedMemory(create=True, size=_layout(n_frames)[1])
+                results.append(DecodedRecording(path, shm, n_frames))
+                futures.append(
+                    executor.submit(_decode_range, path, 0, n_frames, shm.name, n_frames)
+                )
+            for path, n_frames, future in zip(paths, counts, futures):
+                n_decoded = future.result()
+                if n_decoded != n_frames:
+                    raise RuntimeError(
+                        f"Expected {n_frames} frames in {path} but read {n_decoded}"
+                    )
+        except BaseException:
+            results.close()
+            raise
+    return results
+
+
+def decode_recording(
+    path: str, *, chunks: Optional[int] = None, max_workers: Optional[int] = None
+) -> DecodedRecording:
+    """Decode a single indexed recording in parallel chunks
+
+    LeapC recordings can only be read sequentially, so this process reads the recording
+    once, without decoding, into a shared staging block. The workers then each convert one
+    chunk of the staged frames straight into the result block, so the result needs no
+    concatenation and the total work does not depend on the number of chunks.
+
+    :param path: The recording to decode.
+    :param chunks: The number of chunks. Defaults to the number of workers.
+    :param max_workers: The number of processes. Defaults to the number of CPUs.
+    """
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    if chunks is None:
+        chunks = max_workers
+
+    with Recording(path) as recording:
+        sizes = recording.index["size"].astype(np.int64)
+        n_frames = len(sizes)
+        # Keep every staged frame aligned for the struct
+        aligned_sizes = sizes + (-sizes % _STAGING_ALIGNMENT)
+        frame_offsets = np.concatenate([[0], np.cumsum(aligned_sizes)])
+        staging = shared_memory.SharedMemory(create=True, size=max(int(frame_offsets[-1]), 1))
+        frame_offsets = frame_offsets[:-1]
+        try:
+            hands_offsets = _stage_frames(recording, staging.buf, frame_offsets)
+        except BaseException:
+            staging.close()
+            staging.unlink()
+            raise
+
+    shm = shared_memory.SharedMemory(create=True, size=_layout(n_frames)[1])
+    decoded = DecodedRecording(path, shm, n_frames)
+    try:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            bounds = np.linspace(0, n_frames, chunks + 1).astype(int)
+            futures = [
+                executor.submit(
+                    _convert_range,
+                    staging.name,
+                    frame_offsets[start:stop],
+                    hands_offsets[start:stop],
+                    start,
+                    shm.name,
+                    n_frames,
+                )
+                for start, stop in zip(bounds[:-1], bounds[1:])
+                if stop > start
+            ]
+            n_decoded = sum(future.result() for future in futures)
+    except BaseException:
+        decoded.close()
+        raise
+    finally:
+        staging.close()
+        staging.unlink()
+
+    if n_decoded != n_frames:
+        decoded.close()
+        raise RuntimeError(f"Expected {n_frames} frames in {path} but read {n_decoded}")
+    return decoded
+
+
+def read_results(results: List[DecodedRecording]) -> Tuple[np.ndarray, np.ndarray]:
+    """Concatenate several results into ordinary (copied) frame and hand arrays"""
+    frames = np.concatenate([decoded.frames for decoded in results])
+    hands = np.concatenate([decoded.hands for decoded in results])
+    return frames, hands
@@ -0,0 +1,283 @@
+"""Compressed, chunked recordings of tracking frames
+
+LeapC recordings only offer an on/off compression flag. A CompressedRecording instead
+batches frames into chunks of `leap.arrays.RECORD_DTYPE` records and compresses each chunk
+with a selectable codec on a background thread, so writing from a Listener stays cheap.
+
+File layout (all integers little-endian): a 64 byte header made of the magic bytes
+b"LEAPCRC\\0", then uint32 format version, codec id, record size, LEAP_HAND size and hands
+per record, padded with zeros. It is followed by chunks, each of which is a uint32 record
+count, uint32 uncompressed size and uint32 compressed size, followed by the compressed
+records.
+"""
+
+import lzma
+import queue
+import struct
+import threading
+import time
+from typing import Iterator, NamedTuple
+import zlib
+
+import numpy as np
+
+from ..arrays import HAND_DTYPE, MAX_HANDS, RECORD_DTYPE
+from ..events import TrackingEvent
+
+_MAGIC = b"LEAPCRC\0"
+_VERSION = 1
+_HEADER_SIZE = 64
+_HEADER = struct.Struct("<8sIIIII")
+_CHUNK_HEADER = struct.Struct("<III")
+
+_CODEC_IDS = {"zlib": 0, "lzma": 1, "zstd": 2}
+_CODEC_NAMES = {codec_id: name for name, codec_id in _CODEC_IDS.items()}
+
+
+def _get_codec(name: str, level=None):
+    """Get (compress, decompress) functions for a codec"""
+    if name == "zlib":
+        level = 6 if level is None else level
+        return (lambda data: zlib.compress(data, level)), zlib.decompress
+    if name == "lzma":
+        preset = 6 if level is None else level
+        return (lambda data: lzma.compress(data, preset=preset)), lzma.decompress
+    if name == "zstd":
+        try:
+            import zstandard
+        except ImportError:
+            raise ImportError("The 'zstd' codec requires the 'zstandard' package")
+        compressor = zstandard.ZstdCompressor(level=3 if level is None else level)
+        decompressor = zstandard.ZstdDecompressor()
+        return compressor.compress, decompressor.decompress
+    raise ValueError(f"Unknown codec '{name}', expected one of {list(_CODEC_IDS)}")
+
+
+def available_codecs():
+    """Get the names of the codecs which can be used in this environment"""
+    codecs = []
+    for name in _CODEC_IDS:
+        try:
+            _get_codec(name)
+        except ImportError:
+            continue
+        codecs.append(name)
+    return codecs
+
+
+class CompressionStatus(NamedTuple):
+    """Statistics of a CompressedRecording
+
+    Byte counts only include chunks which have been compressed and written.
+    """
+
+    mode: str
+    codec: str
+    frames: int
+    chunks: int
+    bytes_in: int
+    bytes_out: int
+    compression_ratio: float
+    bytes_per_second: float
+    pending_chunks: int
+
+
+class CompressedRecording:
+    """A recording of tracking frames, compressed in chunks
+
+    Its `write` method has the same signature as `Recording.write`, so it can be used with a
+    `Recorder`.
+
+    :param fpath: The file to read or write.
+    :param mode: 'r' to read or 'w' to write. Defaults to 'r'.
+    :param codec: One of 'zlib', 'lzma' or 'zstd' (requires the zstandard package). Only
+        used when writing, as readers use the codec stored in the file. Defaults to 'zlib'.
+    :param level: The codec compression level. Defaults to the codec's default.
+    :param chunk_frames: The number of frames in each chunk. Defaults to 256.
+    :param max_pending_chunks: The number of chunks which may wait for the background
+        thread before `write` blocks. Defaults to 8.
+    """
+
+    def __init__(
+        self,
+        fpath: str,
+        mode: str = "r",
+        *,
+        codec: str = "zlib",
+        level=None,
+        chunk_frames: int = 256,
+        max_pending_chunks: int = 8,
+    ):
+        if mode not in ("r", "w"):
+            raise ValueError("mode must be 'r' or 'w'")
+        self._fpath = fpath
+        self._mode = mode
+        self._codec = codec
+        self._level = level
+        self._chunk_frames = chunk_frames
+        self._file = None
+
+        self._buffer = np.zeros(chunk_frames, dtype=RECORD_DTYPE)
+        self._n_buffered = 0
+        self._queue = queue.Queue(maxsize=max_pending_chunks)
+        self._thread = None
+        self._error = None
+
+        self._frames = 0
+        self._chunks = 0
+        self._bytes_in = 0
+        self._bytes_out = 0
+        self._start_time = None
+
+    def __enter__(self):
+        if self._mode == "w":
+            self._open_for_writing()
+        else:
+            self._open_for_reading()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def write(self, frame: TrackingEvent):
+        """Write a frame of tracking data to the recording"""
+        frame.to_record(self._buffer[self._n_buffered])
+        self._n_buffered += 1
+        if self._n_buffered == self._chunk_frames:
+            self._submit_chunk()
+
+    def flush(self):
+        """Compress and write any buffered frames, and wait until they are on disk"""
+        if self._n_buffered > 0:
+            self._submit_chunk()
+        self._queue.join()
+        self._raise_background_error()
+        self._file.flush()
+
+    def close(self):
+        if self._file is None:
+            return
+        try:
+            if self._mode == "w":
+                self.flush()
+        finally:
+            if self._thread is not None:
+                self._queue.put(None)
+                self._thread.join()
+                self._thread = None
+            self._file.close()
+            self._file = None
+
+    def status(self) -> CompressionStatus:
+        """Get the mode and compression statistics of the recording"""
+        elapsed = time.perf_counter() - self._start_time if self._start_time else 0.0
+        return CompressionStatus(
+            mode="wc" if self._mode == "w" else "rc",
+            codec=self._codec,
+            frames=self._frames,
+            chunks=self._chunks,
+            bytes_in=self._bytes_in,
+            bytes_out=self._bytes_out,
+            compression_ratio=self._bytes_in / self._bytes_out if self._bytes_out else 0.0,
+            bytes_per_second=self._bytes_out / elapsed if elapsed > 0 else 0.0,
+            pending_chunks=self._queue.qsize(),
+        )
+
+    def read_chunks(self) -> Iterator[np.ndarray]:
+        """Iterate over the recording one chunk at a time, as arrays of RECORD_DTYPE"""
+        _, decompress = _get_codec(self._codec)
+        while True:
+            chunk_header = self._file.read(_CHUNK_HEADER.size)
+            if len(chunk_header) < _CHUNK_HEADER.size:
+                return
+            n_records, raw_size, compressed_size = _CHUNK_HEADER.unpack(chunk_header)
+            payload = self._file.read(compressed_size)
+            if len(payload) < compressed_size:
+                # The recording was not closed cleanly
+                return
+            raw = decompress(payload)
+            if len(raw) != raw_size:
+                raise ValueError("Corrupt chunk in compressed recording")
+            self._chunks += 1
+            self._frames += n_records
+            self._bytes_in += raw_size
+            self._bytes_out += compressed_size + _CHUNK_HEADER.size
+            yield np.frombuffer(raw, dtype=RECORD_DTYPE, count=n_records)
+
+    def __iter__(self) -> Iterator[TrackingEvent]:
+        for records in self.read_chunks():
+            for record in records:
+                yield TrackingEvent.from_record(record)
+
+    def read(self):
+        """Read the recording
+
+        Returns a list of TrackingEvents in the recording.
+        """
+        return list(self)
+
+    def _open_for_writing(self):
+        self._compress, _ = _get_codec(self._codec, self._level)
+        self._file = open(self._fpath, "wb")
+        header = _HEADER.pack(
+            _MAGIC,
+            _VERSION,
+            _CODEC_IDS[self._codec],
+            RECORD_DTYPE.itemsize,
+            HAND_DTYPE.itemsize,
+            MAX_HANDS,
+        )
+        self._file.write(header.ljust(_HEADER_SIZE, b"\0"))
+        self._start_time = time.perf_counter()
+        self._thread = threading.Thread(target=self._writer_loop, daemon=True)
+        self._thread.start()
+
+    def _open_for_reading(self):
+        self._file = open(self._fpath, "rb")
+        header = self._file.read(_HEADER_SIZE)
+        if len(header) < _HEADER_SIZE:
+            raise ValueError(f"{self._fpath} is not a compressed recording")
+        magic, version, codec_id, record_size, hand_size, max_hands = _HEADER.unpack_from(header)
+        if magic != _MAGIC or version != _VERSION:
+            raise ValueError(f"{self._fpath} is not a supported compressed recording")
+        if (record_size, hand_size, max_hands) != (
+            RECORD_DTYPE.itemsize,
+            HAND_DTYPE.itemsize,
+            MAX_HANDS,
+        ):
+            raise ValueError("Recording was written with an incompatible LEAP_HAND layout")
+        self._codec = _CODEC_NAMES[codec_id]
+        self._start_time = time.perf_counter()
+
+    def _submit_chunk(self):
+        self._raise_background_error()
+        n_records = self._n_buffered
+        self._queue.put((n_records, self._buffer[:n_records].tobytes()))
+        self._n_buffered = 0
+
+    def _writer_loop(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                if self._error is not None:
+                    continue
+                n_records, raw = item
+                try:
+                    compressed = self._compress(raw)
+                    self._file.write(_CHUNK_HEADER.pack(n_records, len(raw), len(compressed)))
+                    self._file.write(compressed)
+                except Exception as exc:
+                    self._error = exc
+                    continue
+                self._chunks += 1
+                self._frames += n_records
+                self._bytes_in += len(raw)
+                self._bytes_out += len(compressed) + _CHUNK_HEADER.size
+            finally:
+                self._queue.task_done()
+
+    def _raise_background_error(self):
+        if self._error is not None:
+            raise self._error
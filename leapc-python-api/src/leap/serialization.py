@@ -0,0 +1,260 @@
+"""Compact binary serialisation of tracking frames
+
+A serialised frame is a header followed by the frame's valid hands. All integers are
+little-endian.
+
+| Size | Content                                                      |
+|------|--------------------------------------------------------------|
+| 1    | Format version (uint8), currently 1                          |
+| 1    | Flags (uint8): FLAG_HALF_PRECISION, FLAG_DELTA               |
+| 1    | Number of hands (uint8)                                      |
+| 1    | Reserved, zero                                               |
+| 8    | Timestamp (int64)                                            |
+| 8    | Frame id (int64)                                             |
+| 8    | Tracking frame id (int64)                                    |
+| 4    | Framerate (float32)                                          |
+| 4    | Device id (uint32)                                           |
+| 8    | Reference frame id (int64), only present with FLAG_DELTA     |
+| ...  | The hands                                                    |
+
+Each hand is the raw bytes of a LEAP_HAND. With FLAG_HALF_PRECISION, each hand is instead
+the hand's non-float 32-bit words, followed by its float32 fields rounded to float16, which
+is about half the size. Values beyond the float16 range, about 65504, become infinite.
+
+With FLAG_DELTA, the hand words are XORed with those of a reference frame holding the same
+hands in the same order. The result is mostly zero bits for consecutive frames, so deltas
+compress far better than whole frames with zlib or similar. Frames whose hands differ from
+the reference are always written whole.
+"""
+
+import struct
+from typing import Optional
+
+import numpy as np
+
+from .arrays import HAND_DTYPE, MAX_HANDS, RECORD_DTYPE
+
+VERSION = 1
+FLAG_HALF_PRECISION = 1
+FLAG_DELTA = 2
+
+_HEADER = struct.Struct("<BBBxqqqfI")
+_REFERENCE = struct.Struct("<q")
+
+if HAND_DTYPE.itemsize % 4:
+    raise ImportError("LEAP_HAND is not a whole number of 32-bit words")
+_HAND_WORDS = HAND_DTYPE.itemsize // 4
+
+
+def _float_offsets(dtype: np.dtype, base: int = 0):
+    """Yield the byte offset of every float32 in a structured dtype"""
+    if dtype.subdtype is not None:
+        item, shape = dtype.subdtype
+        for i in range(int(np.prod(shape))):
+            yield from _float_offsets(item, base + i * item.itemsize)
+    elif dtype.names is not None:
+        for name in dtype.names:
+            field, offset = dtype.fields[name][:2]
+            yield from _float_offsets(field, base + offset)
+    elif dtype == np.float32:
+        yield base
+
+
+_IS_FLOAT_WORD = np.zeros(_HAND_WORDS, dtype=bool)
+_IS_FLOAT_WORD[[offset // 4 for offset in _float_offsets(HAND_DTYPE)]] = True
+_FLOAT_WORDS = np.flatnonzero(_IS_FLOAT_WORD)
+_RAW_WORDS = np.flatnonzero(~_IS_FLOAT_WORD)
+_HALF_HAND_SIZE = _RAW_WORDS.size * 4 + _FLOAT_WORDS.size * 2
+
+
+def _hand_words(record: np.void, n_hands: int) -> np.ndarray:
+    """Get the valid hands of a record as an (n_hands, words) uint32 array"""
+    hands = np.ascontiguousarray(record["hands"][:n_hands])
+    return hands.view(np.uint32).reshape(n_hands, _HAND_WORDS)
+
+
+def _half_parts(words: np.ndarray):
+    """Split hand words into their non-float words and float16 bits"""
+    floats = words[:, _FLOAT_WORDS].view(np.float32)
+    return words[:, _RAW_WORDS], floats.astype(np.float16).view(np.uint16)
+
+
+def _can_delta(record: np.void, reference: Optional[np.void]) -> bool:
+    if reference is None or reference["n_hands"] != record["n_hands"]:
+        return False
+    n_hands = int(record["n_hands"])
+    return bool(np.all(reference["hands"]["id"][:n_hands] == record["hands"]["id"][:n_hands]))
+
+
+def encode_record(
+    record: np.void, *, half_precision: bool = False, reference: Optional[np.void] = None
+) -> bytes:
+    """Serialise a `leap.arrays.RECORD_DTYPE` record
+
+    :param record: The frame to serialise.
+    :param half_precision: Whether to round float fields to float16. Defaults to False.
+    :param reference: A previous frame to delta encode against. The frame is written whole if
+        this is None or holds different hands. Defaults to None.
+    """
+    n_hands = min(int(record["n_hands"]), MAX_HANDS)
+    flags = FLAG_HALF_PRECISION if half_precision else 0
+    delta = _can_delta(record, reference)
+    if delta:
+        flags |= FLAG_DELTA
+
+    parts = [
+        _HEADER.pack(
+            VERSION,
+            flags,
+            n_hands,
+            int(record["timestamp"]),
+            int(record["frame_id"]),
+            int(record["tracking_frame_id"]),
+            float(record["framerate"]),
+            int(record["device_id"]),
+        )
+    ]
+    if delta:
+        parts.append(_REFERENCE.pack(int(reference["frame_id"])))
+
+    words = _hand_words(record, n_hands)
+    ref_words = _hand_words(reference, n_hands) if delta else None
+    if half_precision:
+        raw, halves = _half_parts(words)
+        if delta:
+            ref_raw, ref_halves = _half_parts(ref_words)
+            raw = raw ^ ref_raw
+            halves = halves ^ ref_halves
+        parts.append(raw.tobytes())
+        parts.append(halves.tobytes())
+    else:
+        parts.append((words ^ ref_words if delta else words).tobytes())
+    return b"".join(parts)
+
+
+def decode_record(
+    data: bytes, *, reference: Optional[np.void] = None, record: Optional[np.void] = None
+) -> np.void:
+    """Deserialise a frame written by `encode_record`
+
+    :param data: The serialised frame.
+    :param reference: The decoded reference frame, required if the frame is delta encoded.
+    :param record: A RECORD_DTYPE record to write into, which avoids an allocation. Must not
+        be the reference record.
+    """
+    (
+        version,
+        flags,
+        n_hands,
+        timestamp,
+        frame_id,
+        tracking_frame_id,
+        framerate,
+        device_id,
+    ) = _HEADER.unpack_from(data)
+    if version != VERSION:
+        raise ValueError(f"Unsupported tracking frame format version {version}")
+    if n_hands > MAX_HANDS:
+        raise ValueError(f"Serialised frame has {n_hands} hands, at most {MAX_HANDS} expected")
+    offset = _HEADER.size
+
+    delta = bool(flags & FLAG_DELTA)
+    if delta:
+        (reference_id,) = _REFERENCE.unpack_from(data, offset)
+        offset += _REFERENCE.size
+        if reference is None or int(reference["frame_id"]) != reference_id:
+            raise ValueError(f"Serialised frame is a delta against frame {reference_id}")
+
+    half_precision = bool(flags & FLAG_HALF_PRECISION)
+    size = n_hands * (_HALF_HAND_SIZE if half_precision else HAND_DTYPE.itemsize)
+    if len(data) - offset != size:
+        raise ValueError("Serialised frame has the wrong size")
+
+    if record is None:
+        record = np.zeros(1, dtype=RECORD_DTYPE)[0]
+    record["timestamp"] = timestamp
+    record["frame_id"] = frame_id
+    record["tracking_frame_id"] = tracking_frame_id
+    record["framerate"] = framerate
+    record["n_hands"] = n_hands
+    record["device_id"] = device_id
+
+    ref_words = _hand_words(reference, n_hands) if delta else None
+    if half_precision:
+        n_raw = n_hands * _RAW_WORDS.size
+        raw = np.frombuffer(data, np.uint32, n_raw, offset).reshape(n_hands, -1)
+        halves = np.frombuffer(data, np.uint16, n_hands * _FLOAT_WORDS.size, offset + n_raw * 4)
+        halves = halves.reshape(n_hands, -1)
+        if delta:
+            ref_raw, ref_halves = _half_parts(ref_words)
+            raw = raw ^ ref_raw
+            halves = halves ^ ref_halves
+        words = np.empty((n_hands, _HAND_WORDS), dtype=np.uint32)
+        words[:, _RAW_WORDS] = raw
+        words[:, _FLOAT_WORDS] = halves.view(np.float16).astype(np.float32).view(np.uint32)
+    else:
+        words = np.frombuffer(data, np.uint32, n_hands * _HAND_WORDS, offset)
+        words = words.reshape(n_hands, _HAND_WORDS)
+        if delta:
+            words = words ^ ref_words
+
+    hands = record["hands"]
+    hands[:n_hands] = words.view(HAND_DTYPE).reshape(n_hands)
+    hands.view(np.uint8)[n_hands * HAND_DTYPE.itemsize :] = 0
+    return record
+
+
+class FrameEncoder:
+    """Serialises a stream of frames, delta encoding each against the one before
+
+    Every `key_interval` frames is written whole, so a decoder which misses a frame can
+    resume at the next key frame.
+
+    :param half_precision: Whether to round float fields to float16. Defaults to False.
+    :param key_interval: The number of frames between whole frames. Defaults to 30.
+    """
+
+    def __init__(self, *, half_precision: bool = False, key_interval: int = 30):
+        self._half_precision = half_precision
+        self._key_interval = key_interval
+        self._records = np.zeros(2, dtype=RECORD_DTYPE)
+        self._n_encoded = 0
+
+    def encode(self, event) -> bytes:
+        """Serialise a TrackingEvent"""
+        current = self._records[self._n_encoded % 2]
+        previous = self._records[(self._n_encoded + 1) % 2]
+        event.to_record(current)
+        key_frame = self._n_encoded % self._key_interval == 0
+        self._n_encoded += 1
+        return encode_record(
+            current,
+            half_precision=self._half_precision,
+            reference=None if key_frame else previous,
+        )
+
+    def reset(self):
+        """Make the next frame a key frame"""
+        self._n_encoded = 0
+
+
+class FrameDecoder:
+    """Deserialises a stream of frames written by a FrameEncoder"""
+
+    def __init__(self):
+        self._records = np.zeros(2, dtype=RECORD_DTYPE)
+        self._n_decoded = 0
+
+    def decode_record(self, data: bytes) -> np.void:
+        """Deserialise a frame into a record, which is valid until the next frame after it"""
+        current = self._records[self._n_decoded % 2]
+        previous = self._records[(self._n_decoded + 1) % 2] if self._n_decoded else None
+        decode_record(data, reference=previous, record=current)
+        self._n_decoded += 1
+        return current
+
+    def decode(self, data: bytes):
+        """Deserialise a frame into a TrackingEvent"""
+        from .events import TrackingEvent
+
+        return TrackingEvent.from_record(self.decode_record(data))
@@ -0,0 +1,553 @@
+"""Streaming tracking data from a Connection to other machines
+
+A FrameServer is a Listener which publishes events to clients over TCP and UDP. A
+StreamClient receives them and passes them to its own Listeners, much like a Connection.
+
+Protocol:
+- Each message is a 5 byte header, a uint32 payload length and a uint8 message type (both
+  little-endian), followed by the payload. Over UDP, each datagram holds one message.
+- Tracking messages (type 1) hold a `leap.arrays.RECORD_DTYPE` record, truncated after the
+  frame's valid hands.
+- Other events (type 2) are sent as a JSON object with 'type' (the EventType name) and
+  'device_id'.
+- A client subscribes by sending one line of JSON (or, over UDP, one datagram), with the
+  optional keys 'devices' (a list of device ids), 'events' (a list of EventType names) and
+  'max_rate' (the most frames per second, per device). UDP clients must resend their
+  subscription at least every `UDP_CLIENT_TIMEOUT` seconds to keep receiving data.
+
+Usage:
+```
+python -m leap.serve --host 0.0.0.0 --port 5555 --udp-port 5556
+```
+"""
+
+import argparse
+from collections import deque
+from contextlib import contextmanager
+import json
+import socket
+import struct
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from .arrays import FRAME_DTYPE, HAND_DTYPE, MAX_HANDS, RECORD_DTYPE
+from .enums import EventType
+from .event_listener import dispatch_event, Listener
+from .events import TrackingEvent
+
+DEFAULT_PORT = 5555
+UDP_CLIENT_TIMEOUT = 10.0
+
+_MESSAGE_HEADER = struct.Struct("<IB")
+_TRACKING_MESSAGE = 1
+_EVENT_MESSAGE = 2
+_MAX_DATAGRAM = 65507
+# How often, in seconds, the server's threads check whether it is stopping
+_SHUTDOWN_POLL_INTERVAL = 0.1
+# The longest, in seconds, stop() waits for each server thread
+_JOIN_TIMEOUT = 2.0
+# The longest, in seconds, a TCP client may take to send its subscription
+_HANDSHAKE_TIMEOUT = 5.0
+# The longest subscription request, in bytes
+_MAX_SUBSCRIPTION = 4096
+
+
+def encode_tracking_event(event: TrackingEvent, record: Optional[np.ndarray] = None) -> bytes:
+    """Encode a TrackingEvent as a tracking message payload"""
+    record = event.to_record(record)
+    size = FRAME_DTYPE.itemsize + int(record["n_hands"]) * HAND_DTYPE.itemsize
+    return record.tobytes()[:size]
+
+
+def decode_tracking_event(payload: bytes) -> TrackingEvent:
+    """Decode a tracking message payload into a TrackingEvent
+
+    Raises a ValueError if the payload is not a valid tracking message.
+    """
+    if len(payload) < FRAME_DTYPE.itemsize:
+        raise ValueError("Tracking message is too short")
+    n_hands = int(np.frombuffer(payload, dtype=FRAME_DTYPE, count=1)[0]["n_hands"])
+    if n_hands > MAX_HANDS:
+        raise ValueError(f"Tracking message has {n_hands} hands, at most {MAX_HANDS} expected")
+    if len(payload) != FRAME_DTYPE.itemsize + n_hands * HAND_DTYPE.itemsize:
+        raise ValueError("Tracking message has the wrong size")
+
+    record = np.zeros(1, dtype=RECORD_DTYPE)
+    record.view(np.uint8)[: len(payload)] = np.frombuffer(payload, dtype=np.uint8)
+    event = TrackingEvent.from_record(record[0])
+    event._metadata = RemoteEventMetadata(EventType.Tracking, int(record[0]["device_id"]))
+    return event
+
+
+def _message(message_type: int, payload: bytes) -> bytes:
+    return _MESSAGE_HEADER.pack(len(payload), message_type) + payload
+
+
+class RemoteEventMetadata:
+    """Metadata of an event received from a FrameServer"""
+
+    def __init__(self, event_type: EventType, device_id: int):
+        self._event_type = event_type
+        self._device_id = device_id
+
+    @property
+    def event_type(self):
+        return self._event_type
+
+    @property
+    def device_id(self):
+        return self._device_id
+
+
+class RemoteEvent:
+    """A non-tracking event received from a FrameServer
+
+    Only the event type and device id are sent, so this has no other data.
+    """
+
+    def __init__(self, event_type: EventType, device_id: int):
+        self._metadata = RemoteEventMetadata(event_type, device_id)
+
+    @property
+    def metadata(self):
+        return self._metadata
+
+    @property
+    def type(self):
+        return self._metadata.event_type
+
+
+class _Subscription:
+    def __init__(self, request: Dict):
+        devices = request.get("devices")
+        events = request.get("events")
+        max_rate = request.get("max_rate")
+        self.devices = None if devices is None else frozenset(int(d) for d in devices)
+        self.events = None if events is None else frozenset(EventType[e] for e in events)
+        self.min_interval = 1.0 / max_rate if max_rate else 0.0
+        self._last_sent: Dict[int, float] = {}
+
+    def accepts(self, event_type: EventType, device_id: int, now: float) -> bool:
+        if self.events is not None and event_type not in self.events:
+            return False
+        if self.devices is not None and device_id not in self.devices:
+            return False
+        if event_type == EventType.Tracking and self.min_interval > 0:
+            if now - self._last_sent.get(device_id, -np.inf) < self.min_interval:
+                return False
+            self._last_sent[device_id] = now
+        return True
+
+
+class _TCPClient:
+    """A connected TCP client, with a bounded send queue serviced by its own thread
+
+    If a send fails, the client closes itself and calls `on_closed` with itself.
+    """
+
+    def __init__(
+        self,
+        sock: socket.socket,
+        subscription: _Subscription,
+        queue_size: int,
+        on_closed: Callable[["_TCPClient"], None],
+    ):
+        self.sock = sock
+        self.subscription = subscription
+        self.dropped = 0
+        self._on_closed = on_closed
+        self._queue = deque(maxlen=queue_size)
+        self._condition = threading.Condition()
+        self._closed = False
+        self._thread = threading.Thread(target=self._send_loop, daemon=True)
+        self._thread.start()
+
+    @property
+    def closed(self):
+        return self._closed
+
+    def send(self, message: bytes):
+        with self._condition:
+            if len(self._queue) == self._queue.maxlen:
+                # A slow client loses its oldest messages rather than stalling the server
+                self.dropped += 1
+            self._queue.append(message)
+            self._condition.notify()
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.sock.close()
+
+    def _send_loop(self):
+        while True:
+            with self._condition:
+                while not self._queue and not self._closed:
+                    self._condition.wait()
+                if self._closed:
+                    return
+                messages = list(self._queue)
+                self._queue.clear()
+            try:
+                self.sock.sendall(b"".join(messages))
+            except OSError:
+                self.close()
+                self._on_closed(self)
+                return
+
+
+class FrameServer(Listener):
+    """Listener which publishes events to network clients
+
+    Events are encoded once, however many clients receive them. Slow TCP clients drop their
+    oldest queued messages instead of blocking the thread which dispatches events.
+
+    :param host: The interface to listen on. Defaults to localhost.
+    :param port: The TCP port to listen on, or None to disable TCP. Defaults to 5555.
+    :param udp_port: The UDP port to listen on, or None to disable UDP. Defaults to None.
+    :param queue_size: The number of messages each TCP client may have queued. Defaults to 64.
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: Optional[int] = DEFAULT_PORT,
+        *,
+        udp_port: Optional[int] = None,
+        queue_size: int = 64,
+    ):
+        self._host = host
+        self._port = port
+        self._udp_port = udp_port
+        self._queue_size = queue_size
+        self._lock = threading.Lock()
+        self._tcp_clients: List[_TCPClient] = []
+        self._udp_clients: Dict[tuple, tuple] = {}
+        self._tcp_socket = None
+        self._udp_socket = None
+        self._threads = []
+        self._running = False
+        self._record = np.zeros(1, dtype=RECORD_DTYPE)[0]
+
+    @property
+    def address(self):
+        """The (host, port) the TCP server is listening on"""
+        return None if self._tcp_socket is None else self._tcp_socket.getsockname()
+
+    @property
+    def udp_address(self):
+        """The (host, port) the UDP server is listening on"""
+        return None if self._udp_socket is None else self._udp_socket.getsockname()
+
+    @property
+    def n_clients(self):
+        return len(self._tcp_clients) + len(self._udp_clients)
+
+    @contextmanager
+    def open(self):
+        self.start()
+        try:
+            yield self
+        finally:
+            self.stop()
+
+    def start(self):
+        self._running = True
+        # The server's sockets time out regularly, so their threads notice when the server
+        # stops. Closing or shutting down a socket does not wake a blocked accept() on
+        # every platform.
+        if self._port is not None:
+            self._tcp_socket = socket.create_server((self._host, self._port))
+            self._tcp_socket.settimeout(_SHUTDOWN_POLL_INTERVAL)
+            self._start_thread(self._accept_loop)
+        if self._udp_port is not None:
+            self._udp_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self._udp_socket.bind((self._host, self._udp_port))
+            self._udp_socket.settimeout(_SHUTDOWN_POLL_INTERVAL)
+            self._start_thread(self._udp_loop)
+
+    def stop(self):
+        self._running = False
+        for thread in self._threads:
+            thread.join(_JOIN_TIMEOUT)
+        self._threads = []
+        for sock in (self._tcp_socket, self._udp_socket):
+            if sock is not None:
+                sock.close()
+        self._tcp_socket = None
+        self._udp_socket = None
+        with self._lock:
+            for client in self._tcp_clients:
+                client.close()
+            self._tcp_clients = []
+            self._udp_clients = {}
+
+    def on_event(self, event):
+        if not self._running:
+            return
+        event_type = event.type
+        device_id = 0 if event.metadata is None else event.metadata.device_id
+        now = time.monotonic()
+
+        with self._lock:
+            tcp_clients = [
+                client
+                for client in self._tcp_clients
+                if client.subscription.accepts(event_type, device_id, now)
+            ]
+            udp_clients = [
+                address
+                for address, (subscription, expiry) in self._udp_clients.items()
+                if expiry > now and subscription.accepts(event_type, device_id, now)
+            ]
+        if not tcp_clients and not udp_clients:
+            return
+
+        if event_type == EventType.Tracking:
+            payload = encode_tracking_event(event, self._record)
+            message = _message(_TRACKING_MESSAGE, payload)
+        else:
+            payload = json.dumps({"type": event_type.name, "device_id": device_id})
+            message = _message(_EVENT_MESSAGE, payload.encode("utf-8"))
+
+        for client in tcp_clients:
+            client.send(message)
+        if udp_clients and len(message) <= _MAX_DATAGRAM:
+            for address in udp_clients:
+                try:
+                    self._udp_socket.sendto(message, address)
+                except OSError:
+                    pass
+
+    def _start_thread(self, target):
+        thread = threading.Thread(target=target, daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    def _accept_loop(self):
+        while self._running:
+            try:
+                sock, _ = self._tcp_socket.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                return
+            # A client which never sends its subscription must not hold a thread forever
+            sock.settimeout(_HANDSHAKE_TIMEOUT)
+            threading.Thread(target=self._handshake, args=(sock,), daemon=True).start()
+
+    def _handshake(self, sock: socket.socket):
+        try:
+            with sock.makefile("rb") as reader:
+                request = json.loads(reader.readline(_MAX_SUBSCRIPTION) or b"{}")
+            subscription = _Subscription(request)
+        except (OSError, ValueError, KeyError, TypeError, AttributeError):
+            sock.close()
+            return
+        sock.settimeout(None)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        client = _TCPClient(sock, subscription, self._queue_size, self._remove_client)
+        with self._lock:
+            self._tcp_clients = self._tcp_clients + [client]
+
+    def _remove_client(self, client: _TCPClient):
+        with self._lock:
+            self._tcp_clients = [c for c in self._tcp_clients if c is not client]
+
+    def _udp_loop(self):
+        while self._running:
+            try:
+                data, address = self._udp_socket.recvfrom(4096)
+                subscription = _Subscription(json.loads(data or b"{}"))
+            except (socket.timeout, ValueError, KeyError, TypeError, AttributeError):
+                continue
+            except OSError:
+                return
+            with self._lock:
+                now = time.monotonic()
+                self._udp_clients = {
+                    addr: entry for addr, entry in self._udp_clients.items() if entry[1] > now
+                }
+                self._udp_clients[address] = (subscription, now + UDP_CLIENT_TIMEOUT)
+
+
+class StreamClient:
+    """Receives events from a FrameServer and passes them to Listeners
+
+    Tracking events are delivered as TrackingEvents with metadata holding the source device
+    id. Other events are delivered as RemoteEvents. Messages which cannot be decoded are
+    skipped, and counted in `invalid_messages`.
+
+    :param host: The server address.
+    :param port: The server TCP port, or UDP port if `udp` is True. Defaults to 5555.
+    :param udp: Whether to receive over UDP instead of TCP. Defaults to False.
+    :param devices: Only receive events from these device ids. Defaults to all devices.
+    :param events: Only receive these event types. Defaults to all events.
+    :param max_rate: The most tracking frames per second to receive from each device.
+        Defaults to no limit.
+    :param listeners: A List of event listeners. Defaults to None.
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = DEFAULT_PORT,
+        *,
+        udp: bool = False,
+        devices: Optional[List[int]] = None,
+        events: Optional[List[EventType]] = None,
+        max_rate: Optional[float] = None,
+        listeners: Optional[List[Listener]] = None,
+    ):
+        self._address = (host, port)
+        self._udp = udp
+        self._subscription = json.dumps(
+            {
+                "devices": devices,
+                "events": None if events is None else [e.name for e in events],
+                "max_rate": max_rate,
+            }
+        ).encode("utf-8")
+        self._listeners = listeners if listeners is not None else []
+        self._sock = None
+        self._thread = None
+        self._running = False
+        self._invalid_messages = 0
+
+    @property
+    def invalid_messages(self) -> int:
+        """The number of messages which were skipped because they could not be decoded"""
+        return self._invalid_messages
+
+    def add_listener(self, listener: Listener):
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener: Listener):
+        self._listeners.remove(listener)
+
+    @contextmanager
+    def open(self, *, timeout: float = 10):
+        self.connect(timeout=timeout)
+        try:
+            yield self
+        finally:
+            self.disconnect()
+
+    def connect(self, *, timeout: float = 10):
+        """Connect to the server and start receiving on a separate thread"""
+        if self._udp:
+            self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self._sock.settimeout(UDP_CLIENT_TIMEOUT / 4)
+            self._sock.sendto(self._subscription, self._address)
+            target = self._udp_loop
+        else:
+            self._sock = socket.create_connection(self._address, timeout=timeout)
+            self._sock.settimeout(None)
+            self._sock.sendall(self._subscription + b"\n")
+            target = self._tcp_loop
+        self._running = True
+        self._thread = threading.Thread(target=target, daemon=True)
+        self._thread.start()
+
+    def disconnect(self):
+        self._running = False
+        if self._sock is not None:
+            try:
+                self._sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            self._sock.close()
+        if self._thread is not None:
+            self._thread.join()
+        self._sock = None
+        self._thread = None
+
+    def _handle(self, message_type: int, payload: bytes):
+        try:
+            if message_type == _TRACKING_MESSAGE:
+                event = decode_tracking_event(payload)
+            elif message_type == _EVENT_MESSAGE:
+                data = json.loads(payload)
+                event = RemoteEvent(EventType[data["type"]], int(data["device_id"]))
+            else:
+                return
+        except (ValueError, KeyError, TypeError):
+            # One bad message must not end the stream
+            self._invalid_messages += 1
+            return
+        dispatch_event(self._listeners, event)
+
+    def _tcp_loop(self):
+        with self._sock.makefile("rb") as reader:
+            while self._running:
+                try:
+                    header = reader.read(_MESSAGE_HEADER.size)
+                    if len(header) < _MESSAGE_HEADER.size:
+                        return
+                    length, message_type = _MESSAGE_HEADER.unpack(header)
+                    payload = reader.read(length)
+                    if len(payload) < length:
+                        return
+                except OSError:
+                    return
+                self._handle(message_type, payload)
+
+    def _udp_loop(self):
+        last_subscribed = time.monotonic()
+        while self._running:
+            now = time.monotonic()
+            try:
+                if now - last_subscribed > UDP_CLIENT_TIMEOUT / 2:
+                    self._sock.sendto(self._subscription, self._address)
+                    last_subscribed = now
+                data = self._sock.recv(_MAX_DATAGRAM)
+            except socket.timeout:
+                continue
+            except OSError:
+                return
+            if len(data) < _MESSAGE_HEADER.size:
+                continue
+            length, message_type = _MESSAGE_HEADER.unpack_from(data)
+            self._handle(message_type, data[_MESSAGE_HEADER.size : _MESSAGE_HEADER.size + length])
+
+
+def main(argv=None):
+    from .connection import Connection
+    from .device_registry import DeviceRegistry
+
+    parser = argparse.ArgumentParser(
+        prog="python -m leap.serve", description="Stream tracking data to network clients"
+    )
+    parser.add_argument("--host", default="127.0.0.1", help="The interface to listen on")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="The TCP port")
+    parser.add_argument("--udp-port", type=int, default=None, help="The UDP port, if any")
+    parser.add_argument(
+        "--multi-device", action="store_true", help="Stream every device, not just the primary"
+    )
+    args = parser.parse_args(argv)
+
+    server = FrameServer(args.host, args.port, udp_port=args.udp_port)
+    connection = Connection(multi_device_aware=args.multi_device)
+    if args.multi_device:
+        connection.add_listener(DeviceRegistry(connection, subscribe=True))
+    connection.add_listener(server)
+
+    with server.open(), connection.open():
+        print(f"Serving on TCP {server.address}, UDP {server.udp_address}")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
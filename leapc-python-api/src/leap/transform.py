@@ -0,0 +1,242 @@
+"""Moving tracking data from several devices into one shared world frame
+
+Each device tracks hands in its own frame. A WorldTransform holds a rigid 4x4 transform per
+device id, built on first use from the device's placement in the world and, optionally, a
+camera's extrinsic matrix, and applies it to every joint, palm vector and orientation of a
+frame with a handful of vectorised NumPy operations.
+
+A WorldTransform is a Listener which can sit between a Connection and other listeners:
+
+```
+world = WorldTransform(connection, placements={1: left_pose, 2: right_pose}, listeners=[history])
+connection.add_listener(world)
+```
+"""
+
+import threading
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from .arrays import MAX_HANDS, RECORD_DTYPE
+from .connection import Connection
+from .device import Device
+from .enums import EventType, PerspectiveType
+from .event_listener import dispatch_event, Listener
+from .events import TrackingEvent
+from .functions import get_extrinsic_matrix
+from .head_pose import transform_hands
+
+
+def matrix_to_quaternion(rotation: np.ndarray) -> np.ndarray:
+    """Convert a 3x3 rotation matrix to an (x, y, z, w) unit quaternion"""
+    m = np.asarray(rotation, dtype=np.float64)
+    trace = np.trace(m)
+    # Take the square root of the largest of the four candidates, for numerical stability
+    if trace > 0:
+        s = 2 * np.sqrt(1 + trace)
+        q = [(m[2, 1] - m[1, 2]) / s, (m[0, 2] - m[2, 0]) / s, (m[1, 0] - m[0, 1]) / s, s / 4]
+    elif m[0, 0] > m[1, 1] and m[0, 0] > m[2, 2]:
+        s = 2 * np.sqrt(1 + m[0, 0] - m[1, 1] - m[2, 2])
+        q = [s / 4, (m[0, 1] + m[1, 0]) / s, (m[0, 2] + m[2, 0]) / s, (m[2, 1] - m[1, 2]) / s]
+    elif m[1, 1] > m[2, 2]:
+        s = 2 * np.sqrt(1 + m[1, 1] - m[0, 0] - m[2, 2])
+        q = [(m[0, 1] + m[1, 0]) / s, s / 4, (m[1, 2] + m[2, 1]) / s, (m[0, 2] - m[2, 0]) / s]
+    else:
+        s = 2 * np.sqrt(1 + m[2, 2] - m[0, 0] - m[1, 1])
+        q = [(m[0, 2] + m[2, 0]) / s, (m[1, 2] + m[2, 1]) / s, s / 4, (m[1, 0] - m[0, 1]) / s]
+    q = np.array(q)
+    return q / np.linalg.norm(q)
+
+
+class WorldTransform(Listener):
+    """Listener which transforms tracking frames into a shared world frame
+
+    The transform for a device is `placement @ extrinsic`, where `placement` is the device's
+    pose in the world and `extrinsic` is the extrinsic matrix of `perspective`, or the
+    identity if no perspective is given. It is built the first time a frame arrives from
+    the device, and cached until a device or config event invalidates it.
+
+    Each tracking event is copied into a reusable RECORD_DTYPE record, transformed in place,
+    and passed to `on_world_frame`. If listeners are given, they receive the transformed
+    frame as a TrackingEvent, and every other event unchanged.
+
+    :param connection: The Connection to query extrinsic matrices and devices on.
+    :param placements: A dict of device id to the 4x4 rigid transform from that device's
+        frame into the world. Devices without a placement use the identity. Frames from a
+        Connection which is not multi device aware have the device id 0.
+    :param perspective: The camera whose extrinsic matrix is applied before the placement.
+        Defaults to None, which applies the placement alone.
+    :param listeners: A List of event listeners to forward events to. Defaults to None.
+    """
+
+    def __init__(
+        self,
+        connection: Connection,
+        *,
+        placements: Optional[Dict[int, np.ndarray]] = None,
+        perspective: Optional[PerspectiveType] = None,
+        listeners: Optional[List[Listener]] = None,
+    ):
+        self._connection = connection
+        self._perspective = perspective
+        self._listeners = listeners if listeners is not None else []
+        self._lock = threading.Lock()
+
+        self._placements: Dict[int, np.ndarray] = {}
+        for device_id, placement in (placements or {}).items():
+            self._placements[device_id] = self._check_rigid(placement)
+
+        # device id -> (matrix, orientation, translation)
+        self._cache: Dict[int, tuple] = {}
+
+        self._record = np.zeros(1, dtype=RECORD_DTYPE)
+        self._out = np.zeros(0, dtype=RECORD_DTYPE)
+
+    def add_listener(self, listener: Listener):
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener: Listener):
+        self._listeners.remove(listener)
+
+    def set_placement(self, device_id: int, placement: Optional[np.ndarray]):
+        """Set, or with None clear, the pose of a device in the world"""
+        with self._lock:
+            if placement is None:
+                self._placements.pop(device_id, None)
+            else:
+                self._placements[device_id] = self._check_rigid(placement)
+            self._cache.pop(device_id, None)
+
+    def invalidate(self, device_id: Optional[int] = None):
+        """Drop the cached transform for a device, or for all devices if none is given"""
+        with self._lock:
+            if device_id is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(device_id, None)
+
+    def matrix(self, device_id: int) -> np.ndarray:
+        """Get the 4x4 transform from a device's frame into the world"""
+        return self._get(device_id)[0]
+
+    def apply_hands(
+        self, hands: np.ndarray, device_id: int, out: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """Transform an array of `leap.arrays.HAND_DTYPE` from one device into the world
+
+        :param out: An array of HAND_DTYPE to write into, which may be `hands`. Defaults to
+            a new array.
+        """
+        _, orientation, translation = self._get(device_id)
+        return transform_hands(hands, orientation, translation, out=out)
+
+    def apply(self, records: np.ndarray, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """Transform a 1D array of `leap.arrays.RECORD_DTYPE` into the world
+
+        Records may come from different devices: each one uses the transform of its own
+        `device_id`. Hands beyond each record's `n_hands` are zeroed.
+
+        :param records: The records to transform, such as a slice of
+            `leap.archive.Archive.records` or a chunk from
+            `leap.recording.compressed.CompressedRecording.read_chunks`.
+        :param out: An array of RECORD_DTYPE to write into, which may be `records`. Defaults
+            to a buffer owned by the WorldTransform, which is reused by the next call.
+        """
+        records = np.asarray(records)
+        if out is None:
+            if len(self._out) < len(records):
+                self._out = np.zeros(len(records), dtype=RECORD_DTYPE)
+            out = self._out[: len(records)]
+        if out is not records:
+            out[...] = records
+
+        # Gather each record's transform, so all devices are handled in one pass
+        device_ids, inverse = np.unique(out["device_id"], return_inverse=True)
+        transforms = [self._get(int(device_id)) for device_id in device_ids]
+        orientations = np.array([orientation for _, orientation, _ in transforms])[inverse]
+        translations = np.array([translation for _, _, translation in transforms])[inverse]
+
+        hands = out["hands"]
+        transform_hands(hands, orientations[:, None], translations[:, None], out=hands)
+        hands[np.arange(MAX_HANDS) >= out["n_hands"][:, None]] = np.zeros(1, hands.dtype)
+        return out
+
+    def on_event(self, event):
+        super().on_event(event)
+        if event.type != EventType.Tracking:
+            dispatch_event(self._listeners, event)
+
+    def on_tracking_event(self, event):
+        record = event.to_record(self._record[0])
+        n_hands = int(record["n_hands"])
+        hands = self._record["hands"][0, :n_hands]
+        self.apply_hands(hands, int(record["device_id"]), out=hands)
+        self.on_world_frame(record)
+
+        if self._listeners:
+            world_event = TrackingEvent.from_record(record)
+            world_event._metadata = event.metadata
+            dispatch_event(self._listeners, world_event)
+
+    def on_world_frame(self, record: np.void):
+        """Called with each transformed frame, as a RECORD_DTYPE record
+
+        The record is reused by the next frame. Override to consume frames without the
+        cost of building a TrackingEvent.
+        """
+        pass
+
+    def on_device_event(self, event):
+        self.invalidate(event.device.id)
+
+    def on_device_lost_event(self, event):
+        # Lost devices have no id, so drop every transform
+        self.invalidate()
+
+    def on_config_change_event(self, event):
+        self.invalidate()
+
+    def _get(self, device_id: int) -> tuple:
+        cached = self._cache.get(device_id)
+        if cached is not None:
+            return cached
+
+        matrix = self._placements.get(device_id, np.eye(4))
+        if self._perspective is not None:
+            matrix = matrix @ self._extrinsic(device_id)
+        cached = (matrix, matrix_to_quaternion(matrix[:3, :3]), matrix[:3, 3].copy())
+        with self._lock:
+            self._cache[device_id] = cached
+        return cached
+
+    def _extrinsic(self, device_id: int) -> np.ndarray:
+        """Get the extrinsic matrix of a device's camera as a 4x4 array"""
+        device = self._find_device(device_id)
+        if device is None:
+            extrinsic = get_extrinsic_matrix(self._connection, self._perspective)
+        else:
+            with device.open():
+                extrinsic = get_extrinsic_matrix(self._connection, self._perspective, device)
+        return self._check_rigid(np.array(extrinsic, dtype=np.float64).reshape(4, 4, order="F"))
+
+    def _find_device(self, device_id: int) -> Optional[Device]:
+        """Find a device by id, or return None to use the primary device"""
+        if device_id == 0:
+            return None
+        for device in self._connection.get_devices():
+            if device.id == device_id:
+                return device
+        raise ValueError(f"Device {device_id} is not connected")
+
+    @staticmethod
+    def _check_rigid(matrix: np.ndarray) -> np.ndarray:
+        matrix = np.asarray(matrix, dtype=np.float64)
+        if matrix.shape != (4, 4):
+            raise ValueError("Transforms must be 4x4 matrices")
+        rotation = matrix[:3, :3]
+        orthonormal = np.allclose(rotation @ rotation.T, np.eye(3), atol=1e-4)
+        affine = np.allclose(matrix[3], [0, 0, 0, 1])
+        if not (orthonormal and affine and np.linalg.det(rotation) > 0):
+            raise ValueError("Transforms must be rigid: a rotation followed by a translation")
+        return matrix
@@ -0,0 +1,160 @@
+"""Tests for leap.serve, over localhost
+
+These need the leap package to import, which needs leapc_cffi, but not a running tracking
+service.
+"""
+
+import threading
+import time
+
+import numpy as np
+import pytest
+
+try:
+    from leap.arrays import RECORD_DTYPE
+    from leap.enums import EventType
+    from leap.event_listener import Listener
+    from leap.events import TrackingEvent
+    from leap.serve import (
+        _EVENT_MESSAGE,
+        _Subscription,
+        _TRACKING_MESSAGE,
+        decode_tracking_event,
+        encode_tracking_event,
+        FrameServer,
+        RemoteEvent,
+        StreamClient,
+    )
+except Exception as exc:  # leap raises a plain Exception if it cannot find leapc_cffi
+    pytest.skip(f"leap cannot be imported: {exc}", allow_module_level=True)
+
+
+def _tracking_event(n_hands=1, frame_id=7):
+    record = np.zeros(1, dtype=RECORD_DTYPE)[0]
+    record["timestamp"] = 123456
+    record["frame_id"] = frame_id
+    record["tracking_frame_id"] = frame_id + 1
+    record["framerate"] = 90.0
+    record["n_hands"] = n_hands
+    for i in range(n_hands):
+        record["hands"][i]["id"] = 10 + i
+        record["hands"][i]["palm"]["position"] = (i, 200.0, -50.0)
+    return TrackingEvent.from_record(record)
+
+
+class _Collector(Listener):
+    def __init__(self):
+        self.events = []
+        self._condition = threading.Condition()
+
+    def on_event(self, event):
+        with self._condition:
+            self.events.append(event)
+            self._condition.notify_all()
+
+    def wait_for(self, n_events, timeout=5.0):
+        with self._condition:
+            return self._condition.wait_for(lambda: len(self.events) >= n_events, timeout)
+
+
+def _wait_until(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+@pytest.mark.parametrize("n_hands", [0, 1, 2])
+def test_tracking_event_roundtrip(n_hands):
+    event = _tracking_event(n_hands)
+    decoded = decode_tracking_event(encode_tracking_event(event))
+
+    expected = event.to_record()
+    actual = decoded.to_record()
+    for name in ["timestamp", "frame_id", "tracking_frame_id", "framerate", "n_hands"]:
+        assert actual[name] == expected[name]
+    assert actual["hands"][:n_hands].tobytes() == expected["hands"][:n_hands].tobytes()
+    assert decoded.metadata.device_id == 0
+
+
+def test_decode_rejects_malformed_payloads():
+    payload = encode_tracking_event(_tracking_event(1))
+    with pytest.raises(ValueError):
+        decode_tracking_event(payload[:-1])
+    with pytest.raises(ValueError):
+        decode_tracking_event(payload + b"\0")
+    with pytest.raises(ValueError):
+        decode_tracking_event(payload[:8])
+
+
+def test_subscription_filters():
+    subscription = _Subscription({"devices": [1], "events": ["Tracking"], "max_rate": 10})
+    assert subscription.accepts(EventType.Tracking, 1, now=0.0)
+    assert not subscription.accepts(EventType.Tracking, 2, now=1.0)
+    assert not subscription.accepts(EventType.Device, 1, now=1.0)
+    # Rate limited to one frame per 0.1s for each device
+    assert not subscription.accepts(EventType.Tracking, 1, now=0.05)
+    assert subscription.accepts(EventType.Tracking, 1, now=0.15)
+
+    everything = _Subscription({})
+    assert everything.accepts(EventType.Device, 3, now=0.0)
+    assert everything.accepts(EventType.Tracking, 3, now=0.0)
+
+
+def test_client_skips_invalid_messages():
+    collector = _Collector()
+    client = StreamClient(listeners=[collector])
+    client._handle(_TRACKING_MESSAGE, b"\1\2\3")
+    client._handle(_EVENT_MESSAGE, b"not json")
+    client._handle(_EVENT_MESSAGE, b'{"type": "NotAnEventType", "device_id": 0}')
+    client._handle(_EVENT_MESSAGE, b'{"type": "Device", "device_id": 2}')
+    assert client.invalid_messages == 3
+    assert [event.type for event in collector.events] == [EventType.Device]
+
+
+def test_tcp_loopback_subscribe_and_receive():
+    collector = _Collector()
+    server = FrameServer("127.0.0.1", 0)
+    with server.open():
+        client = StreamClient(
+            "127.0.0.1",
+            server.address[1],
+            events=[EventType.Tracking],
+            listeners=[collector],
+        )
+        with client.open(timeout=5):
+            assert _wait_until(lambda: server.n_clients == 1)
+            # Filtered out by the client's subscription
+            server.on_event(RemoteEvent(EventType.Device, 0))
+            server.on_event(_tracking_event(2, frame_id=42))
+            assert collector.wait_for(1)
+
+    (event,) = collector.events
+    assert isinstance(event, TrackingEvent)
+    assert event.tracking_frame_id == 43
+    assert [hand.id for hand in event.hands] == [10, 11]
+
+
+def test_udp_loopback_subscribe_and_receive():
+    collector = _Collector()
+    server = FrameServer("127.0.0.1", None, udp_port=0)
+    with server.open():
+        client = StreamClient("127.0.0.1", server.udp_address[1], udp=True, listeners=[collector])
+        with client.open():
+            assert _wait_until(lambda: server.n_clients == 1)
+            server.on_event(RemoteEvent(EventType.Device, 5))
+            assert collector.wait_for(1)
+
+    (event,) = collector.events
+    assert event.type == EventType.Device
+    assert event.metadata.device_id == 5
+
+
+def test_stop_without_clients_returns_promptly():
+    server = FrameServer("127.0.0.1", 0, udp_port=0)
+    server.start()
+    start = time.monotonic()
+    server.stop()
+    assert time.monotonic() - start < 1.0